@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Shared Börsdata API client for PSW 4.0 import scripts
+
+All Börsdata calls go through BorsdataClient, which:
+- reuses keep-alive connections from the process-wide requests.Session
+  (see shared_resources.py), with a connection pool sized for concurrent calls
+- waits on a sliding-window rate limiter shared by every client using the same
+  API key, so parallel jobs stay inside Börsdata's quota instead of sleeping
+  a fixed time between calls
+- retries 429 responses after the server's Retry-After delay
+
+Calls can be made synchronously with get(), or from asyncio code with
+aget() / gather_json(), which run the blocking HTTP call in a worker thread
+and cap how many are in flight at once. iter_json() streams the response
+body and yields the elements of a large list one at a time
+(see json_stream.py).
+
+Environment Variables (optional):
+- BORSDATA_RATE_LIMIT_CALLS: calls allowed per window (default 100)
+- BORSDATA_RATE_LIMIT_WINDOW: window length in seconds (default 10)
+- BORSDATA_MAX_CONCURRENCY: default number of concurrent async calls (default 8)
+"""
+
+import asyncio
+import os
+import threading
+import time
+import logging
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import requests
+
+from json_stream import iter_json_array
+from shared_resources import get_http_session
+
+API_BASE_URL = 'https://apiservice.borsdata.se'
+
+# Börsdata allows 100 calls per 10 second window per API key.
+# Environment overrides are read when a client is created, after the
+# calling script has loaded its .env file.
+RATE_LIMIT_CALLS = 100
+RATE_LIMIT_WINDOW = 10.0
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 30
+MAX_RETRIES = 3
+STREAM_CHUNK_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class SlidingWindowLimiter:
+    """
+    Thread-safe limiter allowing at most `calls` calls in any `window` seconds.
+
+    reserve() books the earliest slot that keeps every window of `window`
+    seconds at or below `calls` calls and returns how long the caller must
+    wait for it. This lets both threads (time.sleep) and coroutines
+    (asyncio.sleep) share one limiter. Unlike a token bucket that starts full,
+    a burst never adds to the calls refilled within the same window.
+    """
+
+    def __init__(self, calls: int, window: float, clock=time.monotonic):
+        self.calls = max(1, int(calls))
+        self.window = float(window)
+        self._clock = clock
+        self._slots = deque(maxlen=self.calls)  # the last `calls` booked call times
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = self._clock()
+            slot = max(now, self._paused_until)
+            if self._slots:
+                slot = max(slot, self._slots[-1])
+            if len(self._slots) == self.calls:
+                # The call `calls` bookings back must have left the window
+                slot = max(slot, self._slots[0] + self.window)
+            self._slots.append(slot)
+            return slot - now
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float):
+        """Make every caller wait at least `seconds` (used after a 429)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+
+_limiters: Dict[str, SlidingWindowLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(api_key: str) -> SlidingWindowLimiter:
+    """Return the process-wide rate limiter for an API key"""
+    with _limiters_lock:
+        if api_key not in _limiters:
+            calls = int(os.getenv('BORSDATA_RATE_LIMIT_CALLS', RATE_LIMIT_CALLS))
+            window = float(os.getenv('BORSDATA_RATE_LIMIT_WINDOW', RATE_LIMIT_WINDOW))
+            _limiters[api_key] = SlidingWindowLimiter(calls, window)
+        return _limiters[api_key]
+
+
+class BorsdataClient:
+    """Rate-limited Börsdata API client with keep-alive connection pooling"""
+
+    def __init__(self, api_key: str, headers: Optional[Dict[str, str]] = None,
+                 base_url: str = API_BASE_URL, session: Optional[requests.Session] = None,
+                 max_concurrency: Optional[int] = None, timeout: float = DEFAULT_TIMEOUT):
+        if not api_key:
+            raise ValueError("Börsdata API key is required")
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv('BORSDATA_MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY))
+        self.max_concurrency = max(1, max_concurrency)
+        self.limiter = get_rate_limiter(api_key)
+        self.session = session or get_http_session()
+
+        # Size the keep-alive pool for this host to the concurrency we allow
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        self.session.mount(self.base_url, adapter)
+
+        self.api_calls = 0
+        self._calls_lock = threading.Lock()
+
+    def url(self, path: str) -> str:
+        """Full URL for an API path such as '/v1/instruments' (without the auth key)"""
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def get(self, path: str, params: Optional[Dict[str, Any]] = None,
+            stream: bool = False) -> requests.Response:
+        """
+        GET an API path, waiting on the rate limiter first.
+
+        429 responses are retried up to MAX_RETRIES times; any other status is
+        returned to the caller unchanged. Network errors propagate as
+        requests exceptions.
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            self.limiter.acquire()
+            response = self._send(path, params, stream)
+            if response.status_code != 429 or attempt == MAX_RETRIES:
+                return response
+            self._back_off(path, response)
+        return response
+
+    def get_json(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """GET an API path and return the decoded JSON body, raising on HTTP errors"""
+        response = self.get(path, params)
+        response.raise_for_status()
+        return response.json()
+
+    def iter_json(self, path: str, keys: Sequence[str] = (),
+                  params: Optional[Dict[str, Any]] = None) -> Iterator[Any]:
+        """
+        Stream an API path and yield the elements of its list payload.
+
+        The list is the response body itself or the value of the first of
+        `keys` found at the top level. The body is read in
+        STREAM_CHUNK_SIZE pieces and never held in memory as a whole.
+        """
+        response = self.get(path, params, stream=True)
+        try:
+            response.raise_for_status()
+            yield from iter_json_array(response.iter_content(chunk_size=STREAM_CHUNK_SIZE), keys)
+        finally:
+            response.close()
+
+    async def aget(self, path: str, params: Optional[Dict[str, Any]] = None,
+                   stream: bool = False) -> requests.Response:
+        """Async get(): waits on the limiter without blocking the event loop"""
+        for attempt in range(MAX_RETRIES + 1):
+            await self.limiter.acquire_async()
+            response = await asyncio.to_thread(self._send, path, params, stream)
+            if response.status_code != 429 or attempt == MAX_RETRIES:
+                return response
+            self._back_off(path, response)
+        return response
+
+    def _send(self, path, params, stream):
+        query = dict(params or {})
+        query['authKey'] = self.api_key
+        response = self.session.get(self.url(path), params=query, headers=self.headers,
+                                    timeout=self.timeout, stream=stream)
+        with self._calls_lock:
+            self.api_calls += 1
+        return response
+
+    def _back_off(self, path, response):
+        retry_after = _retry_after_seconds(response)
+        logger.warning(f"Börsdata rate limit hit (429) for {path}, retrying in {retry_after:.1f}s")
+        response.close()
+        self.limiter.pause(retry_after)
+
+    async def gather(self, requests_list: Iterable[Tuple[str, Optional[Dict[str, Any]]]],
+                     max_concurrency: Optional[int] = None) -> List[Any]:
+        """
+        Run many GETs concurrently and return their responses in input order.
+
+        Exceptions are returned in place of the response, like
+        asyncio.gather(..., return_exceptions=True).
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+
+        async def one(path, params):
+            async with semaphore:
+                return await self.aget(path, params)
+
+        return await asyncio.gather(*(one(path, params) for path, params in requests_list),
+                                    return_exceptions=True)
+
+    async def gather_json(self, requests_list: Iterable[Tuple[str, Optional[Dict[str, Any]]]],
+                          max_concurrency: Optional[int] = None) -> List[Any]:
+        """gather() returning decoded JSON bodies (or the exception raised for each call)"""
+        results = []
+        for response in await self.gather(requests_list, max_concurrency):
+            if isinstance(response, BaseException):
+                results.append(response)
+                continue
+            try:
+                response.raise_for_status()
+                results.append(response.json())
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+def _retry_after_seconds(response: requests.Response) -> float:
+    try:
+        return max(1.0, float(response.headers.get('Retry-After', RATE_LIMIT_WINDOW)))
+    except (TypeError, ValueError):
+        return RATE_LIMIT_WINDOW
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Bulk upsert helper for PSW 4.0 import scripts (pymysql)
+
+bulk_upsert() loads a full set of rows into a target table in three steps:
+1. create an index-free TEMPORARY staging table with the target's column types
+2. stream the rows into it with LOAD DATA LOCAL INFILE, or with large
+   multi-row INSERTs when the client or server does not allow local infile
+3. merge the staging table into the target with one
+   INSERT ... SELECT ... ON DUPLICATE KEY UPDATE statement
+
+The target table is only touched by the final statement, so a load of tens
+of thousands of rows costs a handful of round-trips instead of one per
+100-row batch. Connections must be opened with local_infile=True for the
+LOAD DATA path; without it the multi-row INSERT fallback is used.
+
+swap_refresh() is the full-refresh alternative: the rows are loaded into a
+shadow copy of the table, validated, and swapped in with one atomic
+RENAME TABLE, so readers keep using the previous table until the new one is
+complete and are never blocked by the load. Tables with foreign keys (to or
+from them) cannot be swapped: CREATE TABLE ... LIKE does not copy foreign
+keys, and the rename and drop would break the ones pointing at the table.
+refresh_table() picks between the two according to FULL_REFRESH_MODE, falls
+back to upsert for tables with foreign keys and, unless CHANGE_DETECTION=0,
+diffs the payload against the content-hash index (change_detector.py) so
+that only added, changed and deleted rows are written.
+
+Environment Variables (optional):
+- FULL_REFRESH_MODE: 'upsert' (default) or 'swap'
+- REFRESH_MIN_ROW_RATIO: smallest accepted shadow/live row count ratio in
+  swap mode, and smallest share of tracked rows a payload must still
+  contain before change detection deletes the missing ones (default 0.9)
+- CHANGE_DETECTION: set to 0 to write every row on every run
+"""
+
+import itertools
+import logging
+import os
+import re
+import tempfile
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import pymysql
+
+from change_detector import ChangeSet, ContentHashIndex, min_row_ratio as _min_row_ratio
+
+REFRESH_MODES = ('upsert', 'swap')
+DEFAULT_REFRESH_MODE = 'upsert'
+
+# Rows per multi-row INSERT in the fallback path. pymysql packs each
+# executemany() chunk into statements of at most max_allowed_packet size.
+INSERT_CHUNK_SIZE = 5000
+
+_TSV_ESCAPE = re.compile(r'\\(.)')
+_TSV_UNESCAPES = {'t': '\t', 'n': '\n', 'r': '\r'}
+
+
+def _tsv_field(value) -> str:
+    """Format one value for LOAD DATA with the default escape character"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    text = str(value)
+    return (text.replace('\\', '\\\\')
+                .replace('\t', '\\t')
+                .replace('\n', '\\n')
+                .replace('\r', '\\r'))
+
+
+def _quote(identifier: str) -> str:
+    return f"`{identifier.replace('`', '``')}`"
+
+
+class RefreshValidationError(Exception):
+    """Raised when a shadow table fails validation and is not swapped in"""
+
+
+def _unescape_tsv_field(field: str):
+    """Inverse of _tsv_field (values come back as strings; MySQL converts them on insert)"""
+    if field == '\\N':
+        return None
+    return _TSV_ESCAPE.sub(lambda m: _TSV_UNESCAPES.get(m.group(1), m.group(1)), field)
+
+
+def _spool_rows(rows: Iterable[Sequence]) -> Tuple[str, int]:
+    """Write rows to a temporary TSV file; returns (path, row count)"""
+    count = 0
+    handle = tempfile.NamedTemporaryFile('w', encoding='utf-8', newline='\n', suffix='.tsv', delete=False)
+    try:
+        with handle:
+            for row in rows:
+                handle.write('\t'.join(_tsv_field(v) for v in row))
+                handle.write('\n')
+                count += 1
+    except BaseException:
+        os.unlink(handle.name)
+        raise
+    return handle.name, count
+
+
+def _read_spool(path: str) -> Iterator[Tuple]:
+    with open(path, encoding='utf-8', newline='\n') as handle:
+        for line in handle:
+            yield tuple(_unescape_tsv_field(f) for f in line.rstrip('\n').split('\t'))
+
+
+def _load_local_infile(cursor, staging_table: str, columns: Sequence[str], path: str,
+                       replace: bool = False):
+    """LOAD DATA LOCAL INFILE a spooled TSV file into the staging table"""
+    column_list = ', '.join(_quote(c) for c in columns)
+    cursor.execute(f"""
+        LOAD DATA LOCAL INFILE %s
+        {'REPLACE' if replace else ''} INTO TABLE {_quote(staging_table)}
+        CHARACTER SET utf8mb4
+        FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+        LINES TERMINATED BY '\\n'
+        ({column_list})
+    """, (path.replace('\\', '/'),))
+
+
+def _insert_chunks(cursor, staging_table: str, columns: Sequence[str], rows: Iterable[Sequence],
+                   replace: bool = False):
+    """Fallback: multi-row INSERTs into the staging table"""
+    column_list = ', '.join(_quote(c) for c in columns)
+    placeholders = ', '.join(['%s'] * len(columns))
+    verb = 'REPLACE' if replace else 'INSERT'
+    sql = f"{verb} INTO {_quote(staging_table)} ({column_list}) VALUES ({placeholders})"
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, INSERT_CHUNK_SIZE))
+        if not chunk:
+            return
+        cursor.executemany(sql, chunk)
+
+
+def _stage_rows(cursor, table: str, staging_table: str, columns: Sequence[str], rows: Iterable[Sequence],
+                use_local_infile: bool, replace: bool = False) -> int:
+    """
+    Load rows into staging_table, preferring LOAD DATA LOCAL INFILE.
+
+    rows may be a generator (e.g. a streamed API payload): they are spooled
+    to a temporary file first, so memory use does not depend on the row
+    count and the INSERT fallback can re-read them.
+    """
+    path, staged = _spool_rows(rows)
+    try:
+        if not staged:
+            return 0
+        if use_local_infile:
+            try:
+                _load_local_infile(cursor, staging_table, columns, path, replace)
+                logging.info(f"Staged {staged} rows for {table} with LOAD DATA LOCAL INFILE")
+                return staged
+            except (pymysql.err.OperationalError, pymysql.err.InternalError,
+                    pymysql.err.ProgrammingError, pymysql.err.NotSupportedError) as e:
+                logging.warning(f"LOAD DATA LOCAL INFILE unavailable for {table} ({e}); "
+                                f"falling back to multi-row INSERT")
+                cursor.execute(f"TRUNCATE TABLE {_quote(staging_table)}")
+        _insert_chunks(cursor, staging_table, columns, _read_spool(path), replace)
+        logging.info(f"Staged {staged} rows for {table} with multi-row INSERT")
+        return staged
+    finally:
+        os.unlink(path)
+
+
+def bulk_upsert(conn, table: str, columns: Sequence[str], rows: Iterable[Sequence],
+                update_columns: Optional[Sequence[str]] = None, use_local_infile: bool = True,
+                commit: bool = True) -> int:
+    """
+    Upsert rows into `table` through a temporary staging table.
+
+    rows are tuples in `columns` order. update_columns defaults to every
+    column; key columns should be left out so only the payload is updated.
+    The merge is committed before returning unless commit=False, in which
+    case the caller commits it together with its own writes. Returns the number of rows
+    staged. Raises pymysql errors from the merge; the caller decides how to
+    report them.
+    """
+    staging_table = f"_stage_{table}"
+    update_columns = list(update_columns if update_columns is not None else columns)
+    column_list = ', '.join(_quote(c) for c in columns)
+
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {_quote(staging_table)}")
+        # No keys on the staging table: loading stays append-only and duplicate
+        # keys in the payload are resolved by the merge, last row wins
+        cursor.execute(f"CREATE TEMPORARY TABLE {_quote(staging_table)} "
+                       f"SELECT {column_list} FROM {_quote(table)} LIMIT 0")
+        try:
+            staged = _stage_rows(cursor, table, staging_table, columns, rows, use_local_infile)
+            if not staged:
+                return 0
+
+            updates = ', '.join(f"{_quote(c)} = VALUES({_quote(c)})" for c in update_columns)
+            merge_sql = f"INSERT INTO {_quote(table)} ({column_list}) SELECT {column_list} FROM {_quote(staging_table)}"
+            if updates:
+                merge_sql += f" ON DUPLICATE KEY UPDATE {updates}"
+            cursor.execute(merge_sql)
+            if commit:
+                conn.commit()
+            logging.info(f"Merged {staged} staged rows into {table}")
+            return staged
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {_quote(staging_table)}")
+
+
+def _count_rows(cursor, table: str) -> int:
+    cursor.execute(f"SELECT COUNT(*) AS row_count FROM {_quote(table)}")
+    row = cursor.fetchone()
+    return row['row_count'] if isinstance(row, dict) else row[0]
+
+
+def _carried_columns(cursor, table: str, columns: Sequence[str]) -> List[str]:
+    """Columns of the live table that the payload does not provide and the server does not maintain"""
+    cursor.execute(f"SHOW COLUMNS FROM {_quote(table)}")
+    carried = []
+    for row in cursor.fetchall():
+        name = row['Field'] if isinstance(row, dict) else row[0]
+        extra = (row['Extra'] if isinstance(row, dict) else row[5]) or ''
+        if name in columns or 'auto_increment' in extra.lower() or 'on update' in extra.lower():
+            continue
+        carried.append(name)
+    return carried
+
+
+def foreign_keys(cursor, table: str) -> List[str]:
+    """Names of the foreign keys in the current database that reference `table` or are defined on it"""
+    cursor.execute("""
+        SELECT DISTINCT CONSTRAINT_NAME AS name, TABLE_NAME AS table_name
+        FROM information_schema.KEY_COLUMN_USAGE
+        WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL
+          AND (TABLE_NAME = %s OR (REFERENCED_TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME = %s))
+    """, (table, table))
+    keys = []
+    for row in cursor.fetchall():
+        name, table_name = (row['name'], row['table_name']) if isinstance(row, dict) else row[:2]
+        keys.append(f"{table_name}.{name}")
+    return sorted(keys)
+
+
+def validate_shadow(cursor, table: str, shadow_table: str, required_columns: Sequence[str] = (),
+                    min_row_ratio: Optional[float] = None) -> int:
+    """
+    Check a shadow table before it replaces `table`.
+
+    The shadow must not be empty, must hold at least min_row_ratio times the
+    live row count, and must have no NULLs in required_columns. Returns the
+    shadow row count; raises RefreshValidationError otherwise.
+    """
+    if min_row_ratio is None:
+        min_row_ratio = _min_row_ratio()
+
+    shadow_count = _count_rows(cursor, shadow_table)
+    live_count = _count_rows(cursor, table)
+    if shadow_count == 0:
+        raise RefreshValidationError(f"{shadow_table} is empty")
+    if shadow_count < live_count * min_row_ratio:
+        raise RefreshValidationError(
+            f"{shadow_table} has {shadow_count} rows, below {min_row_ratio:.0%} of the "
+            f"{live_count} rows in {table}")
+
+    for column in required_columns:
+        cursor.execute(f"SELECT COUNT(*) AS null_count FROM {_quote(shadow_table)} WHERE {_quote(column)} IS NULL")
+        row = cursor.fetchone()
+        nulls = row['null_count'] if isinstance(row, dict) else row[0]
+        if nulls:
+            raise RefreshValidationError(f"{shadow_table} has {nulls} rows with NULL {column}")
+
+    logging.info(f"Validated {shadow_table}: {shadow_count} rows (live table has {live_count})")
+    return shadow_count
+
+
+def swap_refresh(conn, table: str, columns: Sequence[str], rows: Iterable[Sequence],
+                 required_columns: Sequence[str] = (), min_row_ratio: Optional[float] = None,
+                 use_local_infile: bool = True) -> int:
+    """
+    Replace the contents of `table` with rows via a shadow table and RENAME TABLE.
+
+    The shadow is created with CREATE TABLE ... LIKE, so it has the live
+    table's keys and indexes; duplicate keys in the payload keep the last
+    row. Columns the payload does not provide are copied over from the live
+    table by key (columns[0]). After validate_shadow() passes, one RENAME
+    TABLE swaps both names atomically and the old table is dropped. Rows
+    missing from the payload are removed, as in any full refresh.
+
+    Tables with foreign keys are refused: the shadow would not get the
+    foreign keys defined on the live table, and foreign keys of other tables
+    would keep pointing at the renamed table and block its drop. Use
+    bulk_upsert() for those.
+
+    Returns the number of rows in the new table. Raises
+    RefreshValidationError (leaving the live table untouched) when the
+    table has foreign keys or validation fails.
+    """
+    shadow_table = f"{table}_shadow"
+    old_table = f"{table}_old"
+    key = columns[0]
+
+    with conn.cursor() as cursor:
+        keys = foreign_keys(cursor, table)
+        if keys:
+            raise RefreshValidationError(f"{table} cannot be swapped, it has foreign keys: {', '.join(keys)}")
+
+        # DDL commits implicitly; nothing below runs inside a transaction on `table`
+        cursor.execute(f"DROP TABLE IF EXISTS {_quote(shadow_table)}, {_quote(old_table)}")
+        cursor.execute(f"CREATE TABLE {_quote(shadow_table)} LIKE {_quote(table)}")
+        try:
+            _stage_rows(cursor, table, shadow_table, columns, rows, use_local_infile, replace=True)
+
+            carried = _carried_columns(cursor, table, columns)
+            if carried:
+                assignments = ', '.join(f"s.{_quote(c)} = l.{_quote(c)}" for c in carried)
+                cursor.execute(f"UPDATE {_quote(shadow_table)} s JOIN {_quote(table)} l "
+                               f"ON l.{_quote(key)} = s.{_quote(key)} SET {assignments}")
+            conn.commit()
+
+            row_count = validate_shadow(cursor, table, shadow_table, required_columns, min_row_ratio)
+
+            cursor.execute(f"RENAME TABLE {_quote(table)} TO {_quote(old_table)}, "
+                           f"{_quote(shadow_table)} TO {_quote(table)}")
+            logging.info(f"Swapped {shadow_table} in as {table} ({row_count} rows)")
+            cursor.execute(f"DROP TABLE IF EXISTS {_quote(old_table)}")
+            return row_count
+        except Exception:
+            conn.rollback()
+            cursor.execute(f"DROP TABLE IF EXISTS {_quote(shadow_table)}")
+            raise
+
+
+def refresh_table(conn, table: str, columns: Sequence[str], rows: Iterable[Sequence],
+                  update_columns: Optional[Sequence[str]] = None, required_columns: Sequence[str] = (),
+                  mode: Optional[str] = None, track_changes: Optional[bool] = None) -> Dict[str, int]:
+    """
+    Full refresh of `table` using FULL_REFRESH_MODE (or `mode`).
+
+    'upsert' merges the rows with bulk_upsert() and keeps rows missing from
+    the payload; 'swap' replaces the table with swap_refresh(). Tables with
+    foreign keys to or from them are always refreshed in upsert mode, since
+    swapping would lose or break those keys.
+
+    With change tracking (the default, see CHANGE_DETECTION) the payload is
+    first diffed against the content-hash index keyed on columns[0]: upsert
+    mode then only merges inserted and updated rows and deletes rows that
+    were loaded before but are gone from the payload, all in one
+    transaction. Deletes are skipped when the payload lost more than
+    1 - REFRESH_MIN_ROW_RATIO of the tracked rows, which guards against
+    truncated API responses.
+
+    Returns a dict with 'written' and, when tracking, exact 'inserted',
+    'updated', 'deleted' and 'unchanged' counts.
+    """
+    mode = (mode or os.getenv('FULL_REFRESH_MODE', DEFAULT_REFRESH_MODE)).lower()
+    if mode not in REFRESH_MODES:
+        raise ValueError(f"Invalid FULL_REFRESH_MODE '{mode}', expected one of {', '.join(REFRESH_MODES)}")
+    if track_changes is None:
+        track_changes = os.getenv('CHANGE_DETECTION', '1') != '0'
+    if mode == 'swap':
+        with conn.cursor() as cursor:
+            keys = foreign_keys(cursor, table)
+        if keys:
+            logging.warning(f"{table} has foreign keys ({', '.join(keys)}); using upsert instead of swap")
+            mode = 'upsert'
+
+    if not track_changes:
+        if mode == 'swap':
+            written = swap_refresh(conn, table, columns, rows, required_columns=required_columns)
+        else:
+            written = bulk_upsert(conn, table, columns, rows, update_columns=update_columns)
+        return {'written': written}
+
+    with conn.cursor() as cursor:
+        index = ContentHashIndex(cursor, table, columns, key_columns=columns[:1])
+
+        if mode == 'swap':
+            # The shadow gets every row; the diff only has to keep hashes
+            changes = ChangeSet()
+            streamed = index.diff_stream(rows, changes, keep_rows=False)
+            written = swap_refresh(conn, table, columns, streamed, required_columns=required_columns)
+            logging.info(f"Change detection for {table}: {changes}")
+            index.save(changes)
+            conn.commit()
+            return dict(changes.counts(), written=written)
+
+        changes = index.diff(rows)
+        logging.info(f"Change detection for {table}: {changes}")
+        missing = len(changes.deleted_keys)
+        if changes.skip_mass_deletes(_min_row_ratio()):
+            logging.warning(f"Payload for {table} is missing {missing} of "
+                            f"{changes.tracked} tracked rows; skipping deletes")
+
+        try:
+            written = bulk_upsert(conn, table, columns, changes.changed_rows,
+                                  update_columns=update_columns, commit=False)
+            index.delete_rows(changes.deleted_keys)
+            index.save(changes)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return dict(changes.counts(), written=written)
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Content-hash change detection for PSW 4.0 import scripts
+
+Most of what the daily jobs fetch (instruments, latest prices, KPI values)
+is identical to what the previous run loaded. ContentHashIndex keeps an
+8-byte hash of every loaded row in the compact side table
+row_content_hashes and diffs each fetched payload against it, so a job only
+writes the rows that were added or changed and deletes the rows that
+disappeared. The resulting ChangeSet carries exact inserted / updated /
+deleted / unchanged counts.
+
+Hashes are kept per target table and per scope. The scope narrows the index
+to the slice of the table one payload covers, e.g. one
+kpi_id/group/calculation combination of kpi_nordic; whole-table payloads
+such as nordic_instruments use an empty scope.
+
+The first run for a scope has no hashes to compare with. Rows whose key
+already exists in the target table are then written and counted as
+updated; from the second run on the counts are exact.
+
+Works with both pymysql (tuple or dict cursors) and mysql.connector
+cursors. Nothing here commits: the caller commits the hash changes in the
+same transaction as the data they describe.
+
+Target Database: psw_marketdata
+Table: row_content_hashes (see database/migrations/create_row_content_hashes_table.sql)
+"""
+
+import os
+import hashlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Separates key parts and values before hashing; never present in API data
+FIELD_SEPARATOR = '\x1f'
+DELETE_CHUNK_SIZE = 1000
+HASH_CHUNK_SIZE = 1000
+DEFAULT_MIN_ROW_RATIO = 0.9
+
+
+def min_row_ratio() -> float:
+    """Smallest share of tracked rows a payload must keep before missing rows are deleted"""
+    return float(os.getenv('REFRESH_MIN_ROW_RATIO', DEFAULT_MIN_ROW_RATIO))
+
+
+def row_hash(row: Sequence[Any]) -> bytes:
+    """8-byte content hash of a row tuple"""
+    text = FIELD_SEPARATOR.join('\\N' if value is None else str(value) for value in row)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+
+
+class ChangeSet:
+    """Result of diffing a payload against the hash index"""
+
+    def __init__(self):
+        self.inserted: List[Tuple] = []  # filled only when the diff keeps rows
+        self.updated: List[Tuple] = []
+        self.inserted_count = 0
+        self.updated_count = 0
+        self.deleted_keys: List[str] = []
+        self.unchanged = 0
+        self.tracked = 0  # rows the index knew about before the diff
+        self.hashes: Dict[str, bytes] = {}  # row key -> new hash for inserted/updated rows
+
+    @property
+    def changed_rows(self) -> List[Tuple]:
+        """Rows that have to be written (inserted + updated)"""
+        return self.inserted + self.updated
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            'inserted': self.inserted_count,
+            'updated': self.updated_count,
+            'deleted': len(self.deleted_keys),
+            'unchanged': self.unchanged,
+        }
+
+    def skip_mass_deletes(self, min_ratio: float) -> bool:
+        """Drop the deletes when the payload lost more than 1 - min_ratio of the tracked rows"""
+        if self.tracked - len(self.deleted_keys) >= self.tracked * min_ratio:
+            return False
+        self.deleted_keys = []
+        return True
+
+    def __str__(self):
+        counts = self.counts()
+        return ', '.join(f"{name}={count}" for name, count in counts.items())
+
+
+class ContentHashIndex:
+    """
+    Hash index over one scope of a target table.
+
+    columns are the names of the values in each payload row, key_columns
+    the subset identifying a row within the scope. scope maps column names
+    to the fixed values shared by every row of the payload (for example
+    {'kpi_id': 12, 'group_period': '1year', 'calculation': 'mean'}).
+    """
+
+    def __init__(self, cursor, table: str, columns: Sequence[str], key_columns: Sequence[str],
+                 scope: Optional[Dict[str, Any]] = None):
+        self.cursor = cursor
+        self.table = table
+        self.columns = list(columns)
+        self.key_columns = list(key_columns)
+        self.scope = dict(scope or {})
+        self.scope_id = '/'.join(f"{name}={value}" for name, value in self.scope.items())
+        self._key_positions = [self.columns.index(c) for c in self.key_columns]
+
+    def row_key(self, row: Sequence[Any]) -> str:
+        return FIELD_SEPARATOR.join(str(row[i]) for i in self._key_positions)
+
+    def _scope_clause(self) -> Tuple[str, List[Any]]:
+        if not self.scope:
+            return '', []
+        clause = ' AND '.join(f"`{name}` = %s" for name in self.scope)
+        return clause, list(self.scope.values())
+
+    def load_hashes(self) -> Dict[str, bytes]:
+        """Stored hashes for this scope, keyed by row key"""
+        self.cursor.execute("""
+            SELECT row_key, content_hash
+            FROM row_content_hashes
+            WHERE table_name = %s AND scope = %s
+        """, (self.table, self.scope_id))
+        hashes = {}
+        for row in self.cursor.fetchall():
+            if isinstance(row, dict):
+                hashes[row['row_key']] = bytes(row['content_hash'])
+            else:
+                hashes[row[0]] = bytes(row[1])
+        return hashes
+
+    def existing_keys(self) -> set:
+        """Row keys currently present in the target table (used when the index is empty)"""
+        key_list = ', '.join(f"`{c}`" for c in self.key_columns)
+        clause, params = self._scope_clause()
+        where = f" WHERE {clause}" if clause else ''
+        self.cursor.execute(f"SELECT {key_list} FROM `{self.table}`{where}", params)
+        keys = set()
+        for row in self.cursor.fetchall():
+            values = list(row.values()) if isinstance(row, dict) else list(row)
+            keys.add(FIELD_SEPARATOR.join(str(v) for v in values))
+        return keys
+
+    def diff(self, rows: Iterable[Sequence[Any]]) -> ChangeSet:
+        """
+        Classify payload rows against the stored hashes.
+
+        Keys that were loaded before but are missing from the payload are
+        reported in deleted_keys. Duplicate keys in the payload keep the
+        last row, matching ON DUPLICATE KEY UPDATE.
+        """
+        changes = ChangeSet()
+        for _ in self.diff_stream(rows, changes):
+            pass
+        return changes
+
+    def diff_stream(self, rows: Iterable[Sequence[Any]], changes: ChangeSet,
+                    keep_rows: bool = True) -> Iterator[Tuple]:
+        """
+        Pass rows through unchanged while diffing them into `changes`.
+
+        Lets a streamed payload be diffed and loaded in one pass; `changes`
+        is complete once the generator is exhausted. Only the row keys and
+        their 8-byte hashes are held for the whole payload, plus the
+        changed rows themselves when keep_rows is set.
+        """
+        stored = self.load_hashes()
+        known = stored.keys() if stored else self.existing_keys()
+        changes.tracked = len(stored)
+
+        seen: Dict[str, bytes] = {}
+        pending: Dict[str, Tuple] = {}
+        for row in rows:
+            row = tuple(row)
+            key = self.row_key(row)
+            digest = row_hash(row)
+            seen[key] = digest
+            if stored.get(key) == digest:
+                pending.pop(key, None)
+            elif keep_rows:
+                pending[key] = row
+            yield row
+
+        for key, digest in seen.items():
+            if stored.get(key) == digest:
+                changes.unchanged += 1
+                continue
+            changes.hashes[key] = digest
+            if key in known:
+                changes.updated_count += 1
+                if keep_rows:
+                    changes.updated.append(pending[key])
+            else:
+                changes.inserted_count += 1
+                if keep_rows:
+                    changes.inserted.append(pending[key])
+
+        changes.deleted_keys = [key for key in stored if key not in seen]
+
+    def delete_rows(self, keys: Sequence[str]) -> int:
+        """Delete rows with the given keys from the target table; returns rows deleted"""
+        if not keys:
+            return 0
+        clause, scope_params = self._scope_clause()
+        key_match = ' AND '.join(f"`{c}` = %s" for c in self.key_columns)
+        where = f"{clause} AND {key_match}" if clause else key_match
+        deleted = 0
+        params = [scope_params + key.split(FIELD_SEPARATOR) for key in keys]
+        for start in range(0, len(params), DELETE_CHUNK_SIZE):
+            self.cursor.executemany(f"DELETE FROM `{self.table}` WHERE {where}",
+                                    params[start:start + DELETE_CHUNK_SIZE])
+            deleted += max(self.cursor.rowcount, 0)
+        return deleted
+
+    def save(self, changes: ChangeSet):
+        """Store hashes for written rows and drop hashes of deleted rows (no commit)"""
+        upserts = [(self.table, self.scope_id, key, digest) for key, digest in changes.hashes.items()]
+        for start in range(0, len(upserts), HASH_CHUNK_SIZE):
+            self.cursor.executemany("""
+                INSERT INTO row_content_hashes (table_name, scope, row_key, content_hash)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE content_hash = VALUES(content_hash)
+            """, upserts[start:start + HASH_CHUNK_SIZE])
+
+        removals = [(self.table, self.scope_id, key) for key in changes.deleted_keys]
+        for start in range(0, len(removals), HASH_CHUNK_SIZE):
+            self.cursor.executemany("""
+                DELETE FROM row_content_hashes
+                WHERE table_name = %s AND scope = %s AND row_key = %s
+            """, removals[start:start + HASH_CHUNK_SIZE])
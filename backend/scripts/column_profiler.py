@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Column profiling for mysql_db_overview.py
+
+The overview used to read the first 50 rows of every table and profile them
+in Python, so unique counts and ranges described those 50 rows only.
+ColumnProfiler pushes the work into MySQL instead:
+
+- one aggregate query per table: row count, non-null count per column,
+  MIN / MAX (numeric and temporal columns), AVG (numeric columns) and, for
+  tables up to OVERVIEW_PROFILE_EXACT_ROWS rows, exact COUNT(DISTINCT ...).
+  The query carries a MAX_EXECUTION_TIME hint of OVERVIEW_PROFILE_BUDGET_MS;
+  a table that does not finish in time is profiled from statistics only.
+- histograms (ANALYZE TABLE ... UPDATE HISTOGRAM) on columns that are not
+  the first column of an index, refreshed when missing or older than
+  OVERVIEW_HISTOGRAM_MAX_AGE_DAYS. information_schema.column_statistics
+  gives their null fraction, estimated distinct values and, for columns
+  with few values, the values themselves.
+- index cardinality from the table's indexes for approximate distinct
+  counts of indexed columns.
+
+Environment Variables (optional):
+- OVERVIEW_PROFILE_BUDGET_MS: time budget of the aggregate query per table (default: 5000)
+- OVERVIEW_PROFILE_EXACT_ROWS: largest table (estimated rows) with exact distinct counts (default: 100000)
+- OVERVIEW_HISTOGRAMS: set to 0 to never run ANALYZE TABLE ... UPDATE HISTOGRAM
+- OVERVIEW_HISTOGRAM_BUCKETS: buckets per histogram (default: 32)
+- OVERVIEW_HISTOGRAM_MAX_AGE_DAYS: refresh histograms older than this (default: 7)
+
+Works with a mysql.connector tuple cursor on MySQL 8.0 or later.
+"""
+
+import os
+import re
+import json
+import time
+import base64
+import logging
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+NUMERIC_TYPES = {'tinyint', 'smallint', 'mediumint', 'int', 'integer', 'bigint',
+                 'decimal', 'numeric', 'float', 'double', 'real'}
+TEMPORAL_TYPES = {'date', 'datetime', 'timestamp', 'time', 'year'}
+# Counted, but neither compared, counted distinct nor given a histogram
+LARGE_OBJECT_TYPES = {'tinyblob', 'blob', 'mediumblob', 'longblob', 'tinytext', 'text', 'mediumtext',
+                      'longtext', 'json', 'geometry', 'point', 'linestring', 'polygon', 'multipoint',
+                      'multilinestring', 'multipolygon', 'geometrycollection', 'geomcollection'}
+
+# Values of singleton histograms listed as sample_values when there are at most this many
+SAMPLE_VALUE_LIMIT = 20
+
+
+def base_type(column_type) -> str:
+    """'decimal(10,2) unsigned' -> 'decimal'"""
+    if isinstance(column_type, (bytes, bytearray)):
+        column_type = column_type.decode('utf-8')
+    match = re.match(r'[a-z]+', (column_type or '').lower())
+    return match.group(0) if match else 'unknown'
+
+
+def _quote(name: str) -> str:
+    return '`' + name.replace('`', '``') + '`'
+
+
+def _histogram_value(value):
+    """Decode 'base64:type254:QmVsZ2llbg==' style string values of a histogram"""
+    if isinstance(value, str) and value.startswith('base64:'):
+        try:
+            return base64.b64decode(value.split(':', 2)[2]).decode('utf-8', errors='replace')
+        except (ValueError, IndexError):
+            return value
+    return value
+
+
+def _number(value):
+    return float(value) if isinstance(value, Decimal) else value
+
+
+class ColumnProfiler:
+    """Profiles the columns of the tables of one database"""
+
+    def __init__(self, cursor, db_name: str):
+        self.cursor = cursor
+        self.db_name = db_name
+        self.budget_ms = int(os.getenv('OVERVIEW_PROFILE_BUDGET_MS', 5000))
+        self.exact_rows = int(os.getenv('OVERVIEW_PROFILE_EXACT_ROWS', 100000))
+        self.update_histograms = os.getenv('OVERVIEW_HISTOGRAMS', '1') != '0'
+        self.histogram_buckets = int(os.getenv('OVERVIEW_HISTOGRAM_BUCKETS', 32))
+        self.histogram_max_age = timedelta(days=int(os.getenv('OVERVIEW_HISTOGRAM_MAX_AGE_DAYS', 7)))
+        self._histograms: Optional[Dict[str, Dict[str, dict]]] = None
+
+    def load_histograms(self, table_name: Optional[str] = None) -> Dict[str, Dict[str, dict]]:
+        """{table: {column: histogram}} of the database, or of one table"""
+        query = """
+            SELECT TABLE_NAME, COLUMN_NAME, HISTOGRAM
+            FROM information_schema.column_statistics
+            WHERE SCHEMA_NAME = %s
+        """
+        params = (self.db_name,)
+        if table_name is not None:
+            query += " AND TABLE_NAME = %s"
+            params += (table_name,)
+        histograms: Dict[str, Dict[str, dict]] = {}
+        try:
+            self.cursor.execute(query, params)
+            for table, column, histogram in self.cursor.fetchall():
+                if isinstance(histogram, (bytes, bytearray, str)):
+                    histogram = json.loads(histogram)
+                histograms.setdefault(table, {})[column] = histogram
+        except Exception as e:
+            logger.warning(f"Could not read histograms of {self.db_name}: {e}")
+        return histograms
+
+    def histograms(self, table_name: str) -> Dict[str, dict]:
+        if self._histograms is None:
+            self._histograms = self.load_histograms()
+        return self._histograms.get(table_name, {})
+
+    def _stale(self, histogram: Optional[dict]) -> bool:
+        if not histogram:
+            return True
+        try:
+            updated = datetime.strptime(histogram.get("last-updated", "")[:19], "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            return True
+        return datetime.now() - updated > self.histogram_max_age
+
+    def refresh_histograms(self, table_name: str, columns: List[str]):
+        """ANALYZE TABLE ... UPDATE HISTOGRAM for columns whose histogram is missing or old"""
+        existing = self.histograms(table_name)
+        stale = [column for column in columns if self._stale(existing.get(column))]
+        if not stale:
+            return
+        try:
+            self.cursor.execute(
+                f"ANALYZE TABLE {_quote(self.db_name)}.{_quote(table_name)} UPDATE HISTOGRAM ON "
+                f"{', '.join(_quote(c) for c in stale)} WITH {self.histogram_buckets} BUCKETS")
+            for row in self.cursor.fetchall():
+                if len(row) > 3 and str(row[2]).lower() == 'error':
+                    logger.warning(f"Histogram on {self.db_name}.{table_name}: {row[3]}")
+        except Exception as e:
+            logger.warning(f"Could not update histograms of {self.db_name}.{table_name}: {e}")
+            return
+        self._histograms[table_name] = self.load_histograms(table_name).get(table_name, {})
+
+    def _aggregate(self, table_name: str, columns: List[dict], exact_distinct: bool) -> Optional[dict]:
+        """Run the per-table aggregate query; None when it fails or exceeds the budget"""
+        select = ["COUNT(*)"]
+        layout = []  # (column, statistic) per selected expression after COUNT(*)
+        for column in columns:
+            name, kind = column["name"], column["kind"]
+            quoted = _quote(name)
+            select.append(f"COUNT({quoted})")
+            layout.append((name, "non_null_count"))
+            if exact_distinct and kind != 'large':
+                select.append(f"COUNT(DISTINCT {quoted})")
+                layout.append((name, "unique_count"))
+            if kind in ('numeric', 'temporal'):
+                select += [f"MIN({quoted})", f"MAX({quoted})"]
+                layout += [(name, "min_value"), (name, "max_value")]
+            if kind == 'numeric':
+                select.append(f"AVG({quoted})")
+                layout.append((name, "avg_value"))
+
+        try:
+            self.cursor.execute(
+                f"SELECT /*+ MAX_EXECUTION_TIME({self.budget_ms}) */ {', '.join(select)} "
+                f"FROM {_quote(self.db_name)}.{_quote(table_name)}")
+            row = self.cursor.fetchone()
+        except Exception as e:
+            logger.warning(f"Profiling query of {self.db_name}.{table_name} failed or exceeded "
+                           f"{self.budget_ms} ms, using statistics only: {e}")
+            return None
+
+        result = {"row_count": row[0], "columns": {}}
+        for (name, statistic), value in zip(layout, row[1:]):
+            result["columns"].setdefault(name, {})[statistic] = _number(value)
+        return result
+
+    def profile(self, table_info: dict) -> dict:
+        """Fill table_info["data_analysis"] per column and table_info["profile"]; returns data_analysis"""
+        started = time.monotonic()
+        table_name = table_info["name"]
+        estimated_rows = table_info.get("statistics", {}).get("row_count") or 0
+
+        # Unique single-column indexes and the distinct count of leading index columns
+        index_columns: Dict[str, List[dict]] = {}
+        for index in table_info.get("indexes", []):
+            index_columns.setdefault(index.get("Key_name"), []).append(index)
+        unique_columns, leading_cardinality = set(), {}
+        for parts in index_columns.values():
+            first = min(parts, key=lambda p: p.get("Seq_in_index") or 0)
+            column = first.get("Column_name")
+            if column is None:
+                continue
+            if len(parts) == 1 and not first.get("Non_unique"):
+                unique_columns.add(column)
+            # The first part's cardinality counts distinct values of the leading column
+            cardinality = first.get("Cardinality")
+            if cardinality is not None:
+                leading_cardinality[column] = max(leading_cardinality.get(column) or 0, cardinality)
+            else:
+                leading_cardinality.setdefault(column, None)
+
+        columns = []
+        for column in table_info.get("schema", []):
+            data_type = base_type(column.get("Type"))
+            kind = ('numeric' if data_type in NUMERIC_TYPES else
+                    'temporal' if data_type in TEMPORAL_TYPES else
+                    'large' if data_type in LARGE_OBJECT_TYPES else 'other')
+            columns.append({"name": column.get("Field"), "type": data_type, "kind": kind})
+
+        # Histograms help where there is no index to estimate from
+        if self.update_histograms and estimated_rows:
+            self.refresh_histograms(table_name, [c["name"] for c in columns
+                                                 if c["kind"] != 'large' and c["name"] not in leading_cardinality])
+
+        exact_distinct = estimated_rows <= self.exact_rows
+        aggregate = self._aggregate(table_name, columns, exact_distinct) if columns else None
+        row_count = aggregate["row_count"] if aggregate else estimated_rows
+        histograms = self.histograms(table_name)
+
+        analysis = {}
+        for column in columns:
+            name = column["name"]
+            stats = aggregate["columns"].get(name, {}) if aggregate else {}
+            histogram = histograms.get(name)
+            entry = {"data_type": column["type"]}
+
+            if "non_null_count" in stats:
+                entry["non_null_count"] = stats["non_null_count"]
+            elif histogram:
+                entry["non_null_count"] = round(row_count * (1 - histogram.get("null-values", 0)))
+            else:
+                entry["non_null_count"] = None
+            entry["null_count"] = row_count - entry["non_null_count"] if entry["non_null_count"] is not None else None
+            entry["null_ratio"] = round(entry["null_count"] / row_count, 6) if row_count and entry["null_count"] is not None else None
+
+            if "unique_count" in stats:
+                entry["unique_count"], source = stats["unique_count"], "exact"
+            elif name in unique_columns and entry["non_null_count"] is not None:
+                entry["unique_count"], source = entry["non_null_count"], "unique_index"
+            elif leading_cardinality.get(name) is not None:
+                entry["unique_count"], source = leading_cardinality[name], "index_cardinality"
+            elif histogram:
+                buckets = histogram.get("buckets", [])
+                if histogram.get("histogram-type") == "singleton":
+                    entry["unique_count"] = len(buckets)
+                else:
+                    entry["unique_count"] = sum(bucket[3] for bucket in buckets if len(bucket) > 3)
+                source = "histogram"
+            else:
+                entry["unique_count"], source = None, None
+            entry["unique_count_source"] = source
+
+            for statistic in ("min_value", "max_value", "avg_value"):
+                if stats.get(statistic) is not None:
+                    entry[statistic] = stats[statistic]
+
+            if histogram:
+                entry["histogram"] = {
+                    "type": histogram.get("histogram-type"),
+                    "buckets": len(histogram.get("buckets", [])),
+                    "sampling_rate": histogram.get("sampling-rate"),
+                    "last_updated": histogram.get("last-updated")
+                }
+                if histogram.get("histogram-type") == "singleton" and \
+                        len(histogram.get("buckets", [])) <= SAMPLE_VALUE_LIMIT:
+                    entry["sample_values"] = [str(_histogram_value(bucket[0])) for bucket in histogram["buckets"]][:10]
+
+            analysis[name] = entry
+
+        table_info["data_analysis"] = analysis
+        table_info["profile"] = {
+            "source": "aggregate" if aggregate else "statistics",
+            "row_count": row_count,
+            "exact_distinct": bool(aggregate) and exact_distinct,
+            "duration_ms": round((time.monotonic() - started) * 1000)
+        }
+        return analysis
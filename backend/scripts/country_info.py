@@ -1,5 +1,6 @@
 import os
 from dotenv import load_dotenv
+from shared_resources import get_http_session, connect_pymysql
 import requests
 import pymysql
 import logging
@@ -42,7 +43,7 @@ def fetch_countries():
     url = "https://restcountries.com/v3.1/all"
     logging.info(f"Fetching countries from REST Countries API: {url}")
     try:
-        response = requests.get(url)
+        response = get_http_session().get(url)
         response.raise_for_status()
         countries = response.json()
         logging.info(f"Fetched {len(countries)} countries.")
@@ -129,7 +130,7 @@ def save_to_db(countries):
     errors = 0
     logging.info("Connecting to MySQL database...")
     try:
-        conn = pymysql.connect(**db_config)
+        conn = connect_pymysql(**db_config)
         logging.info(f"Connected to database: {db_config['database']}")
 
         with conn.cursor() as cursor:
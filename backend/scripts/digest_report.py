@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Statement digest report for mysql_db_overview.py
+
+SHOW PROCESSLIST and the Slow_queries counter say nothing about which
+statements make a page slow. This report reads
+performance_schema.events_statements_summary_by_digest for the target
+databases in one query and ranks the normalised statements three ways:
+
+- top_by_total_latency: where the server spends its time
+- top_by_rows_examined_ratio: rows examined per row sent (missing or poor indexes)
+- top_by_full_scans: statements doing full table scans or joins without an index
+
+The digest counters are totals since the server started, so each run stores
+the counters of every digest in the target databases (not only the ranked
+ones) in MySQL_overview/snapshots/statement_digests.json.gz. The report
+shows what happened since the previous run (since_last_run), which digests
+are new, and which got slower per execution than in the run before
+(regressions), including digests outside the rankings.
+
+Environment Variables (optional):
+- OVERVIEW_DIGEST_TOP: statements per ranking (default: 20)
+- OVERVIEW_DIGEST_REGRESSION_FACTOR: slow-down per execution that counts as a regression (default: 1.5)
+- OVERVIEW_DIGEST_MIN_EXECUTIONS: executions since the last run before a digest can regress (default: 5)
+
+Works with a mysql.connector tuple cursor on MySQL 8.0 or later.
+"""
+
+import os
+import gzip
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+PICOSECONDS_PER_MS = 1e9
+
+_COLUMNS = ("SCHEMA_NAME, DIGEST, LEFT(DIGEST_TEXT, 500), COUNT_STAR, SUM_TIMER_WAIT, MAX_TIMER_WAIT, "
+            "SUM_ROWS_EXAMINED, SUM_ROWS_SENT, SUM_SELECT_SCAN, SUM_SELECT_FULL_JOIN, "
+            "SUM_NO_INDEX_USED, SUM_NO_GOOD_INDEX_USED, SUM_CREATED_TMP_DISK_TABLES, FIRST_SEEN, LAST_SEEN")
+
+# Ranking -> sort key of a report entry
+_RANKINGS = {
+    "top_by_total_latency": lambda d: d["_latency_ps"],
+    "top_by_rows_examined_ratio": lambda d: d["rows_examined_per_row_sent"],
+    "top_by_full_scans": lambda d: d["full_scans"] + d["full_joins"] + d["no_index_used"]
+}
+
+
+def _read_state(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_state(path: str, state: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(state, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def fetch_digests(cursor, schemas: Sequence[str]) -> List[dict]:
+    """Every statement digest of the target databases, one query"""
+    if not schemas:
+        return []
+    placeholders = ', '.join(['%s'] * len(schemas))
+    cursor.execute(f"""
+        SELECT {_COLUMNS}
+        FROM performance_schema.events_statements_summary_by_digest
+        WHERE SCHEMA_NAME IN ({placeholders}) AND DIGEST IS NOT NULL
+    """, tuple(schemas))
+
+    digests = []
+    for row in cursor.fetchall():
+        (schema, digest, text, count, latency, max_latency, examined, sent, scans, full_joins,
+         no_index, no_good_index, tmp_disk_tables, first_seen, last_seen) = row
+        count, examined, sent = count or 0, examined or 0, sent or 0
+        digests.append({
+            "digest": digest,
+            "schema": schema,
+            "text": text or "",
+            "executions": count,
+            "total_latency_seconds": round((latency or 0) / (PICOSECONDS_PER_MS * 1000), 3),
+            "avg_latency_ms": round((latency or 0) / count / PICOSECONDS_PER_MS, 3) if count else None,
+            "max_latency_ms": round((max_latency or 0) / PICOSECONDS_PER_MS, 3),
+            "rows_examined": examined,
+            "rows_sent": sent,
+            "rows_examined_per_row_sent": round(examined / max(sent, 1), 1),
+            "full_scans": scans or 0,
+            "full_joins": full_joins or 0,
+            "no_index_used": no_index or 0,
+            "no_good_index_used": no_good_index or 0,
+            "tmp_disk_tables": tmp_disk_tables or 0,
+            "first_seen": first_seen.isoformat() if hasattr(first_seen, 'isoformat') else first_seen,
+            "last_seen": last_seen.isoformat() if hasattr(last_seen, 'isoformat') else last_seen,
+            "_latency_ps": latency or 0
+        })
+    return digests
+
+
+def _since_last_run(entry: dict, previous: Optional[dict]) -> Optional[dict]:
+    """Counter deltas against the previous run; None for digests not seen then"""
+    if previous is None:
+        return None
+    executions = entry["executions"] - previous["executions"]
+    latency = entry["_latency_ps"] - previous["latency_ps"]
+    examined = entry["rows_examined"] - previous["rows_examined"]
+    if executions < 0 or latency < 0:
+        # Counters were reset (server restart or truncate): everything is new
+        executions, latency, examined = entry["executions"], entry["_latency_ps"], entry["rows_examined"]
+    return {
+        "executions": executions,
+        "total_latency_seconds": round(latency / (PICOSECONDS_PER_MS * 1000), 3),
+        "avg_latency_ms": round(latency / executions / PICOSECONDS_PER_MS, 3) if executions else None,
+        "rows_examined": examined
+    }
+
+
+def get_digest_report(cursor, schemas: Sequence[str], state_path: str) -> dict:
+    """Overview section: ranked statement digests and changes since the previous run"""
+    top = int(os.getenv('OVERVIEW_DIGEST_TOP', 20))
+    regression_factor = float(os.getenv('OVERVIEW_DIGEST_REGRESSION_FACTOR', 1.5))
+    min_executions = int(os.getenv('OVERVIEW_DIGEST_MIN_EXECUTIONS', 5))
+
+    digests = fetch_digests(cursor, schemas)
+    try:
+        previous_state = _read_state(state_path) or {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read previous statement digests: {e}")
+        previous_state = {}
+    previous = previous_state.get("digests", {})
+
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "schemas": list(schemas),
+        "previous_run_at": previous_state.get("generated_at"),
+        "regressions": [],
+        "new_digests": []
+    }
+
+    state: Dict[str, dict] = {}
+    for entry in digests:
+        key = f"{entry['schema']}:{entry['digest']}"
+        before = previous.get(key)
+        entry["since_last_run"] = _since_last_run(entry, before)
+        interval_avg = entry["since_last_run"]["avg_latency_ms"] if entry["since_last_run"] else None
+
+        if before is None and previous_state:
+            report["new_digests"].append(entry)
+        elif before and interval_avg is not None and before.get("interval_avg_latency_ms") and \
+                entry["since_last_run"]["executions"] >= min_executions and \
+                interval_avg >= before["interval_avg_latency_ms"] * regression_factor:
+            report["regressions"].append({
+                "digest": entry["digest"],
+                "schema": entry["schema"],
+                "text": entry["text"],
+                "previous_avg_latency_ms": before["interval_avg_latency_ms"],
+                "avg_latency_ms": interval_avg,
+                "slowdown": round(interval_avg / before["interval_avg_latency_ms"], 2),
+                "executions_since_last_run": entry["since_last_run"]["executions"]
+            })
+
+        state[key] = {
+            "executions": entry["executions"],
+            "latency_ps": entry["_latency_ps"],
+            "rows_examined": entry["rows_examined"],
+            # Keep the last known per-execution latency when nothing ran in this interval
+            "interval_avg_latency_ms": interval_avg if interval_avg is not None else
+            (before or {}).get("interval_avg_latency_ms", entry["avg_latency_ms"])
+        }
+
+    for ranking, sort_key in _RANKINGS.items():
+        report[ranking] = [{k: v for k, v in entry.items() if not k.startswith('_')}
+                           for entry in sorted(digests, key=sort_key, reverse=True)[:top]]
+    report["regressions"].sort(key=lambda r: -r["slowdown"])
+    report["regressions"] = report["regressions"][:top]
+    report["new_digests"] = [f"{entry['schema']}:{entry['digest']}"
+                             for entry in sorted(report["new_digests"], key=lambda d: -d["_latency_ps"])[:top]]
+
+    try:
+        _write_state(state_path, {"generated_at": report["generated_at"], "digests": state})
+    except OSError as e:
+        logger.warning(f"Could not store statement digests: {e}")
+    logger.info(f"Statement digests: {len(digests)} ranked, {len(report['regressions'])} regressions, "
+                f"{len(report['new_digests'])} new since the last run")
+    return report
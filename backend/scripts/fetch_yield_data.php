@@ -4,6 +4,10 @@
  * 
  * This script fetches yield data for all periods and calculations
  * from the Börsdata API and stores it in the KPI tables
+ *
+ * Once database/migrations/create_kpi_compact_tables.sql has run, kpi_nordic
+ * and kpi_global are read-only views and values are written to the compact
+ * tables (kpi_series, kpi_<endpoint>_values) instead.
  */
 
 require_once __DIR__ . '/../../config/database.php';
@@ -21,6 +25,10 @@ class YieldDataFetcher {
     // Yield KPI ID - this needs to be determined from your KPI metadata
     private $yieldKpiId = 1; // This is typically dividend yield - verify in your system!
     
+    // Cached storage layout per KPI table and kpi_series ids per period/calculation
+    private $compactStorage = [];
+    private $seriesIds = [];
+    
     public function __construct() {
         $this->marketdataDb = Database::getConnection('marketdata');
         $this->portfolioDb = Database::getConnection('portfolio');
@@ -58,7 +66,7 @@ class YieldDataFetcher {
             LEFT JOIN kpi_global kg ON gi.insId = kg.instrument_id 
                 AND kg.kpi_id = :yield_kpi_id 
                 AND kg.updated_at > DATE_SUB(NOW(), INTERVAL 7 DAY)
-            WHERE kg.id IS NULL
+            WHERE kg.instrument_id IS NULL
             LIMIT 100  -- Process in batches
         ";
         
@@ -127,6 +135,24 @@ class YieldDataFetcher {
         // Determine which table to use based on instrument
         $table = $this->isNordicInstrument($instrumentId) ? 'kpi_nordic' : 'kpi_global';
         
+        if ($this->usesCompactStorage($table)) {
+            $sql = "
+                INSERT INTO {$table}_values (series_id, instrument_id, numeric_value)
+                VALUES (:series_id, :instrument_id, :numeric_value)
+                ON DUPLICATE KEY UPDATE 
+                    numeric_value = VALUES(numeric_value),
+                    updated_at = NOW()
+            ";
+            
+            $stmt = $this->marketdataDb->prepare($sql);
+            $stmt->execute([
+                ':series_id' => $this->getSeriesId($period, $calculation),
+                ':instrument_id' => $instrumentId,
+                ':numeric_value' => $data['v'] ?? null
+            ]);
+            return;
+        }
+        
         $sql = "
             INSERT INTO {$table} (kpi_id, group_period, calculation, instrument_id, numeric_value, created_at, updated_at)
             VALUES (:kpi_id, :group_period, :calculation, :instrument_id, :numeric_value, NOW(), NOW())
@@ -145,6 +171,61 @@ class YieldDataFetcher {
         ]);
     }
     
+    /**
+     * Check if a KPI table has been replaced by a view over the compact tables
+     */
+    private function usesCompactStorage($table) {
+        if (!isset($this->compactStorage[$table])) {
+            $sql = "
+                SELECT TABLE_TYPE FROM information_schema.TABLES
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table_name
+            ";
+            $stmt = $this->marketdataDb->prepare($sql);
+            $stmt->bindValue(':table_name', $table);
+            $stmt->execute();
+            
+            $this->compactStorage[$table] = $stmt->fetchColumn() === 'VIEW';
+        }
+        
+        return $this->compactStorage[$table];
+    }
+    
+    /**
+     * Get the kpi_series id of the yield KPI for a period and calculation,
+     * registering the series when it does not exist yet
+     */
+    private function getSeriesId($period, $calculation) {
+        $key = $period . '_' . $calculation;
+        if (isset($this->seriesIds[$key])) {
+            return $this->seriesIds[$key];
+        }
+        
+        $params = [
+            ':kpi_id' => $this->yieldKpiId,
+            ':group_period' => $period,
+            ':calculation' => $calculation
+        ];
+        $select = $this->marketdataDb->prepare("
+            SELECT series_id FROM kpi_series
+            WHERE kpi_id = :kpi_id AND group_period = :group_period AND calculation = :calculation
+        ");
+        $select->execute($params);
+        $seriesId = $select->fetchColumn();
+        
+        if ($seriesId === false) {
+            // Insert only on a miss: every INSERT attempt uses up an AUTO_INCREMENT value
+            $insert = $this->marketdataDb->prepare("
+                INSERT IGNORE INTO kpi_series (kpi_id, group_period, calculation)
+                VALUES (:kpi_id, :group_period, :calculation)
+            ");
+            $insert->execute($params);
+            $select->execute($params);
+            $seriesId = $select->fetchColumn();
+        }
+        
+        return $this->seriesIds[$key] = (int) $seriesId;
+    }
+    
     /**
      * Check if instrument is Nordic
      */
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+FX cross-rate matrix for PSW 4.0
+
+FreeCurrency quotes every currency against one base per call. Instead of
+one call per base currency, fx_rates_freecurrency.py fetches a single
+anchor base (USD by default) with every currency it needs and derives all
+pairs from the resulting vector:
+
+    rate(base -> target) = anchor_rate[target] / anchor_rate[base]
+
+CrossRateMatrix holds that as an n x n NumPy matrix, so any pair between
+the fetched currencies - including pairs added later - is a lookup, and
+check_consistency() compares derived rates with directly quoted ones.
+
+Requires numpy.
+"""
+
+from typing import Dict, Iterable, List, Mapping, Sequence, Tuple
+
+import numpy as np
+
+Pair = Tuple[str, str]
+
+# Largest accepted relative difference between a derived and a quoted rate
+DEFAULT_TOLERANCE = 0.001
+
+
+class CrossRateMatrix:
+    """All cross rates between the currencies quoted against one anchor"""
+
+    def __init__(self, anchor: str, anchor_rates: Mapping[str, float]):
+        """
+        anchor_rates maps each currency to its price in units per one
+        anchor (as returned by FreeCurrency for base_currency=anchor).
+        """
+        rates = {ccy: float(rate) for ccy, rate in anchor_rates.items()
+                 if rate is not None and float(rate) > 0}
+        rates[anchor] = 1.0
+        self.anchor = anchor
+        self.currencies: List[str] = sorted(rates)
+        self.index: Dict[str, int] = {ccy: i for i, ccy in enumerate(self.currencies)}
+        vector = np.array([rates[ccy] for ccy in self.currencies], dtype=np.float64)
+        # matrix[i, j] = units of currency j per one unit of currency i
+        self.matrix = vector[np.newaxis, :] / vector[:, np.newaxis]
+
+    def __contains__(self, currency: str) -> bool:
+        return currency in self.index
+
+    def rate(self, base: str, target: str) -> float:
+        """Units of target per one unit of base; KeyError for unknown currencies"""
+        return float(self.matrix[self.index[base], self.index[target]])
+
+    def rates(self, pairs: Sequence[Pair]) -> np.ndarray:
+        """Vectorised rate() for a list of (base, target) pairs"""
+        rows = np.fromiter((self.index[base] for base, _ in pairs), dtype=np.intp, count=len(pairs))
+        cols = np.fromiter((self.index[target] for _, target in pairs), dtype=np.intp, count=len(pairs))
+        return self.matrix[rows, cols]
+
+    def missing(self, pairs: Iterable[Pair]) -> List[Pair]:
+        """Pairs that cannot be derived because a currency was not quoted"""
+        return [(base, target) for base, target in pairs
+                if base not in self.index or target not in self.index]
+
+
+def currencies_for(pairs: Iterable[Pair]) -> List[str]:
+    """Every currency appearing in a list of pairs"""
+    return sorted({ccy for pair in pairs for ccy in pair})
+
+
+def check_consistency(matrix: CrossRateMatrix, quoted: Mapping[Pair, float],
+                      tolerance: float = DEFAULT_TOLERANCE) -> List[Tuple[Pair, float, float, float]]:
+    """
+    Compare derived rates with directly quoted ones.
+
+    Returns (pair, quoted, derived, relative difference) for every pair
+    whose difference exceeds tolerance. Pairs with a currency missing from
+    the matrix are ignored.
+    """
+    pairs = [pair for pair in quoted if pair[0] in matrix and pair[1] in matrix]
+    if not pairs:
+        return []
+    derived = matrix.rates(pairs)
+    expected = np.array([quoted[pair] for pair in pairs], dtype=np.float64)
+    deviation = np.abs(derived - expected) / expected
+    return [
+        (pairs[i], float(expected[i]), float(derived[i]), float(deviation[i]))
+        for i in np.flatnonzero(deviation > tolerance)
+    ]
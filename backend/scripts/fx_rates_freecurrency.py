@@ -1,13 +1,24 @@
 import os
+import sys
+import argparse
 from dotenv import load_dotenv
+from shared_resources import get_http_session, connect_mysql
 import requests
 import mysql.connector
 import json
+import hashlib
 import logging
-from datetime import datetime, timedelta
+import struct
+import zlib
+from datetime import date, datetime, timedelta
 import time
 from collections import defaultdict
 
+try:
+    from fx_cross_rates import CrossRateMatrix, check_consistency, currencies_for
+except ImportError:  # numpy not installed; only the per-base mode is available
+    CrossRateMatrix = None
+
 # Load environment variables from .env file located at project root
 load_dotenv(dotenv_path='../../.env')
 
@@ -28,6 +39,21 @@ db_config = {
 
 # Table name for FX rates
 FX_TABLE_NAME = "fx_rates_freecurrency"
+# API responses, stored once per call and referenced by raw_response_id
+FX_RAW_RESPONSE_TABLE = "fx_raw_responses"
+FX_PROVIDER = "freecurrencyapi"
+
+# Fetch mode: 'anchor' makes one API call for FX_ANCHOR_CURRENCY and derives
+# every pair from the cross-rate matrix (see fx_cross_rates.py); 'per_base'
+# makes one call per base currency with a pause between calls
+FX_FETCH_MODE = os.getenv('FX_FETCH_MODE', 'anchor')
+FX_ANCHOR_CURRENCY = os.getenv('FX_ANCHOR_CURRENCY', 'USD')
+# Optional comma-separated bases quoted directly in anchor mode to check derived rates
+FX_VERIFY_BASES = [c.strip() for c in os.getenv('FX_VERIFY_BASES', '').split(',') if c.strip()]
+FX_CONSISTENCY_TOLERANCE = float(os.getenv('FX_CONSISTENCY_TOLERANCE', 0.001))
+API_PAUSE_SECONDS = 6
+# Days requested per historical API call when backfilling
+FX_BACKFILL_DAYS_PER_CALL = int(os.getenv('FX_BACKFILL_DAYS_PER_CALL', 30))
 
 # === Setup Logging ===
 log_dir = os.getenv('LOG_PATH', "../../storage/logs")
@@ -101,7 +127,7 @@ def get_fx_data_freecurrencyapi(api_key: str, base_currency: str, target_currenc
     logging.info(f"API endpoint: https://api.freecurrencyapi.com/v1/latest")
     
     try:
-        response = requests.get(url)
+        response = get_http_session().get(url)
         response.raise_for_status()
         data = response.json()
         
@@ -124,18 +150,161 @@ def get_fx_data_freecurrencyapi(api_key: str, base_currency: str, target_currenc
         
     return None, None
 
+def get_fx_history_freecurrencyapi(api_key: str, base_currency: str, target_currencies: list,
+                                   date_from: date, date_to: date):
+    """Fetch daily historical FX rates for a date range; returns {date: {currency: rate}}"""
+    currencies_param = ",".join(target_currencies)
+    url = (f"https://api.freecurrencyapi.com/v1/historical?"
+           f"apikey={api_key}&"
+           f"base_currency={base_currency}&"
+           f"currencies={currencies_param}&"
+           f"date_from={date_from.isoformat()}&"
+           f"date_to={date_to.isoformat()}")
+
+    logging.info(f"Fetching historical {base_currency} rates {date_from} - {date_to} from FreeCurrency API")
+
+    try:
+        response = get_http_session().get(url)
+        response.raise_for_status()
+        data = response.json()
+
+        if "data" in data and data["data"] is not None:
+            # Keys are dates, possibly with a time part
+            history = {datetime.strptime(day[:10], '%Y-%m-%d').date(): rates
+                       for day, rates in data["data"].items()}
+            logging.info(f"Received {len(history)} days of {base_currency} rates")
+            return history, data
+        elif "message" in data:
+            logging.warning(f"API message: {data['message']}")
+        elif "errors" in data:
+            logging.error(f"API error: {data['errors']}")
+        else:
+            logging.warning(f"Unexpected API response: {data}")
+
+    except requests.exceptions.RequestException as e:
+        logging.error(f"HTTP request failed: {e}")
+    except ValueError as e:
+        logging.error(f"JSON decode error: {e}")
+    except Exception as e:
+        logging.exception(f"Error fetching historical FX data: {e}")
+
+    return None, None
+
+def compress_payload(data: bytes) -> bytes:
+    """Compress in the MySQL COMPRESS() format (little-endian length + zlib), readable with UNCOMPRESS()"""
+    return struct.pack('<I', len(data)) + zlib.compress(data, 9)
+
+def decompress_payload(payload: bytes) -> bytes:
+    """Inverse of compress_payload (MySQL UNCOMPRESS())"""
+    return zlib.decompress(payload[4:]) if payload else b''
+
+def canonical_payload(raw_json) -> bytes:
+    """JSON encoding that store_raw_response hashes and stores: sorted keys, no whitespace"""
+    return json.dumps(raw_json, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+def store_raw_response(cursor, raw_json, endpoint: str, base_currency: str):
+    """
+    Store an API response once in FX_RAW_RESPONSE_TABLE and return its id.
+
+    Payloads are keyed by the SHA-256 of their canonical JSON, so storing
+    the same response again returns the existing id. Returns None when
+    there is nothing to store or the insert fails.
+    """
+    if not raw_json:
+        return None
+    data = canonical_payload(raw_json)
+    try:
+        cursor.execute(f"""
+            INSERT INTO {FX_RAW_RESPONSE_TABLE} (
+                content_hash, provider, endpoint, base_currency, payload_length, payload
+            )
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
+        """, (hashlib.sha256(data).digest(), FX_PROVIDER, endpoint, base_currency,
+              len(data), compress_payload(data)))
+        return cursor.lastrowid
+    except mysql.connector.Error as err:
+        logging.error(f"Failed to store {endpoint} response for {base_currency}: {err}")
+        return None
+
+def rehash_migrated_rows(cursor):
+    """
+    Re-key the payloads moved over by the fx_raw_responses migration.
+
+    The migration hashed MySQL's own JSON text, which never matches the
+    canonical JSON that store_raw_response hashes, so an API response that
+    was already stored would be stored again. Migrated payloads (endpoint
+    NULL) are rewritten in canonical form under the canonical hash; when
+    that hash is already stored, the rates are pointed at the existing
+    payload and the migrated copy is deleted. Returns (rehashed, merged).
+    """
+    cursor.execute(f"SELECT id, content_hash, payload FROM {FX_RAW_RESPONSE_TABLE} WHERE endpoint IS NULL")
+    rehashed = merged = 0
+    for response_id, content_hash, payload in cursor.fetchall():
+        data = canonical_payload(json.loads(decompress_payload(payload)))
+        canonical_hash = hashlib.sha256(data).digest()
+        if canonical_hash == bytes(content_hash):
+            continue
+        cursor.execute(f"SELECT id FROM {FX_RAW_RESPONSE_TABLE} WHERE content_hash = %s", (canonical_hash,))
+        existing = cursor.fetchone()
+        if existing:
+            cursor.execute(f"UPDATE {FX_TABLE_NAME} SET raw_response_id = %s WHERE raw_response_id = %s",
+                           (existing[0], response_id))
+            cursor.execute(f"DELETE FROM {FX_RAW_RESPONSE_TABLE} WHERE id = %s", (response_id,))
+            merged += 1
+        else:
+            cursor.execute(f"""
+                UPDATE {FX_RAW_RESPONSE_TABLE}
+                SET content_hash = %s, payload_length = %s, payload = %s
+                WHERE id = %s
+            """, (canonical_hash, len(data), compress_payload(data), response_id))
+            rehashed += 1
+    return rehashed, merged
+
+def rehash_migrated_responses():
+    """Run rehash_migrated_rows in one transaction; returns True on success"""
+    cnx = None
+    cursor = None
+    try:
+        cnx = connect_mysql(**{k: v for k, v in db_config.items() if k != 'cursorclass'})
+        cursor = cnx.cursor()
+        rehashed, merged = rehash_migrated_rows(cursor)
+        cnx.commit()
+        logging.info(f"Migrated FX responses - Rehashed: {rehashed}, Merged into stored responses: {merged}")
+        return True
+    except mysql.connector.Error as err:
+        if cnx:
+            cnx.rollback()
+        logging.error(f"MySQL operation failed: {err}")
+        return False
+    except Exception as e:
+        logging.exception(f"Unexpected error occurred: {e}")
+        return False
+    finally:
+        if cursor:
+            cursor.close()
+        if cnx and cnx.is_connected():
+            cnx.close()
+
 def insert_fx_rates_batch(cursor, fx_rates_data):
-    """Insert or update multiple FX rates in database using batch processing"""
+    """
+    Insert or update multiple FX rates in database using batch processing.
+
+    Rows are (base, target, rate, date, provider, raw_response_id, raw_response):
+    raw_response_id references the stored API response, raw_response only
+    holds small notes such as the source date of a carried-forward rate.
+    """
     if not fx_rates_data:
         return 0, 0
         
     sql = f"""
     INSERT INTO {FX_TABLE_NAME} (
-        base_currency, target_currency, exchange_rate, rate_date, provider, raw_response
+        base_currency, target_currency, exchange_rate, rate_date, provider, raw_response_id, raw_response
     )
-    VALUES (%s, %s, %s, %s, %s, %s)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
     ON DUPLICATE KEY UPDATE
         exchange_rate = VALUES(exchange_rate),
+        raw_response_id = VALUES(raw_response_id),
         raw_response = VALUES(raw_response),
         updated_at = CURRENT_TIMESTAMP
     """
@@ -149,6 +318,112 @@ def insert_fx_rates_batch(cursor, fx_rates_data):
         logging.error(f"Failed to insert FX rates batch: {err}")
         return 0, len(fx_rates_data)
 
+def fetch_rates_per_base(cursor, today_str):
+    """One API call per base currency in CURRENCY_PAIRS_BY_BASE; returns (rows, api_calls, errors)"""
+    fx_rates_batch = []
+    api_call_count = 0
+    error_count = 0
+
+    # Process each base currency
+    base_currencies = list(CURRENCY_PAIRS_BY_BASE.keys())
+    for i, (base_curr, target_currs_list) in enumerate(CURRENCY_PAIRS_BY_BASE.items()):
+        if base_curr == "SEK":
+            continue
+
+        logging.info(f"Processing {base_curr} to {len(target_currs_list)} target currencies ({i+1}/{len(base_currencies)})")
+
+        rates, raw_json = get_fx_data_freecurrencyapi(
+            api_key=API_KEY,
+            base_currency=base_curr,
+            target_currencies=target_currs_list
+        )
+        api_call_count += 1
+
+        if rates:
+            raw_response_id = store_raw_response(cursor, raw_json, 'latest', base_curr)
+            for target_curr in target_currs_list:
+                rate = rates.get(target_curr)
+                if rate is not None and isinstance(rate, (int, float)):
+                    fx_rates_batch.append((
+                        base_curr, target_curr, rate, today_str,
+                        FX_PROVIDER, raw_response_id, None
+                    ))
+                    logging.info(f"Added {base_curr}/{target_curr} = {rate} to batch")
+                else:
+                    logging.warning(f"Invalid rate for {base_curr}/{target_curr}: {rate}")
+                    error_count += 1
+        else:
+            logging.warning(f"No data received for {base_curr}")
+            error_count += len(target_currs_list)
+
+        # Rate limiting: pause between API calls (except for last one)
+        if i < len(base_currencies) - 1:
+            logging.info(f"Pausing {API_PAUSE_SECONDS} seconds for API rate limiting...")
+            time.sleep(API_PAUSE_SECONDS)
+
+    return fx_rates_batch, api_call_count, error_count
+
+def fetch_rates_anchor(cursor, today_str):
+    """
+    One API call for FX_ANCHOR_CURRENCY quoted in every needed currency;
+    all pairs are derived from the cross-rate matrix. Returns (rows, api_calls, errors).
+    """
+    currencies = [c for c in currencies_for(CURRENCY_PAIRS_TO_FETCH) if c != FX_ANCHOR_CURRENCY]
+    logging.info(f"Fetching {FX_ANCHOR_CURRENCY} quotes for {len(currencies)} currencies (anchor mode)")
+    rates, raw_json = get_fx_data_freecurrencyapi(
+        api_key=API_KEY,
+        base_currency=FX_ANCHOR_CURRENCY,
+        target_currencies=currencies
+    )
+    api_call_count = 1
+    if not rates:
+        logging.warning(f"No data received for anchor currency {FX_ANCHOR_CURRENCY}")
+        return [], api_call_count, len(CURRENCY_PAIRS_TO_FETCH)
+
+    raw_response_id = store_raw_response(cursor, raw_json, 'latest', FX_ANCHOR_CURRENCY)
+    matrix = CrossRateMatrix(FX_ANCHOR_CURRENCY, {c: r for c, r in rates.items() if isinstance(r, (int, float))})
+    missing = matrix.missing(CURRENCY_PAIRS_TO_FETCH)
+    error_count = len(missing)
+    for base_curr, target_curr in missing:
+        logging.warning(f"Cannot derive {base_curr}/{target_curr}: currency not quoted against {FX_ANCHOR_CURRENCY}")
+
+    pairs = [pair for pair in CURRENCY_PAIRS_TO_FETCH if pair not in missing]
+    fx_rates_batch = []
+    for (base_curr, target_curr), rate in zip(pairs, matrix.rates(pairs)):
+        fx_rates_batch.append((
+            base_curr, target_curr, float(rate), today_str,
+            FX_PROVIDER, raw_response_id, None
+        ))
+        logging.info(f"Derived {base_curr}/{target_curr} = {rate:.6f}")
+
+    # Optional check of derived rates against direct quotes for a few bases
+    for verify_base in FX_VERIFY_BASES:
+        if verify_base not in matrix:
+            logging.warning(f"Cannot verify {verify_base}: not quoted against {FX_ANCHOR_CURRENCY}")
+            continue
+        logging.info(f"Pausing {API_PAUSE_SECONDS} seconds for API rate limiting...")
+        time.sleep(API_PAUSE_SECONDS)
+        quoted_rates, _ = get_fx_data_freecurrencyapi(
+            api_key=API_KEY,
+            base_currency=verify_base,
+            target_currencies=[c for c in matrix.currencies if c != verify_base]
+        )
+        api_call_count += 1
+        if not quoted_rates:
+            logging.warning(f"No data received for consistency check base {verify_base}")
+            continue
+        quoted = {(verify_base, target): rate for target, rate in quoted_rates.items()
+                  if isinstance(rate, (int, float)) and rate > 0}
+        deviations = check_consistency(matrix, quoted, FX_CONSISTENCY_TOLERANCE)
+        for (base_curr, target_curr), quoted_rate, derived_rate, deviation in deviations:
+            logging.warning(f"Derived {base_curr}/{target_curr} = {derived_rate:.6f} differs from "
+                            f"quoted {quoted_rate:.6f} by {deviation:.3%}")
+        error_count += len(deviations)
+        logging.info(f"Consistency check against {verify_base}: {len(quoted)} quoted pairs, "
+                     f"{len(deviations)} above {FX_CONSISTENCY_TOLERANCE:.2%} tolerance")
+
+    return fx_rates_batch, api_call_count, error_count
+
 def daily_update():
     """Perform daily FX rates update"""
     total_entered_count = 0
@@ -169,7 +444,7 @@ def daily_update():
             
         # Connect to MySQL
         logging.info("Connecting to MySQL database...")
-        cnx = mysql.connector.connect(**{k: v for k, v in db_config.items() if k != 'cursorclass'})
+        cnx = connect_mysql(**{k: v for k, v in db_config.items() if k != 'cursorclass'})
         cursor = cnx.cursor()
         logging.info("Successfully connected to MySQL database")
         
@@ -181,45 +456,19 @@ def daily_update():
         
         # Always ensure SEK/SEK = 1.0 (no API call needed)
         fx_rates_batch.append((
-            "SEK", "SEK", 1.0, today_str, "freecurrencyapi", json.dumps({})
+            "SEK", "SEK", 1.0, today_str, FX_PROVIDER, None, None
         ))
         logging.info("Added SEK/SEK = 1.0 to batch")
 
-        # Process each base currency
-        base_currencies = list(CURRENCY_PAIRS_BY_BASE.keys())
-        for i, (base_curr, target_currs_list) in enumerate(CURRENCY_PAIRS_BY_BASE.items()):
-            if base_curr == "SEK":
-                continue
-                
-            logging.info(f"Processing {base_curr} to {len(target_currs_list)} target currencies ({i+1}/{len(base_currencies)})")
-            
-            rates, raw_json = get_fx_data_freecurrencyapi(
-                api_key=API_KEY,
-                base_currency=base_curr,
-                target_currencies=target_currs_list
-            )
-            api_call_count += 1
-            
-            if rates:
-                for target_curr in target_currs_list:
-                    rate = rates.get(target_curr)
-                    if rate is not None and isinstance(rate, (int, float)):
-                        fx_rates_batch.append((
-                            base_curr, target_curr, rate, today_str, 
-                            "freecurrencyapi", json.dumps(raw_json)
-                        ))
-                        logging.info(f"Added {base_curr}/{target_curr} = {rate} to batch")
-                    else:
-                        logging.warning(f"Invalid rate for {base_curr}/{target_curr}: {rate}")
-                        error_count += 1
-            else:
-                logging.warning(f"No data received for {base_curr}")
-                error_count += len(target_currs_list)
-                
-            # Rate limiting: pause between API calls (except for last one)
-            if i < len(base_currencies) - 1:
-                logging.info("Pausing 6 seconds for API rate limiting...")
-                time.sleep(6)
+        if FX_FETCH_MODE == 'anchor' and CrossRateMatrix is not None:
+            rates_batch, calls, errors = fetch_rates_anchor(cursor, today_str)
+        else:
+            if FX_FETCH_MODE == 'anchor':
+                logging.warning("numpy is not installed; falling back to one API call per base currency")
+            rates_batch, calls, errors = fetch_rates_per_base(cursor, today_str)
+        fx_rates_batch.extend(rates_batch)
+        api_call_count += calls
+        error_count += errors
         
         # Process all FX rates in batch
         if fx_rates_batch:
@@ -248,7 +497,189 @@ def daily_update():
             cnx.close()
             logging.info("Database connection closed")
 
-def main():
+def load_stored_rates(cursor, date_from: date, date_to: date):
+    """Stored rates per day in a date range: {date: {(base, target): rate}}"""
+    cursor.execute(f"""
+        SELECT base_currency, target_currency, exchange_rate, rate_date
+        FROM {FX_TABLE_NAME}
+        WHERE rate_date BETWEEN %s AND %s
+    """, (date_from, date_to))
+    stored = defaultdict(dict)
+    for base_curr, target_curr, rate, rate_date in cursor.fetchall():
+        stored[rate_date][(base_curr, target_curr)] = float(rate)
+    return stored
+
+def load_last_rates_before(cursor, day: date):
+    """Most recent stored rate before a day for every pair: {(base, target): (rate, rate_date)}"""
+    cursor.execute(f"""
+        SELECT f.base_currency, f.target_currency, f.exchange_rate, f.rate_date
+        FROM {FX_TABLE_NAME} f
+        JOIN (
+            SELECT base_currency, target_currency, MAX(rate_date) AS rate_date
+            FROM {FX_TABLE_NAME}
+            WHERE rate_date < %s
+            GROUP BY base_currency, target_currency
+        ) latest ON latest.base_currency = f.base_currency
+                 AND latest.target_currency = f.target_currency
+                 AND latest.rate_date = f.rate_date
+    """, (day,))
+    return {(base_curr, target_curr): (float(rate), rate_date)
+            for base_curr, target_curr, rate, rate_date in cursor.fetchall()}
+
+def contiguous_ranges(days, max_days):
+    """Group sorted dates into (first, last) ranges of consecutive days, at most max_days long"""
+    ranges = []
+    for day in days:
+        if ranges and day - ranges[-1][1] == timedelta(days=1) and (day - ranges[-1][0]).days < max_days:
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [tuple(r) for r in ranges]
+
+def backfill_rows(all_days, missing_days, pairs, stored, quotes, last_known, failed_days=(),
+                  carry_forward: bool = True):
+    """
+    Rows to insert for a backfill and (fetched, carried forward, unfilled) counts.
+
+    quotes maps each day a successful response covered to ({pair: rate},
+    raw_response_id). Days a successful response omitted (weekends,
+    holidays) get the last known rate carried forward. Days in failed_days,
+    whose API call failed, get nothing and nothing is carried across them,
+    so the next backfill fetches them again.
+    """
+    last_known = dict(last_known)
+    missing = set(missing_days)
+    rows = []
+    fetched = carried = unfilled = 0
+    for day in all_days:
+        day_stored = stored.get(day, {})
+        day_quotes, raw_response_id = quotes.get(day, ({}, None))
+        for pair in pairs:
+            base_curr, target_curr = pair
+            if pair in day_stored:
+                last_known[pair] = (day_stored[pair], day)
+                continue
+            if day not in missing:
+                continue
+            if day in failed_days:
+                # The rate of this day is unknown; a later carry-forward would be stale
+                last_known.pop(pair, None)
+                unfilled += 1
+            elif pair == ("SEK", "SEK"):
+                rows.append(("SEK", "SEK", 1.0, day, FX_PROVIDER, None, None))
+            elif pair in day_quotes:
+                rows.append((base_curr, target_curr, day_quotes[pair], day, FX_PROVIDER, raw_response_id, None))
+                last_known[pair] = (day_quotes[pair], day)
+                fetched += 1
+            elif carry_forward and pair in last_known:
+                rate, source_day = last_known[pair]
+                rows.append((base_curr, target_curr, rate, day, FX_PROVIDER, None,
+                             json.dumps({"carried_forward_from": source_day.isoformat()})))
+                carried += 1
+            else:
+                unfilled += 1
+    return rows, (fetched, carried, unfilled)
+
+def backfill(date_from: date, date_to: date, carry_forward: bool = True):
+    """
+    Fill missing daily rates for every configured pair between two dates.
+
+    Days where any pair is missing are fetched from the historical endpoint
+    in ranges of up to FX_BACKFILL_DAYS_PER_CALL days, one anchor-currency
+    call per range, and the pairs are derived from the cross-rate matrix.
+    Days a successful response has no rates for (weekends, holidays) get
+    the last known rate carried forward; their raw_response records the
+    source date. Ranges whose API call fails are left empty and the backfill
+    returns False, so they are fetched again next time. Rates already stored
+    are never overwritten.
+    """
+    if CrossRateMatrix is None:
+        logging.error("The FX backfill derives pairs with numpy, which is not installed")
+        return False
+
+    pairs = list(CURRENCY_PAIRS_TO_FETCH) + [("SEK", "SEK")]
+    api_call_count = 0
+    failed_ranges = 0
+
+    cnx = None
+    cursor = None
+    try:
+        cnx = connect_mysql(**{k: v for k, v in db_config.items() if k != 'cursorclass'})
+        cursor = cnx.cursor()
+
+        stored = load_stored_rates(cursor, date_from, date_to)
+        all_days = [date_from + timedelta(days=n) for n in range((date_to - date_from).days + 1)]
+        missing_days = [day for day in all_days if any(pair not in stored.get(day, {}) for pair in pairs)]
+        logging.info(f"FX backfill {date_from} - {date_to}: {len(missing_days)} of {len(all_days)} days have missing pairs")
+        if not missing_days:
+            return True
+
+        # Fetch quotes for the missing days, one call per contiguous range
+        currencies = [c for c in currencies_for(CURRENCY_PAIRS_TO_FETCH) if c != FX_ANCHOR_CURRENCY]
+        quotes = {}  # date -> ({pair: rate}, raw_response_id of the call)
+        failed_days = set()
+        ranges = contiguous_ranges(missing_days, FX_BACKFILL_DAYS_PER_CALL)
+        for i, (range_start, range_end) in enumerate(ranges):
+            if i > 0:
+                logging.info(f"Pausing {API_PAUSE_SECONDS} seconds for API rate limiting...")
+                time.sleep(API_PAUSE_SECONDS)
+            history, raw_json = get_fx_history_freecurrencyapi(API_KEY, FX_ANCHOR_CURRENCY, currencies, range_start, range_end)
+            api_call_count += 1
+            if history is None:
+                logging.error(f"No historical rates for {range_start} - {range_end}; leaving the range for the next backfill")
+                failed_ranges += 1
+                failed_days.update(range_start + timedelta(days=n) for n in range((range_end - range_start).days + 1))
+                continue
+            raw_response_id = store_raw_response(cursor, raw_json, 'historical', FX_ANCHOR_CURRENCY)
+            for day, day_rates in history.items():
+                matrix = CrossRateMatrix(FX_ANCHOR_CURRENCY, {c: r for c, r in day_rates.items() if isinstance(r, (int, float))})
+                derivable = [pair for pair in CURRENCY_PAIRS_TO_FETCH if pair not in matrix.missing([pair])]
+                quotes[day] = (dict(zip(derivable, (float(r) for r in matrix.rates(derivable)))), raw_response_id)
+
+        # Walk every day so carry-forward also picks up rates that were already stored
+        last_known = load_last_rates_before(cursor, date_from) if carry_forward else {}
+        fx_rates_batch, (fetched_count, carried_count, unfilled_count) = backfill_rows(
+            all_days, missing_days, pairs, stored, quotes, last_known, failed_days, carry_forward)
+
+        inserted = errors = 0
+        for chunk_start in range(0, len(fx_rates_batch), 1000):
+            chunk_inserted, chunk_errors = insert_fx_rates_batch(cursor, fx_rates_batch[chunk_start:chunk_start + 1000])
+            inserted += chunk_inserted
+            errors += chunk_errors
+        cnx.commit()
+        logging.info(f"FX backfill summary - API calls: {api_call_count}, Failed ranges: {failed_ranges}, "
+                     f"Fetched: {fetched_count}, Carried forward: {carried_count}, Unfilled: {unfilled_count}, "
+                     f"Inserted: {inserted}, Errors: {errors}")
+        return errors == 0 and failed_ranges == 0
+
+    except mysql.connector.Error as err:
+        logging.error(f"MySQL operation failed: {err}")
+        return False
+    except Exception as e:
+        logging.exception(f"Unexpected error occurred: {e}")
+        return False
+    finally:
+        if cursor:
+            cursor.close()
+        if cnx and cnx.is_connected():
+            cnx.close()
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def main(argv=()):
+    parser = argparse.ArgumentParser(description="Update FX rates from FreeCurrency API")
+    parser.add_argument('--backfill-from', type=_parse_date, metavar='YYYY-MM-DD',
+                        help="Backfill missing daily rates from this date instead of the daily update")
+    parser.add_argument('--backfill-to', type=_parse_date, metavar='YYYY-MM-DD',
+                        default=date.today() - timedelta(days=1),
+                        help="Last date to backfill (default: yesterday)")
+    parser.add_argument('--no-carry-forward', action='store_true',
+                        help="Leave days without quotes (weekends, holidays) empty when backfilling")
+    parser.add_argument('--rehash-raw-responses', action='store_true',
+                        help="Re-key the API responses moved into fx_raw_responses by its migration")
+    args = parser.parse_args(argv)
+
     start = datetime.now()
     # Console delimiter (clean display)
     print("="*50)
@@ -259,13 +690,19 @@ def main():
     logging.info("FX RATES FREECURRENCY SCRIPT STARTED")
     logging.info("="*50)
     
-    success = daily_update()
+    if args.rehash_raw_responses:
+        success = rehash_migrated_responses()
+    elif args.backfill_from:
+        success = backfill(args.backfill_from, args.backfill_to, carry_forward=not args.no_carry_forward)
+    else:
+        success = daily_update()
     
     duration = datetime.now() - start
     if success:
         logging.info(f"Script completed successfully. Duration: {duration}.")
-    else:
-        logging.error(f"Script completed with errors. Duration: {duration}.")
+        return 0
+    logging.error(f"Script completed with errors. Duration: {duration}.")
+    return 1
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main(sys.argv[1:]))
\ No newline at end of file
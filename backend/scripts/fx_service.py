@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+In-memory FX conversion for PSW 4.0
+
+FXRates loads fx_rates_freecurrency once into sorted NumPy arrays (one
+series of dates and SEK rates per currency) and converts whole columns of
+amounts at a time:
+
+    rates = FXRates.load()
+    sek = rates.convert(amounts, 'USD', 'SEK', payment_dates)
+    eur = rates.convert(amounts, currencies, 'EUR', payment_dates)
+
+Lookups are as-of: the rate used for a date is the latest stored rate on or
+before that date, so weekends and holidays use the previous rate. Every
+conversion is triangulated through SEK (amount * from->SEK / to->SEK); a
+currency's SEK series comes from its X/SEK rows, or the inverse of SEK/X
+rows when only those exist. Amounts that cannot be converted (unknown
+currency, date before the first rate) come back as NaN.
+
+Run as a script to serve conversions over HTTP on localhost for PHP pages
+and other local callers:
+
+    python fx_service.py --port 8765
+
+    GET  /convert?amount=100&from=USD&to=SEK&date=2024-05-17
+    POST /convert  {"amounts": [...], "from": "USD" | [...], "to": "SEK" | [...], "dates": "2024-05-17" | [...]}
+    POST /reload   re-read the FX table
+
+Requires numpy.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+from collections import defaultdict
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+from dotenv import load_dotenv
+
+from shared_resources import connect_mysql
+
+FX_TABLE_NAME = "fx_rates_freecurrency"
+PIVOT_CURRENCY = "SEK"
+DEFAULT_PORT = 8765
+
+logger = logging.getLogger(__name__)
+
+
+class FXRates:
+    """As-of FX rates for every currency against SEK, held as sorted arrays"""
+
+    def __init__(self, series: Dict[str, Tuple[np.ndarray, np.ndarray]]):
+        """series maps a currency to (sorted datetime64[D] dates, SEK per unit)"""
+        self.series = series
+        self.loaded_at = datetime.now()
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[str, str, date, float]]) -> 'FXRates':
+        """Build from (base_currency, target_currency, rate_date, exchange_rate) rows"""
+        direct = defaultdict(dict)
+        inverse = defaultdict(dict)
+        for base_curr, target_curr, rate_date, rate in rows:
+            if rate is None or float(rate) <= 0:
+                continue
+            if target_curr == PIVOT_CURRENCY and base_curr != PIVOT_CURRENCY:
+                direct[base_curr][rate_date] = float(rate)
+            elif base_curr == PIVOT_CURRENCY and target_curr != PIVOT_CURRENCY:
+                inverse[target_curr][rate_date] = 1.0 / float(rate)
+
+        series = {}
+        for currency in set(direct) | set(inverse):
+            by_date = dict(inverse.get(currency, {}))
+            by_date.update(direct.get(currency, {}))  # quoted X/SEK wins over 1 / (SEK/X)
+            days = sorted(by_date)
+            series[currency] = (np.array(days, dtype='datetime64[D]'),
+                                np.array([by_date[d] for d in days], dtype=np.float64))
+        return cls(series)
+
+    @classmethod
+    def load(cls, cnx=None) -> 'FXRates':
+        """Read the whole FX table (using cnx, or a new connection from the DB_* environment)"""
+        own_connection = cnx is None
+        if own_connection:
+            cnx = connect_mysql(
+                host=os.getenv('DB_HOST'),
+                user=os.getenv('DB_USERNAME'),
+                password=os.getenv('DB_PASSWORD'),
+                port=int(os.getenv('DB_PORT', 3306)),
+                database=os.getenv('DB_MARKETDATA'),
+                charset='utf8mb4',
+                use_unicode=True
+            )
+        try:
+            cursor = cnx.cursor()
+            cursor.execute(f"""
+                SELECT base_currency, target_currency, rate_date, exchange_rate
+                FROM {FX_TABLE_NAME}
+                WHERE base_currency = %s OR target_currency = %s
+            """, (PIVOT_CURRENCY, PIVOT_CURRENCY))
+            rates = cls.from_rows(cursor.fetchall())
+            cursor.close()
+        finally:
+            if own_connection:
+                cnx.close()
+        logger.info(f"Loaded FX rates for {len(rates.series)} currencies "
+                    f"({sum(len(d) for d, _ in rates.series.values())} daily rates)")
+        return rates
+
+    @property
+    def currencies(self):
+        return sorted(set(self.series) | {PIVOT_CURRENCY})
+
+    def to_sek(self, currency: str, dates) -> np.ndarray:
+        """SEK per unit of currency, as of each date (NaN where unknown)"""
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        if currency == PIVOT_CURRENCY:
+            return np.ones(dates.shape)
+        if currency not in self.series:
+            return np.full(dates.shape, np.nan)
+        days, rates = self.series[currency]
+        idx = np.searchsorted(days, dates, side='right') - 1
+        result = rates[np.clip(idx, 0, None)]
+        return np.where(idx >= 0, result, np.nan)
+
+    def _to_sek_many(self, currencies: np.ndarray, dates: np.ndarray) -> np.ndarray:
+        result = np.empty(dates.shape)
+        for currency in np.unique(currencies):
+            mask = currencies == currency
+            result[mask] = self.to_sek(str(currency), dates[mask])
+        return result
+
+    def convert(self, amounts, from_ccy, to_ccy, dates) -> np.ndarray:
+        """
+        Convert amounts between currencies as of the given dates.
+
+        Each argument is a scalar or an array; they are broadcast against
+        each other, so a single currency or date applies to every amount.
+        Returns a float64 array (NaN where no rate is known).
+        """
+        amounts, from_ccy, to_ccy, dates = np.broadcast_arrays(
+            np.asarray(amounts, dtype=np.float64),
+            np.asarray(from_ccy, dtype=str),
+            np.asarray(to_ccy, dtype=str),
+            np.asarray(dates, dtype='datetime64[D]'),
+        )
+        return amounts * self._to_sek_many(from_ccy, dates) / self._to_sek_many(to_ccy, dates)
+
+
+class _ConversionHandler(BaseHTTPRequestHandler):
+    """JSON endpoints for FXService; see the module docstring"""
+
+    service = None  # set by serve()
+
+    def log_message(self, format, *args):
+        logger.info(f"{self.address_string()} {format % args}")
+
+    def _reply(self, status: int, payload: dict):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _convert(self, amounts, from_ccy, to_ccy, dates):
+        converted = self.service.rates.convert(amounts, from_ccy, to_ccy, dates)
+        values = [None if np.isnan(v) else round(float(v), 6) for v in np.atleast_1d(converted)]
+        return values
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/health':
+            rates = self.service.rates
+            self._reply(200, {'currencies': rates.currencies, 'loaded_at': rates.loaded_at.isoformat()})
+            return
+        if url.path != '/convert':
+            self._reply(404, {'error': 'not found'})
+            return
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        try:
+            values = self._convert(float(query['amount']), query['from'], query['to'],
+                                   query.get('date', date.today().isoformat()))
+            self._reply(200, {'converted': values[0]})
+        except (KeyError, ValueError) as e:
+            self._reply(400, {'error': f"invalid request: {e}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == '/reload':
+            self.service.reload()
+            self._reply(200, {'currencies': self.service.rates.currencies})
+            return
+        if url.path != '/convert':
+            self._reply(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            values = self._convert(request['amounts'], request['from'], request['to'],
+                                   request.get('dates', date.today().isoformat()))
+            self._reply(200, {'converted': values})
+        except (KeyError, ValueError, TypeError) as e:
+            self._reply(400, {'error': f"invalid request: {e}"})
+
+
+class FXService:
+    """Holds the current FXRates and swaps in a fresh copy on reload()"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rates = FXRates.load()
+
+    def reload(self):
+        rates = FXRates.load()
+        with self._lock:
+            self.rates = rates
+
+    def serve(self, host: str = '127.0.0.1', port: int = DEFAULT_PORT):
+        handler = type('ConversionHandler', (_ConversionHandler,), {'service': self})
+        server = ThreadingHTTPServer((host, port), handler)
+        logger.info(f"FX conversion service listening on http://{host}:{port}")
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+
+
+def main(argv=None):
+    load_dotenv(dotenv_path='../../.env')
+    parser = argparse.ArgumentParser(description="Serve FX conversions from fx_rates_freecurrency over local HTTP")
+    parser.add_argument('--host', default='127.0.0.1', help="Interface to bind (default: %(default)s)")
+    parser.add_argument('--port', type=int, default=int(os.getenv('FX_SERVICE_PORT', DEFAULT_PORT)),
+                        help="Port to listen on (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s",
+                        datefmt="%Y-%m-%d %H:%M:%S")
+    try:
+        FXService().serve(args.host, args.port)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,11 @@
-import requests
 import pymysql
 import logging
 from datetime import datetime
 import os
 from dotenv import load_dotenv
+from shared_resources import connect_pymysql
+from bulk_loader import refresh_table
+from borsdata_client import BorsdataClient
 
 # Load environment variables from .env file located at project root
 load_dotenv(dotenv_path='../../.env')
@@ -13,7 +15,7 @@ API_KEY = os.getenv('BORSDATA_API_KEY')
 if not API_KEY:
     raise ValueError("BORSDATA_API_KEY not set in environment")
 
-BASE_URL = "https://apiservice.borsdata.se/v1"
+borsdata = BorsdataClient(API_KEY)
 
 db_config = {
     'user': os.getenv('DB_USERNAME'),
@@ -25,6 +27,13 @@ db_config = {
     'cursorclass': pymysql.cursors.DictCursor
 }
 
+# Column order of the rows handed to refresh_table (key column first)
+GLOBAL_INSTRUMENT_COLUMNS = (
+    'insId', 'name', 'ticker', 'isin', 'sectorId', 'urlName', 'instrument',
+    'yahoo', 'marketId', 'branchId', 'countryId', 'listingDate',
+    'stockPriceCurrency', 'reportCurrency'
+)
+
 # === Setup Logging ===
 log_dir = os.getenv('LOG_PATH', "../../storage/logs")
 os.makedirs(log_dir, exist_ok=True)
@@ -54,11 +63,10 @@ logger.addHandler(file_handler)
 logger.addHandler(console_handler)
 
 def fetch_global_instruments():
-    url = f"{BASE_URL}/instruments/global?authKey={API_KEY}"
     logging.info("Fetching global instruments from Börsdata API...")
-    logging.info(f"API endpoint: {BASE_URL}/instruments/global")
+    logging.info(f"API endpoint: {borsdata.url('/v1/instruments/global')}")
     try:
-        response = requests.get(url)
+        response = borsdata.get('/v1/instruments/global')
         response.raise_for_status()
         data = response.json()
 
@@ -80,6 +88,12 @@ def fetch_global_instruments():
         logging.exception(f"Error fetching instruments: {e}")
         return []
 
+def stream_global_instruments():
+    """Yield instrument items one by one from the streamed response (see json_stream.py)"""
+    logging.info("Streaming global instruments from Börsdata API...")
+    logging.info(f"API endpoint: {borsdata.url('/v1/instruments/global')}")
+    yield from borsdata.iter_json('/v1/instruments/global', keys=('instruments', 'data'))
+
 def save_global_instruments(instruments):
     inserted = 0
     errors = 0
@@ -89,7 +103,7 @@ def save_global_instruments(instruments):
         logging.info(f"Database: {db_config['database']}")
         logging.info(f"User: {db_config['user']}")
         
-        conn = pymysql.connect(
+        conn = connect_pymysql(
             user=db_config["user"],
             password=db_config["password"],
             host=db_config["host"],
@@ -99,7 +113,8 @@ def save_global_instruments(instruments):
             cursorclass=pymysql.cursors.DictCursor,
             connect_timeout=10,  # 10 second timeout
             read_timeout=30,     # 30 second read timeout
-            write_timeout=30     # 30 second write timeout
+            write_timeout=30,    # 30 second write timeout
+            local_infile=True    # allows LOAD DATA LOCAL INFILE in bulk_loader
         )
         logging.info("Successfully connected to MySQL database")
         
@@ -140,95 +155,57 @@ def save_global_instruments(instruments):
                 """)
                 logging.info("Table creation completed")
             
-            logging.info(f"About to process {len(instruments)} instruments")
-            
-            # Process in batches for better performance
-            batch_size = 100
-            batch_data = []
-            
-            for i, item in enumerate(instruments):
-                if i % 1000 == 0:  # Log progress every 1000 items
-                    logging.info(f"Processing instrument {i+1}/{len(instruments)}")
-                    
-                if not all(k in item for k in ('insId', 'name', 'ticker', 'sectorId')):
-                    logging.warning(f"Missing keys in instrument item: {item}")
-                    errors += 1
-                    continue
-                    
-                # Log first item for debugging
-                if i == 0:
-                    logging.info(f"First instrument data: {item}")
-                
-                # Prepare data for batch insert
-                data_tuple = (
-                    item['insId'],
-                    item['name'],
-                    item['ticker'],
-                    item.get('isin'),
-                    item['sectorId'],
-                    item.get('urlName'),
-                    item.get('instrument'),
-                    item.get('yahoo'),
-                    item.get('marketId'),
-                    item.get('branchId'),
-                    item.get('countryId'),
-                    item.get('listingDate'),
-                    item.get('stockPriceCurrency'),
-                    item.get('reportCurrency')
-                )
-                batch_data.append(data_tuple)
-                
-                # Process batch when it reaches batch_size or is the last item
-                if len(batch_data) >= batch_size or i == len(instruments) - 1:
-                    try:
-                        if i == 0:
-                            logging.info("Attempting first batch INSERT...")
-                        
-                        # Execute batch insert
-                        cursor.executemany("""
-                            INSERT INTO global_instruments (
-                                insId, name, ticker, isin, sectorId, urlName, instrument, 
-                                yahoo, marketId, branchId, countryId, listingDate, 
-                                stockPriceCurrency, reportCurrency
-                            )
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                            ON DUPLICATE KEY UPDATE
-                                name=VALUES(name),
-                                ticker=VALUES(ticker),
-                                isin=VALUES(isin),
-                                sectorId=VALUES(sectorId),
-                                urlName=VALUES(urlName),
-                                instrument=VALUES(instrument),
-                                yahoo=VALUES(yahoo),
-                                marketId=VALUES(marketId),
-                                branchId=VALUES(branchId),
-                                countryId=VALUES(countryId),
-                                listingDate=VALUES(listingDate),
-                                stockPriceCurrency=VALUES(stockPriceCurrency),
-                                reportCurrency=VALUES(reportCurrency)
-                        """, batch_data)
-                        
-                        inserted += len(batch_data)
-                        
-                        if i == 0:
-                            logging.info("First batch INSERT successful!")
-                        
-                        # Commit every 1000 records for safety
-                        if inserted % 1000 == 0 or i == len(instruments) - 1:
-                            conn.commit()
-                            logging.info(f"Committed {inserted} records to database")
-                        
-                        batch_data = []  # Clear batch for next set
-                        
-                    except Exception as e:
-                        logging.error(f"Failed to insert batch at item {i}: {e}")
-                        errors += len(batch_data)
-                        batch_data = []  # Clear failed batch
+            # instruments may be a list or a stream; rows are generated one at a
+            # time and handed straight to the bulk loader
+            counts = {'rows': 0, 'errors': 0}
+
+            def instrument_rows():
+                for i, item in enumerate(instruments):
+                    if i % 1000 == 0:  # Log progress every 1000 items
+                        logging.info(f"Processing instrument {i+1}")
+
+                    if not all(k in item for k in ('insId', 'name', 'ticker', 'sectorId')):
+                        logging.warning(f"Missing keys in instrument item: {item}")
+                        counts['errors'] += 1
+                        continue
+
+                    # Log first item for debugging
+                    if i == 0:
+                        logging.info(f"First instrument data: {item}")
+
+                    counts['rows'] += 1
+                    yield (
+                        item['insId'],
+                        item['name'],
+                        item['ticker'],
+                        item.get('isin'),
+                        item['sectorId'],
+                        item.get('urlName'),
+                        item.get('instrument'),
+                        item.get('yahoo'),
+                        item.get('marketId'),
+                        item.get('branchId'),
+                        item.get('countryId'),
+                        item.get('listingDate'),
+                        item.get('stockPriceCurrency'),
+                        item.get('reportCurrency')
+                    )
             
-            # Final commit
-            conn.commit()
+            # Write only changed rows (or, with FULL_REFRESH_MODE=swap, shadow-load and swap)
+            try:
+                result = refresh_table(conn, 'global_instruments', GLOBAL_INSTRUMENT_COLUMNS, instrument_rows(),
+                                       update_columns=GLOBAL_INSTRUMENT_COLUMNS[1:],
+                                       required_columns=('insId', 'name'))
+                inserted = result['written']
+                logging.info(f"Refresh summary for global_instruments: {result}")
+            except Exception as e:
+                logging.error(f"Failed to bulk load instruments: {e}")
+                errors += counts['rows']
+            errors += counts['errors']
+            if not counts['rows']:
+                logging.warning("No global instruments found or fetched.")
         conn.close()
-        logging.info(f"Inserted/updated {inserted} instruments into the database.")
+        logging.info(f"Wrote {inserted} changed instruments to the database.")
         if errors:
             logging.warning(f"{errors} instruments failed to insert.")
     except Exception as e:
@@ -244,11 +221,14 @@ def main():
     logging.info("="*50)
     logging.info("GLOBAL INSTRUMENTS SCRIPT STARTED")
     logging.info("="*50)
-    instruments = fetch_global_instruments()
-    if instruments:
-        save_global_instruments(instruments)
+    if os.getenv('BORSDATA_STREAM_JSON', '1') != '0':
+        save_global_instruments(stream_global_instruments())
     else:
-        logging.warning("No global instruments found or fetched.")
+        instruments = fetch_global_instruments()
+        if instruments:
+            save_global_instruments(instruments)
+        else:
+            logging.warning("No global instruments found or fetched.")
     duration = datetime.now() - start
     logging.info(f"Script finished. Duration: {duration}.")
 
@@ -4,6 +4,10 @@ import logging
 from datetime import datetime
 import os
 from dotenv import load_dotenv
+from shared_resources import connect_pymysql
+from bulk_loader import refresh_table
+from price_history import append_latest_prices
+from borsdata_client import BorsdataClient
 
 # Load environment variables from .env file located at project root
 load_dotenv(dotenv_path='../../.env')
@@ -13,7 +17,7 @@ API_KEY = os.getenv('BORSDATA_API_KEY')
 if not API_KEY:
     raise ValueError("BORSDATA_API_KEY not set in environment")
 
-BASE_URL = "https://apiservice.borsdata.se/v1"
+borsdata = BorsdataClient(API_KEY)
 
 db_config = {
     'user': os.getenv('DB_USERNAME'),
@@ -25,6 +29,9 @@ db_config = {
     'cursorclass': pymysql.cursors.DictCursor
 }
 
+# Column order of the rows handed to refresh_table (key column first)
+PRICE_COLUMNS = ('instrument_id', 'closing_price', 'price_date')
+
 # === Setup Logging ===
 log_dir = os.getenv('LOG_PATH', "../../storage/logs")
 os.makedirs(log_dir, exist_ok=True)
@@ -54,11 +61,10 @@ logger.addHandler(file_handler)
 logger.addHandler(console_handler)
 
 def fetch_latest_prices():
-    url = f"{BASE_URL}/instruments/stockprices/global/last?authKey={API_KEY}"
     logging.info("Fetching global latest prices from Börsdata API...")
-    logging.info(f"API endpoint: {BASE_URL}/instruments/stockprices/global/last")
+    logging.info(f"API endpoint: {borsdata.url('/v1/instruments/stockprices/global/last')}")
     try:
-        response = requests.get(url)
+        response = borsdata.get('/v1/instruments/stockprices/global/last')
         response.raise_for_status()
         data = response.json()
         
@@ -84,19 +90,27 @@ def fetch_latest_prices():
         logging.exception(f"Error fetching prices: {e}")
         return []
 
+def stream_latest_prices():
+    """Yield price items one by one from the streamed response (see json_stream.py)"""
+    logging.info("Streaming global latest prices from Börsdata API...")
+    logging.info(f"API endpoint: {borsdata.url('/v1/instruments/stockprices/global/last')}")
+    yield from borsdata.iter_json('/v1/instruments/stockprices/global/last',
+                                  keys=('stockPricesList', 'stockPrices', 'prices', 'data'))
+
 def save_latest_prices(prices):
     inserted = 0
     errors = 0
     logging.info("Connecting to MySQL database...")
     try:
-        conn = pymysql.connect(
+        conn = connect_pymysql(
             user=db_config["user"],
             password=db_config["password"],
             host=db_config["host"],
             port=db_config["port"],
             database=db_config["database"],
             charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor
+            cursorclass=pymysql.cursors.DictCursor,
+            local_infile=True  # allows LOAD DATA LOCAL INFILE in bulk_loader
         )
         with conn.cursor() as cursor:
             cursor.execute("""
@@ -106,55 +120,44 @@ def save_latest_prices(prices):
                     price_date DATE
                 )
             """)
-            logging.info(f"About to process {len(prices)} price records")
-            
-            # Process in batches for better performance
-            batch_size = 100
-            batch_data = []
-            
-            for i, item in enumerate(prices):
-                if i % 1000 == 0:  # Log progress every 1000 items
-                    logging.info(f"Processing price record {i+1}/{len(prices)}")
-                    
-                if not all(k in item for k in ('i', 'c', 'd')):
-                    logging.warning(f"Missing keys in price item: {item}")
-                    errors += 1
-                    continue
-                
-                # Prepare data for batch insert
-                data_tuple = (item['i'], item['c'], item['d'])
-                batch_data.append(data_tuple)
-                
-                # Process batch when it reaches batch_size or is the last item
-                if len(batch_data) >= batch_size or i == len(prices) - 1:
-                    try:
-                        # Execute batch insert
-                        cursor.executemany("""
-                            INSERT INTO global_latest_prices (instrument_id, closing_price, price_date)
-                            VALUES (%s, %s, %s)
-                            ON DUPLICATE KEY UPDATE
-                                closing_price=VALUES(closing_price),
-                                price_date=VALUES(price_date)
-                        """, batch_data)
-                        
-                        inserted += len(batch_data)
-                        
-                        # Commit every 1000 records for safety
-                        if inserted % 1000 == 0 or i == len(prices) - 1:
-                            conn.commit()
-                            logging.info(f"Committed {inserted} price records to database")
-                        
-                        batch_data = []  # Clear batch for next set
-                        
-                    except Exception as e:
-                        logging.error(f"Failed to insert price batch at item {i}: {e}")
-                        errors += len(batch_data)
-                        batch_data = []  # Clear failed batch
+            # prices may be a list or a stream; rows are generated one at a time
+            # and handed straight to the bulk loader
+            counts = {'rows': 0, 'errors': 0}
+
+            def price_rows():
+                for i, item in enumerate(prices):
+                    if i % 1000 == 0:  # Log progress every 1000 items
+                        logging.info(f"Processing price record {i+1}")
+
+                    if not all(k in item for k in ('i', 'c', 'd')):
+                        logging.warning(f"Missing keys in price item: {item}")
+                        counts['errors'] += 1
+                        continue
+
+                    counts['rows'] += 1
+                    yield (item['i'], item['c'], item['d'])
             
-            # Final commit
-            conn.commit()
+            # Write only changed rows (or, with FULL_REFRESH_MODE=swap, shadow-load and swap)
+            try:
+                result = refresh_table(conn, 'global_latest_prices', PRICE_COLUMNS, price_rows(),
+                                       update_columns=PRICE_COLUMNS[1:],
+                                       required_columns=PRICE_COLUMNS)
+                inserted = result['written']
+                logging.info(f"Refresh summary for global_latest_prices: {result}")
+            except Exception as e:
+                logging.error(f"Failed to bulk load price records: {e}")
+                errors += counts['rows']
+
+            # Keep every run's closes in price_history as well
+            try:
+                append_latest_prices(conn, 'global', 'global_latest_prices')
+            except Exception as e:
+                logging.error(f"Failed to append closes to price_history: {e}")
+            errors += counts['errors']
+            if not counts['rows']:
+                logging.warning("No global latest prices found or fetched.")
         conn.close()
-        logging.info(f"Inserted/updated {inserted} records into the database.")
+        logging.info(f"Wrote {inserted} changed records to the database.")
         if errors:
             logging.warning(f"{errors} records failed to insert.")
     except Exception as e:
@@ -170,11 +173,14 @@ def main():
     logging.info("="*50)
     logging.info("GLOBAL LATEST PRICES SCRIPT STARTED")
     logging.info("="*50)
-    prices = fetch_latest_prices()
-    if prices:
-        save_latest_prices(prices)
+    if os.getenv('BORSDATA_STREAM_JSON', '1') != '0':
+        save_latest_prices(stream_latest_prices())
     else:
-        logging.warning("No global latest prices found or fetched.")
+        prices = fetch_latest_prices()
+        if prices:
+            save_latest_prices(prices)
+        else:
+            logging.warning("No global latest prices found or fetched.")
     duration = datetime.now() - start
     logging.info(f"Script finished. Duration: {duration}.")
 
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Index Advisor
+Evidence-based index drops and additions from performance_schema
+
+Combines
+- sys.schema_unused_indexes: secondary indexes without a single read since
+  the server started,
+- sys.schema_redundant_indexes: indexes whose columns are a prefix of
+  another index,
+- performance_schema.table_io_waits_summary_by_index_usage / _by_table:
+  reads per index and writes per table,
+- performance_schema.events_statements_summary_by_digest: statements that
+  ran without a (good) index or examined far more rows than they returned,
+into one machine-readable report:
+
+    {
+      "drop": [{"schema", "table", "index", "columns", "reason", "sql",
+                "estimated_write_savings": {...}, "confidence", ...}],
+      "add":  [{"schema", "table", "columns", "sql", "digests": [...], ...}],
+      "kept": [{"schema", "table", "index", "why"}]
+    }
+
+Unique indexes and the last index usable by a foreign key are never
+proposed for dropping, and neither is a redundant index whose dominant
+index is dropped itself (an unused dominant is dropped instead).
+Additions are derived from the WHERE / JOIN columns of the digest text and
+skipped when an existing index already starts with those columns. All counters are totals since server start (or since
+performance_schema was truncated), so confidence is "low" until the server
+has been up for OVERVIEW_ADVISOR_MIN_UPTIME_DAYS.
+
+mysql_db_overview.py adds the report as its "index_advisor" section; run
+this file to print it for the configured databases:
+
+    python index_advisor.py
+
+Environment Variables (optional):
+- OVERVIEW_ADVISOR_MIN_UPTIME_DAYS: uptime before drops are "high" confidence (default: 7)
+- OVERVIEW_ADVISOR_MIN_ROWS: smallest table (estimated rows) to propose additions for (default: 1000)
+- OVERVIEW_ADVISOR_DIGESTS: statement digests to analyse (default: 100)
+
+Works with a mysql.connector tuple cursor on MySQL 8.0 or later with
+performance_schema and the sys schema enabled.
+"""
+
+import os
+import re
+import sys
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import mysql.connector
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+PICOSECONDS = 1e12
+
+# Statement predicates in digest text: [`alias` .] `column` <operator> ...
+_PREDICATE = re.compile(
+    r"(?:`(\w+)`\s*\.\s*)?`(\w+)`\s*(=|<=>|<=|>=|<|>|IN\s*\(|BETWEEN\b|LIKE\b)\s*"
+    r"(?:(?:`(\w+)`\s*\.\s*)?`(\w+)`)?", re.IGNORECASE)
+# Table references: FROM / JOIN / UPDATE / INTO [`schema` .] `table` [[AS] `alias`]
+_TABLE_REF = re.compile(
+    r"\b(?:FROM|JOIN|UPDATE|INTO)\s+`(\w+)`(?:\s*\.\s*`(\w+)`)?(?:\s+(?:AS\s+)?`(\w+)`)?", re.IGNORECASE)
+_PREDICATE_CLAUSE = re.compile(r"\b(?:WHERE|ON)\b(.*?)(?=\b(?:GROUP\s+BY|ORDER\s+BY|LIMIT|HAVING|JOIN|"
+                               r"UNION|FOR\s+UPDATE)\b|$)", re.IGNORECASE | re.DOTALL)
+
+
+def _quote(name: str) -> str:
+    return '`' + name.replace('`', '``') + '`'
+
+
+def _in_clause(values: Sequence[str]) -> str:
+    return ', '.join(['%s'] * len(values))
+
+
+def digest_predicates(digest_text: str, default_schema: Optional[str]) -> Dict[Tuple[str, str], dict]:
+    """
+    {(schema, table): {"equality": [columns], "range": [columns]}} for the
+    filter and join columns of a normalised statement
+    """
+    aliases: Dict[str, Tuple[str, str]] = {}
+    tables: List[Tuple[str, str]] = []
+    for first, second, alias in _TABLE_REF.findall(digest_text):
+        schema, table = (first, second) if second else (default_schema, first)
+        if schema is None:
+            continue
+        tables.append((schema, table))
+        aliases[table] = (schema, table)
+        if alias:
+            aliases[alias] = (schema, table)
+
+    result: Dict[Tuple[str, str], dict] = {}
+
+    def add(alias, column, kind):
+        if alias:
+            target = aliases.get(alias)
+            if target is None:
+                return
+        elif len(tables) == 1:
+            target = tables[0]
+        else:
+            # Unqualified column of a multi-table statement, resolved against the schema later
+            target, kind = (None, None), "unresolved"
+        entry = result.setdefault(target, {"equality": [], "range": [], "unresolved": []})
+        if column not in entry[kind]:
+            entry[kind].append(column)
+
+    for clause in _PREDICATE_CLAUSE.findall(digest_text):
+        for alias, column, operator, other_alias, other_column in _PREDICATE.findall(clause):
+            operator = operator.upper().replace(' ', '')
+            kind = "equality" if operator in ('=', '<=>', 'IN(') else "range"
+            add(alias, column, kind)
+            if other_column and kind == "equality":
+                add(other_alias, other_column, kind)
+    return result
+
+
+class IndexAdvisor:
+    """Collects index evidence for a set of schemas and builds the report"""
+
+    def __init__(self, cursor, schemas: Sequence[str]):
+        self.cursor = cursor
+        self.schemas = list(schemas)
+        self.min_uptime_days = float(os.getenv('OVERVIEW_ADVISOR_MIN_UPTIME_DAYS', 7))
+        self.min_rows = int(os.getenv('OVERVIEW_ADVISOR_MIN_ROWS', 1000))
+        self.digest_limit = int(os.getenv('OVERVIEW_ADVISOR_DIGESTS', 100))
+        self.warnings: List[str] = []
+
+    def _query(self, description: str, query: str, params: tuple = ()) -> list:
+        """Rows of an evidence query; an empty list (and a warning) when it is not available"""
+        try:
+            self.cursor.execute(query, params)
+            return self.cursor.fetchall()
+        except mysql.connector.Error as err:
+            message = f"{description} not available: {err}"
+            logger.warning(message)
+            self.warnings.append(message)
+            return []
+
+    def load(self):
+        schemas = tuple(self.schemas)
+        placeholders = _in_clause(self.schemas)
+
+        rows = self._query("Uptime", """
+            SELECT VARIABLE_VALUE FROM performance_schema.global_status WHERE VARIABLE_NAME = 'Uptime'
+        """)
+        self.uptime = int(rows[0][0]) if rows else 0
+
+        # Existing indexes: (schema, table) -> {index: {"columns", "unique"}}
+        self.indexes: Dict[Tuple[str, str], Dict[str, dict]] = {}
+        for schema, table, index, non_unique, column in self._query("Index list", f"""
+            SELECT table_schema, table_name, index_name, non_unique, column_name
+            FROM information_schema.statistics
+            WHERE table_schema IN ({placeholders})
+            ORDER BY table_schema, table_name, index_name, seq_in_index
+        """, schemas):
+            entry = self.indexes.setdefault((schema, table), {}).setdefault(
+                index, {"columns": [], "unique": not non_unique})
+            entry["columns"].append(column)
+
+        self.columns: Dict[Tuple[str, str], set] = {}
+        for schema, table, column in self._query("Column list", f"""
+            SELECT table_schema, table_name, column_name
+            FROM information_schema.columns
+            WHERE table_schema IN ({placeholders})
+        """, schemas):
+            self.columns.setdefault((schema, table), set()).add(column)
+
+        self.table_rows = {(row[0], row[1]): row[2] or 0 for row in self._query("Table sizes", f"""
+            SELECT table_schema, table_name, table_rows
+            FROM information_schema.tables
+            WHERE table_schema IN ({placeholders}) AND table_type = 'BASE TABLE'
+        """, schemas)}
+
+        self.foreign_keys: Dict[Tuple[str, str], List[List[str]]] = {}
+        fk_columns: Dict[Tuple[str, str, str], List[str]] = {}
+        for schema, table, constraint, column in self._query("Foreign keys", f"""
+            SELECT table_schema, table_name, constraint_name, column_name
+            FROM information_schema.key_column_usage
+            WHERE table_schema IN ({placeholders}) AND referenced_table_name IS NOT NULL
+            ORDER BY table_schema, table_name, constraint_name, ordinal_position
+        """, schemas):
+            fk_columns.setdefault((schema, table, constraint), []).append(column)
+        for (schema, table, _), columns in fk_columns.items():
+            self.foreign_keys.setdefault((schema, table), []).append(columns)
+
+        self.index_reads = {(row[0], row[1], row[2]): row[3] for row in self._query("Index usage", f"""
+            SELECT OBJECT_SCHEMA, OBJECT_NAME, INDEX_NAME, COUNT_READ
+            FROM performance_schema.table_io_waits_summary_by_index_usage
+            WHERE OBJECT_SCHEMA IN ({placeholders}) AND INDEX_NAME IS NOT NULL
+        """, schemas)}
+
+        self.table_writes = {(row[0], row[1]): {"inserts": row[2], "updates": row[3], "deletes": row[4],
+                                                "latency_seconds": (row[5] or 0) / PICOSECONDS}
+                             for row in self._query("Table writes", f"""
+            SELECT OBJECT_SCHEMA, OBJECT_NAME, COUNT_INSERT, COUNT_UPDATE, COUNT_DELETE,
+                   SUM_TIMER_INSERT + SUM_TIMER_UPDATE + SUM_TIMER_DELETE
+            FROM performance_schema.table_io_waits_summary_by_table
+            WHERE OBJECT_SCHEMA IN ({placeholders})
+        """, schemas)}
+
+        # InnoDB index sizes (needs SELECT on mysql.innodb_index_stats)
+        self.index_sizes = {(row[0], row[1], row[2]): row[3] for row in self._query("Index sizes", f"""
+            SELECT database_name, table_name, index_name, stat_value * @@innodb_page_size
+            FROM mysql.innodb_index_stats
+            WHERE stat_name = 'size' AND database_name IN ({placeholders})
+        """, schemas)}
+
+        self.unused = self._query("sys.schema_unused_indexes", f"""
+            SELECT object_schema, object_name, index_name
+            FROM sys.schema_unused_indexes
+            WHERE object_schema IN ({placeholders})
+        """, schemas)
+
+        self.redundant = self._query("sys.schema_redundant_indexes", f"""
+            SELECT table_schema, table_name, redundant_index_name, redundant_index_columns,
+                   dominant_index_name, dominant_index_columns
+            FROM sys.schema_redundant_indexes
+            WHERE table_schema IN ({placeholders})
+        """, schemas)
+
+        self.digests = self._query("Statement digests", f"""
+            SELECT SCHEMA_NAME, DIGEST, DIGEST_TEXT, COUNT_STAR, SUM_TIMER_WAIT,
+                   SUM_ROWS_EXAMINED, SUM_ROWS_SENT, SUM_NO_INDEX_USED, SUM_NO_GOOD_INDEX_USED
+            FROM performance_schema.events_statements_summary_by_digest
+            WHERE SCHEMA_NAME IN ({placeholders})
+              AND (SUM_NO_INDEX_USED > 0 OR SUM_NO_GOOD_INDEX_USED > 0
+                   OR SUM_ROWS_EXAMINED > 10 * GREATEST(SUM_ROWS_SENT, COUNT_STAR))
+            ORDER BY SUM_TIMER_WAIT DESC
+            LIMIT {int(self.digest_limit)}
+        """, schemas)
+
+    def _write_savings(self, schema: str, table: str) -> dict:
+        """Index maintenance avoided by dropping one secondary index of the table"""
+        writes = self.table_writes.get((schema, table), {})
+        row_writes = sum(writes.get(k) or 0 for k in ("inserts", "updates", "deletes"))
+        # Each index of the table (clustered included) shares the write latency
+        index_count = max(len(self.indexes.get((schema, table), {})), 1)
+        return {
+            # Updates only touch the index when its columns change, so this is an upper bound
+            "row_writes": row_writes,
+            "row_writes_per_hour": round(row_writes * 3600 / self.uptime, 1) if self.uptime else None,
+            "latency_seconds": round(writes.get("latency_seconds", 0) / index_count, 3)
+        }
+
+    def _needed_for_foreign_key(self, schema: str, table: str, index: str, dropped: set) -> bool:
+        """True when index is the only remaining index whose leading columns cover a foreign key"""
+        indexes = self.indexes.get((schema, table), {})
+        for fk in self.foreign_keys.get((schema, table), []):
+            covering = [name for name, entry in indexes.items()
+                        if entry["columns"][:len(fk)] == fk and (schema, table, name) not in dropped]
+            if covering == [index]:
+                return True
+        return False
+
+    def _drop_entry(self, schema, table, index, reason, **extra) -> Optional[dict]:
+        entry = self.indexes.get((schema, table), {}).get(index)
+        if entry is None:
+            return None
+        return {
+            "schema": schema,
+            "table": table,
+            "index": index,
+            "columns": entry["columns"],
+            "reason": reason,
+            **extra,
+            "reads": self.index_reads.get((schema, table, index)),
+            "index_size_bytes": self.index_sizes.get((schema, table, index)),
+            "estimated_write_savings": self._write_savings(schema, table),
+            "confidence": "high" if self.uptime >= self.min_uptime_days * 86400 else "low",
+            "sql": f"ALTER TABLE {_quote(schema)}.{_quote(table)} DROP INDEX {_quote(index)};"
+        }
+
+    def drops(self) -> Tuple[List[dict], List[dict]]:
+        """(drop recommendations, indexes kept despite the evidence)"""
+        drops, kept, dropped = [], [], set()
+
+        def keep(key, why):
+            kept.append({"schema": key[0], "table": key[1], "index": key[2], "why": why})
+
+        def droppable(key, evidence) -> bool:
+            if self.indexes[key[:2]][key[2]]["unique"]:
+                keep(key, f"{evidence}, but enforces uniqueness")
+                return False
+            if self._needed_for_foreign_key(*key, dropped):
+                keep(key, f"{evidence}, but the only index for a foreign key")
+                return False
+            return True
+
+        # (schema, table, redundant index) -> {dominant index: its columns}
+        dominants: Dict[Tuple[str, str, str], Dict[str, List[str]]] = {}
+        for schema, table, index, _, dominant, dominant_columns in self.redundant:
+            if index in self.indexes.get((schema, table), {}):
+                dominants.setdefault((schema, table, index), {})[dominant] = \
+                    dominant_columns.split(',') if dominant_columns else []
+
+        # Unused indexes that are not redundant. An unused dominant index often has
+        # no reads only because its redundant prefix served them, so it goes first
+        # and the redundant index is then kept.
+        for schema, table, index in self.unused:
+            key = (schema, table, index)
+            if key in dropped or key in dominants or index not in self.indexes.get((schema, table), {}):
+                continue
+            if droppable(key, "unused"):
+                drops.append(self._drop_entry(schema, table, index, "unused"))
+                dropped.add(key)
+
+        # Redundant indexes, each after its dominant indexes have been decided
+        pending = dict(dominants)
+        while pending:
+            ready = [key for key, names in pending.items()
+                     if not any((key[0], key[1], name) in pending for name in names)]
+            if not ready:
+                for key in sorted(pending):
+                    keep(key, "redundant, but its dominant indexes are redundant to each other")
+                break
+            for key in sorted(ready):
+                names = pending.pop(key)
+                schema, table, index = key
+                surviving = [name for name in names if (schema, table, name) not in dropped]
+                if not surviving:
+                    keep(key, f"redundant, but every dominant index ({', '.join(names)}) is dropped")
+                    continue
+                if not droppable(key, f"redundant to {surviving[0]}"):
+                    continue
+                drops.append(self._drop_entry(schema, table, index, "redundant", dominant_index=surviving[0],
+                                              dominant_columns=names[surviving[0]]))
+                dropped.add(key)
+
+        drops.sort(key=lambda d: -(d["estimated_write_savings"]["row_writes"] or 0))
+        return drops, kept
+
+    def _resolve_unresolved(self, predicates: Dict[Tuple, dict]):
+        """Attach unqualified columns to the statement's table that has them"""
+        unresolved = predicates.pop((None, None), None)
+        if not unresolved:
+            return
+        for column in unresolved["unresolved"]:
+            owners = [key for key in predicates if column in self.columns.get(key, set())]
+            if len(owners) == 1:
+                predicates[owners[0]]["equality"].append(column)
+
+    def _covered(self, schema: str, table: str, columns: List[str]) -> bool:
+        """True when an existing index starts with the candidate's columns (in any order)"""
+        for entry in self.indexes.get((schema, table), {}).values():
+            if set(entry["columns"][:len(columns)]) == set(columns):
+                return True
+        return False
+
+    def additions(self) -> List[dict]:
+        candidates: Dict[Tuple[str, str, Tuple[str, ...]], dict] = {}
+        for schema, digest, text, count, latency, examined, sent, no_index, no_good_index in self.digests:
+            if not text:
+                continue
+            predicates = digest_predicates(text, schema)
+            self._resolve_unresolved(predicates)
+            for (table_schema, table), columns in predicates.items():
+                known = self.columns.get((table_schema, table))
+                if not known or self.table_rows.get((table_schema, table), 0) < self.min_rows:
+                    continue
+                equality = [c for c in columns["equality"] if c in known]
+                ranges = [c for c in columns["range"] if c in known and c not in equality]
+                index_columns = (equality + ranges[:1])[:3]
+                if not index_columns or self._covered(table_schema, table, index_columns):
+                    continue
+                key = (table_schema, table, tuple(index_columns))
+                candidate = candidates.setdefault(key, {
+                    "schema": table_schema,
+                    "table": table,
+                    "columns": index_columns,
+                    "reason": "statements filter or join on these columns without a matching index",
+                    "estimated_rows": self.table_rows.get((table_schema, table)),
+                    "total_latency_seconds": 0.0,
+                    "executions": 0,
+                    "rows_examined": 0,
+                    "rows_sent": 0,
+                    "table_row_writes": self._write_savings(table_schema, table)["row_writes"],
+                    "digests": [],
+                    "sql": f"ALTER TABLE {_quote(table_schema)}.{_quote(table)} ADD INDEX "
+                           f"{_quote(('idx_' + '_'.join(index_columns))[:64])} "
+                           f"({', '.join(_quote(c) for c in index_columns)});"
+                })
+                candidate["total_latency_seconds"] += (latency or 0) / PICOSECONDS
+                candidate["executions"] += count or 0
+                candidate["rows_examined"] += examined or 0
+                candidate["rows_sent"] += sent or 0
+                candidate["digests"].append({
+                    "digest": digest,
+                    "text": text[:300],
+                    "executions": count,
+                    "total_latency_seconds": round((latency or 0) / PICOSECONDS, 3),
+                    "rows_examined": examined,
+                    "rows_sent": sent,
+                    "no_index_used": no_index,
+                    "no_good_index_used": no_good_index
+                })
+
+        additions = sorted(candidates.values(), key=lambda c: -c["total_latency_seconds"])
+        for candidate in additions:
+            candidate["total_latency_seconds"] = round(candidate["total_latency_seconds"], 3)
+        return additions
+
+    def report(self) -> dict:
+        self.load()
+        drops, kept = self.drops()
+        additions = self.additions()
+        logger.info(f"Index advisor: {len(drops)} drops, {len(additions)} additions, {len(kept)} kept")
+        return {
+            "generated_at": datetime.now().isoformat(),
+            "schemas": self.schemas,
+            "server_uptime_seconds": self.uptime,
+            "evidence_window": "since server start or the last performance_schema truncate",
+            "drop": drops,
+            "add": additions,
+            "kept": kept,
+            "warnings": self.warnings
+        }
+
+
+def get_index_advice(cursor, schemas: Sequence[str]) -> dict:
+    """Overview section; see IndexAdvisor"""
+    return IndexAdvisor(cursor, schemas).report()
+
+
+def main(argv=None):
+    load_dotenv(dotenv_path='../../.env')
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    schemas = argv or [
+        os.getenv('DB_FOUNDATION', 'psw_foundation'),
+        os.getenv('DB_MARKETDATA', 'psw_marketdata'),
+        os.getenv('DB_PORTFOLIO', 'psw_portfolio')
+    ]
+
+    try:
+        connection = mysql.connector.connect(
+            host=os.getenv('DB_HOST'),
+            user=os.getenv('DB_USERNAME'),
+            password=os.getenv('DB_PASSWORD'),
+            port=int(os.getenv('DB_PORT', 3306)),
+            charset='utf8mb4',
+            use_unicode=True
+        )
+    except mysql.connector.Error as err:
+        logger.error(f"Database connection failed: {err}")
+        return 1
+
+    try:
+        cursor = connection.cursor()
+        print(json.dumps(get_index_advice(cursor, schemas), indent=2, default=str, ensure_ascii=False))
+        cursor.close()
+        return 0
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Incremental JSON array reader for large Börsdata payloads
+
+iter_json_array() reads a JSON document chunk by chunk (for example from
+requests' Response.iter_content()) and yields the elements of one array as
+soon as each is complete. The array is either the document itself or the
+value of one of the given top-level keys, e.g. {"stockPricesList": [...]}.
+Only the element being decoded and one read chunk are held in memory, so
+memory use does not grow with the number of instruments.
+
+Elements are decoded with the standard json module; nothing after the
+array is read.
+"""
+
+import codecs
+import json
+from typing import Any, Iterable, Iterator, Sequence, Union
+
+WHITESPACE = ' \t\n\r'
+
+_decoder = json.JSONDecoder()
+
+
+class JSONStreamError(ValueError):
+    """The document does not contain the expected array"""
+
+
+class _Buffer:
+    """Text buffer over a chunk iterator that discards consumed input"""
+
+    def __init__(self, chunks: Iterable[Union[bytes, str]]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Append the next chunk; returns False at end of input"""
+        if self.eof:
+            return False
+        self.text = self.text[self.pos:]
+        self.pos = 0
+        for chunk in self._chunks:
+            data = chunk if isinstance(chunk, str) else self._utf8.decode(chunk)
+            if data:
+                self.text += data
+                return True
+        self.text += self._utf8.decode(b'', final=True)
+        self.eof = True
+        return False
+
+    def peek(self) -> str:
+        """Next non-whitespace character without consuming it ('' at end of input)"""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ''
+
+    def next_char(self) -> str:
+        """Next raw character, including whitespace ('' at end of input)"""
+        if self.pos >= len(self.text) and not self.fill():
+            return ''
+        char = self.text[self.pos]
+        self.pos += 1
+        return char
+
+    def decode_value(self) -> Any:
+        """Decode the JSON value starting at the current position"""
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # raw_decode accepts a prefix of a scalar ("123." decodes as 123), so a
+            # number or literal is only complete once a delimiter or EOF follows it
+            if self.text[self.pos] not in '[{"' and not self._delimited(end) and not self.eof:
+                self.fill()  # moves the text, so decode again even at end of input
+                continue
+            self.pos = end
+            return value
+
+    def _delimited(self, end: int) -> bool:
+        return end < len(self.text) and (self.text[end] in ',]}' or self.text[end] in WHITESPACE)
+
+
+def _read_string(buffer: _Buffer) -> str:
+    """Read a JSON string whose opening quote was just consumed"""
+    chars = ['"']
+    while True:
+        char = buffer.next_char()
+        if not char:
+            raise JSONStreamError("Unterminated string in JSON document")
+        chars.append(char)
+        if char == '\\':
+            chars.append(buffer.next_char())
+        elif char == '"':
+            return json.loads(''.join(chars))
+
+
+def _skip_value(buffer: _Buffer):
+    """Skip one JSON value without decoding it into Python objects"""
+    first = buffer.peek()
+    if first == '"':
+        buffer.pos += 1
+        _read_string(buffer)
+        return
+    if first not in '[{':
+        # Scalar: runs until the next delimiter, which is left for the caller
+        while True:
+            char = buffer.next_char()
+            if not char:
+                return
+            if char in ',}]' or char in WHITESPACE:
+                buffer.pos -= 1
+                return
+
+    depth = 0
+    while True:
+        char = buffer.next_char()
+        if not char:
+            raise JSONStreamError("Unexpected end of JSON document")
+        if char == '"':
+            _read_string(buffer)
+        elif char in '[{':
+            depth += 1
+        elif char in ']}':
+            depth -= 1
+            if depth == 0:
+                return
+
+
+def _find_array(buffer: _Buffer, keys: Sequence[str]) -> str:
+    """Position the buffer just inside the target array; returns the key it was found under"""
+    first = buffer.peek()
+    if first == '[':
+        buffer.pos += 1
+        return ''
+    if first != '{':
+        raise JSONStreamError(f"Expected a JSON object or array, got {first!r}")
+    buffer.pos += 1
+
+    seen = []
+    while True:
+        char = buffer.peek()
+        if char == ',':
+            buffer.pos += 1
+            continue
+        if char == '}' or not char:
+            raise JSONStreamError(f"No array under keys {list(keys)} (found keys: {seen})")
+        if char != '"':
+            raise JSONStreamError(f"Unexpected {char!r} in JSON object")
+        buffer.pos += 1
+        key = _read_string(buffer)
+        seen.append(key)
+        if buffer.peek() != ':':
+            raise JSONStreamError(f"Expected ':' after key '{key}'")
+        buffer.pos += 1
+        if key in keys and buffer.peek() == '[':
+            buffer.pos += 1
+            return key
+        _skip_value(buffer)
+
+
+def iter_json_array(chunks: Iterable[Union[bytes, str]], keys: Sequence[str] = ()) -> Iterator[Any]:
+    """
+    Yield the elements of a JSON array read incrementally from chunks.
+
+    If the document is an object, the first top-level key from `keys`
+    whose value is an array is used. Raises JSONStreamError when no such
+    array exists and json.JSONDecodeError on malformed elements.
+    """
+    buffer = _Buffer(chunks)
+    _find_array(buffer, keys)
+
+    while True:
+        char = buffer.peek()
+        if char == ']':
+            return
+        if char == ',':
+            buffer.pos += 1
+            continue
+        if not char:
+            raise JSONStreamError("Unexpected end of JSON document inside array")
+        yield buffer.decode_value()
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+KPI Value History
+Append-only history of KPI values for kpi_nordic_sync.py and kpi_global_sync.py
+
+The sync scripts overwrite kpi_nordic / kpi_global in place, so a value is
+gone once Börsdata reports a new one. KPIHistory appends a row to
+kpi_value_history for every value that changed in a sync run, keyed by the
+sync date (valid_from). Unchanged values are not repeated: a value is valid
+from its row until the next row for the same series and instrument. Values
+that disappear from Börsdata get a row with is_deleted set.
+
+The changed rows come straight from the sync's content-hash diff (see
+change_detector.py); with CHANGE_DETECTION=0 the payload is compared with
+the latest history rows instead.
+
+Retention (apply_retention(), run after every sync):
+- changes older than KPI_HISTORY_DAILY_DAYS are downsampled to the last
+  change per month, so old history has month-end resolution;
+- changes older than KPI_HISTORY_RETENTION_DAYS are deleted, except the
+  last one before the cutoff, which stays valid from then on.
+
+Query API:
+- value_as_of(): one instrument's value on a date
+- series_as_of(): every instrument's value of a series on a date
+- value_history(): the changes of one instrument over a date range
+
+    python kpi_history.py --endpoint nordic --series 1/1year/mean --as-of 2025-03-31
+    python kpi_history.py --endpoint nordic --series 1/1year/mean --instrument 3 --from 2024-01-01
+    python kpi_history.py --endpoint global --apply-retention
+
+Target Database: psw_marketdata
+Tables: kpi_value_history, kpi_series
+(see database/migrations/create_kpi_value_history_table.sql)
+
+Environment Variables (optional):
+- KPI_HISTORY: set to 0 to stop recording history
+- KPI_HISTORY_DAILY_DAYS: days kept at full (daily) resolution (default 90)
+- KPI_HISTORY_RETENTION_DAYS: days of history kept at all (default 3650, 0 = forever)
+
+Author: PSW Development Team
+"""
+
+import os
+import sys
+import argparse
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import mysql.connector
+from dotenv import load_dotenv
+
+from kpi_storage import KPISeriesIds
+
+ENDPOINTS = ('nordic', 'global')
+HISTORY_TABLE = 'kpi_value_history'
+
+DEFAULT_DAILY_DAYS = 90
+DEFAULT_RETENTION_DAYS = 3650
+WRITE_CHUNK_SIZE = 1000
+
+KPIValue = Tuple[Optional[float], Optional[str]]
+
+logger = logging.getLogger(__name__)
+
+
+def _same_value(stored: KPIValue, numeric_value, string_value) -> bool:
+    stored_numeric, stored_string = stored
+    if (stored_numeric is None) != (numeric_value is None) or stored_string != string_value:
+        return False
+    return stored_numeric is None or float(stored_numeric) == float(numeric_value)
+
+
+class KPIHistory:
+    """Records and queries the value history of one endpoint ('nordic' or 'global')"""
+
+    def __init__(self, db_cursor, endpoint: str, sync_date: Optional[date] = None,
+                 log: Optional[logging.Logger] = None):
+        if endpoint not in ENDPOINTS:
+            raise ValueError(f"Invalid endpoint '{endpoint}', expected one of {', '.join(ENDPOINTS)}")
+        self.log = log or logger
+        self.db_cursor = db_cursor
+        self.endpoint = endpoint
+        self.sync_date = sync_date or date.today()
+        self.series_ids = KPISeriesIds(db_cursor)
+
+    def latest_values(self, series_id: int, as_of: Optional[date] = None) -> Dict[int, KPIValue]:
+        """Value of every instrument of a series on a date (default: latest); deleted values are left out"""
+        self.db_cursor.execute(f"""
+            SELECT h.instrument_id, h.numeric_value, h.string_value
+            FROM {HISTORY_TABLE} h
+            JOIN (
+                SELECT instrument_id, MAX(valid_from) AS valid_from
+                FROM {HISTORY_TABLE}
+                WHERE endpoint = %s AND series_id = %s AND valid_from <= %s
+                GROUP BY instrument_id
+            ) latest ON latest.instrument_id = h.instrument_id AND latest.valid_from = h.valid_from
+            WHERE h.endpoint = %s AND h.series_id = %s AND h.is_deleted = 0
+        """, (self.endpoint, series_id, as_of or date.max, self.endpoint, series_id))
+        return {row[0]: (row[1], row[2]) for row in self.db_cursor.fetchall()}
+
+    def record(self, kpi_id: int, group: str, calculation: str, rows: Sequence[Tuple],
+               deleted_instruments: Iterable = (), changed_only: bool = True) -> int:
+        """
+        Append history rows for one series (no commit).
+
+        rows are in KPI_VALUE_COLUMNS order. With changed_only the caller
+        passes only rows whose value changed (the change detector's
+        changed_rows); otherwise rows are the whole payload and are compared
+        with the latest history first, and instruments missing from it are
+        marked deleted. Returns the number of rows appended.
+        """
+        series_id = self.series_ids.get(kpi_id, group, calculation)
+        entries = [(row[3], row[4], row[5], 0) for row in rows]
+        deleted = list(deleted_instruments)
+
+        if not changed_only:
+            latest = self.latest_values(series_id)
+            seen = {row[3] for row in rows}
+            entries = [entry for entry in entries
+                       if entry[0] not in latest or not _same_value(latest[entry[0]], entry[1], entry[2])]
+            deleted = [instrument_id for instrument_id in latest if instrument_id not in seen]
+        entries.extend((instrument_id, None, None, 1) for instrument_id in deleted)
+
+        params = [(self.endpoint, series_id, instrument_id, self.sync_date, numeric_value, string_value, is_deleted)
+                  for instrument_id, numeric_value, string_value, is_deleted in entries]
+        for start in range(0, len(params), WRITE_CHUNK_SIZE):
+            # A second run on the same day replaces that day's change
+            self.db_cursor.executemany(f"""
+                INSERT INTO {HISTORY_TABLE}
+                    (endpoint, series_id, instrument_id, valid_from, numeric_value, string_value, is_deleted)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    numeric_value = VALUES(numeric_value),
+                    string_value = VALUES(string_value),
+                    is_deleted = VALUES(is_deleted)
+            """, params[start:start + WRITE_CHUNK_SIZE])
+        return len(params)
+
+    def apply_retention(self, daily_days: Optional[int] = None, retention_days: Optional[int] = None) -> Dict[str, int]:
+        """Downsample and expire old history of this endpoint (no commit); returns rows removed per step"""
+        if daily_days is None:
+            daily_days = int(os.getenv('KPI_HISTORY_DAILY_DAYS', DEFAULT_DAILY_DAYS))
+        if retention_days is None:
+            retention_days = int(os.getenv('KPI_HISTORY_RETENTION_DAYS', DEFAULT_RETENTION_DAYS))
+        removed = {'downsampled': 0, 'expired': 0}
+
+        # Only whole months before the daily window are downsampled
+        daily_cutoff = (self.sync_date - timedelta(days=daily_days)).replace(day=1)
+        self.db_cursor.execute(f"""
+            DELETE h FROM {HISTORY_TABLE} h
+            JOIN (
+                SELECT series_id, instrument_id, EXTRACT(YEAR_MONTH FROM valid_from) AS month,
+                       MAX(valid_from) AS last_change
+                FROM {HISTORY_TABLE}
+                WHERE endpoint = %s AND valid_from < %s
+                GROUP BY series_id, instrument_id, month
+                HAVING COUNT(*) > 1
+            ) m ON m.series_id = h.series_id AND m.instrument_id = h.instrument_id
+               AND EXTRACT(YEAR_MONTH FROM h.valid_from) = m.month
+            WHERE h.endpoint = %s AND h.valid_from < m.last_change
+        """, (self.endpoint, daily_cutoff, self.endpoint))
+        removed['downsampled'] = max(self.db_cursor.rowcount, 0)
+
+        if retention_days > 0:
+            cutoff = self.sync_date - timedelta(days=retention_days)
+            self.db_cursor.execute(f"""
+                DELETE h FROM {HISTORY_TABLE} h
+                JOIN (
+                    SELECT series_id, instrument_id, MAX(valid_from) AS last_change
+                    FROM {HISTORY_TABLE}
+                    WHERE endpoint = %s AND valid_from < %s
+                    GROUP BY series_id, instrument_id
+                ) m ON m.series_id = h.series_id AND m.instrument_id = h.instrument_id
+                WHERE h.endpoint = %s AND h.valid_from < m.last_change
+            """, (self.endpoint, cutoff, self.endpoint))
+            removed['expired'] = max(self.db_cursor.rowcount, 0)
+
+        self.log.info(f"KPI {self.endpoint} history retention: {removed['downsampled']} changes downsampled "
+                      f"before {daily_cutoff}, {removed['expired']} expired")
+        return removed
+
+    def value_as_of(self, kpi_id: int, group: str, calculation: str, instrument_id: int,
+                    as_of: date) -> Optional[KPIValue]:
+        """(numeric_value, string_value) of one instrument on a date, or None if it had none"""
+        self.db_cursor.execute(f"""
+            SELECT numeric_value, string_value, is_deleted
+            FROM {HISTORY_TABLE}
+            WHERE endpoint = %s AND series_id = %s AND instrument_id = %s AND valid_from <= %s
+            ORDER BY valid_from DESC
+            LIMIT 1
+        """, (self.endpoint, self.series_ids.get(kpi_id, group, calculation), instrument_id, as_of))
+        row = self.db_cursor.fetchone()
+        if row is None or row[2]:
+            return None
+        return row[0], row[1]
+
+    def series_as_of(self, kpi_id: int, group: str, calculation: str, as_of: date) -> Dict[int, KPIValue]:
+        """{instrument_id: (numeric_value, string_value)} of a whole series on a date"""
+        return self.latest_values(self.series_ids.get(kpi_id, group, calculation), as_of)
+
+    def value_history(self, kpi_id: int, group: str, calculation: str, instrument_id: int,
+                      date_from: date, date_to: date) -> List[Tuple[date, Optional[float], Optional[str]]]:
+        """Changes of one instrument's value in a date range, starting with the value valid on date_from"""
+        start = self.value_as_of(kpi_id, group, calculation, instrument_id, date_from)
+        self.db_cursor.execute(f"""
+            SELECT valid_from, numeric_value, string_value, is_deleted
+            FROM {HISTORY_TABLE}
+            WHERE endpoint = %s AND series_id = %s AND instrument_id = %s AND valid_from > %s AND valid_from <= %s
+            ORDER BY valid_from
+        """, (self.endpoint, self.series_ids.get(kpi_id, group, calculation), instrument_id, date_from, date_to))
+        changes = [(date_from, start[0], start[1])] if start else []
+        changes.extend((row[0], None, None) if row[3] else (row[0], row[1], row[2])
+                       for row in self.db_cursor.fetchall())
+        return changes
+
+
+def open_history(db_cursor, endpoint: str, log: Optional[logging.Logger] = None) -> Optional[KPIHistory]:
+    """KPIHistory for a sync run, or None when history is disabled or its table is missing"""
+    log = log or logger
+    if os.getenv('KPI_HISTORY', '1') == '0':
+        return None
+    try:
+        db_cursor.execute("""
+            SELECT COUNT(*)
+            FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN (%s, 'kpi_series')
+        """, (HISTORY_TABLE,))
+        if db_cursor.fetchone()[0] < 2:
+            log.info("KPI value history not recorded: run database/migrations/create_kpi_value_history_table.sql")
+            return None
+    except mysql.connector.Error as err:
+        log.warning(f"Could not check for the KPI value history table: {err}")
+        return None
+    return KPIHistory(db_cursor, endpoint, log=log)
+
+
+def _parse_date(value: str) -> date:
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _parse_series(value: str) -> Tuple[int, str, str]:
+    try:
+        kpi_id, group, calculation = value.split('/')
+        return int(kpi_id), group, calculation
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid KPI series '{value}', expected e.g. 1/1year/mean")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query or maintain the KPI value history")
+    parser.add_argument('--endpoint', choices=ENDPOINTS, required=True, help="KPI endpoint")
+    parser.add_argument('--series', type=_parse_series, metavar='KPI/GROUP/CALC',
+                        help="Series to query, e.g. 1/1year/mean")
+    parser.add_argument('--instrument', type=int, help="Instrument to query (default: the whole series)")
+    parser.add_argument('--as-of', type=_parse_date, default=date.today(), metavar='YYYY-MM-DD',
+                        help="Date to report values for (default: today)")
+    parser.add_argument('--from', dest='date_from', type=_parse_date, metavar='YYYY-MM-DD',
+                        help="With --instrument, list every change since this date")
+    parser.add_argument('--apply-retention', action='store_true',
+                        help="Downsample and expire old history instead of querying")
+    args = parser.parse_args(argv)
+    if not args.apply_retention and not args.series:
+        parser.error("--series is required unless --apply-retention is given")
+
+    load_dotenv(dotenv_path='../../.env')
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s",
+                        datefmt="%Y-%m-%d %H:%M:%S")
+
+    try:
+        connection = mysql.connector.connect(
+            host=os.getenv('DB_HOST'),
+            user=os.getenv('DB_USERNAME'),
+            password=os.getenv('DB_PASSWORD'),
+            database=os.getenv('DB_MARKETDATA', 'psw_marketdata'),
+            port=int(os.getenv('DB_PORT', 3306)),
+            charset='utf8mb4',
+            use_unicode=True
+        )
+    except mysql.connector.Error as err:
+        logger.error(f"Database connection failed: {err}")
+        return 1
+
+    try:
+        cursor = connection.cursor(buffered=True)
+        history = KPIHistory(cursor, args.endpoint)
+        if args.apply_retention:
+            history.apply_retention()
+        elif args.instrument and args.date_from:
+            for valid_from, numeric_value, string_value in history.value_history(
+                    *args.series, args.instrument, args.date_from, args.as_of):
+                print(f"{valid_from}\t{numeric_value}\t{string_value or ''}")
+        elif args.instrument:
+            print(history.value_as_of(*args.series, args.instrument, args.as_of))
+        else:
+            for instrument_id, (numeric_value, string_value) in sorted(history.series_as_of(*args.series, args.as_of).items()):
+                print(f"{instrument_id}\t{numeric_value}\t{string_value or ''}")
+        # Series lookups may register a new kpi_series row; retention deletes rows
+        connection.commit()
+        cursor.close()
+        return 0
+    except mysql.connector.Error as err:
+        logger.error(f"KPI history query failed: {err}")
+        connection.rollback()
+        return 1
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -26,9 +26,10 @@ import logging
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 from dotenv import load_dotenv
-import time
 import json
 
+from borsdata_client import BorsdataClient
+
 # Load environment variables from .env file located at project root
 load_dotenv(dotenv_path='../../.env')
 
@@ -87,8 +88,7 @@ class KPIMetadataSync:
     def __init__(self):
         self.db_connection = None
         self.db_cursor = None
-        self.session = requests.Session()
-        self.session.headers.update(API_HEADERS)
+        self.client = BorsdataClient(BORSDATA_AUTH_KEY, headers=API_HEADERS, base_url=API_BASE_URL)
         
         # Statistics
         self.stats = {
@@ -138,14 +138,10 @@ class KPIMetadataSync:
     def fetch_kpi_metadata(self) -> Optional[List[Dict[str, Any]]]:
         """Fetch KPI metadata from Börsdata API endpoint"""
         try:
-            # Build URL with auth key parameter for Börsdata API
-            url = f"{API_BASE_URL.rstrip('/')}{API_ENDPOINT}"
-            params = {'authKey': BORSDATA_AUTH_KEY}
-            
-            logger.info(f"Fetching KPI metadata from Börsdata API: {url}")
+            logger.info(f"Fetching KPI metadata from Börsdata API: {self.client.url(API_ENDPOINT)}")
             logger.info(f"Using auth key: {BORSDATA_AUTH_KEY[:10]}...")  # Log first 10 chars for verification
             
-            response = self.session.get(url, params=params, timeout=30)
+            response = self.client.get(API_ENDPOINT)
             
             if response.status_code == 200:
                 data = response.json()
@@ -276,9 +272,6 @@ class KPIMetadataSync:
                     logger.error(f"Failed to commit batch: {err}")
                     self.db_connection.rollback()
                     return False
-                
-                # Small delay between batches to avoid overwhelming the database
-                time.sleep(0.1)
             
             # Final statistics
             duration = datetime.now() - self.stats['start_time']
@@ -20,16 +20,26 @@ Date: 2025-01-23
 
 import os
 import sys
+import argparse
+import asyncio
+import threading
 import requests
 import mysql.connector
 import logging
 from datetime import datetime
 from typing import Dict, List, Optional, Any, Tuple
 from dotenv import load_dotenv
-import time
 import json
 from decimal import Decimal
 
+from borsdata_client import BorsdataClient
+from kpi_sync_planner import (KPISyncPlanner, parse_shard,
+                              STATUS_DONE, STATUS_NOT_FOUND, STATUS_FAILED)
+from change_detector import ContentHashIndex, min_row_ratio
+from kpi_storage import open_writer
+import kpi_screener
+from kpi_history import open_history
+
 # Load environment variables from .env file located at project root
 load_dotenv(dotenv_path='../../.env')
 
@@ -50,6 +60,9 @@ API_BASE_URL = 'https://apiservice.borsdata.se'
 API_ENDPOINT_TEMPLATE = '/v1/instruments/kpis/{kpi_id}/{group}/{calculation}'
 BORSDATA_AUTH_KEY = os.getenv('BORSDATA_AUTH_KEY', '55d57eb27768456b9aa975e158d12898')
 
+# Order of the values in each row written to the KPI table
+KPI_VALUE_COLUMNS = ('kpi_id', 'group_period', 'calculation', 'instrument_id', 'numeric_value', 'string_value')
+
 API_HEADERS = {
     'accept': 'text/plain',
     'User-Agent': 'PSW-KPI-Nordic-Sync/1.0'
@@ -72,6 +85,10 @@ KPI_FETCH_CONFIG = [
     # Add more KPI configurations as needed
 ]
 
+# Number of KPI combinations fetched at the same time. 1 keeps the original
+# one-after-another behaviour; higher values overlap API calls with DB writes.
+DEFAULT_CONCURRENCY = int(os.getenv('KPI_SYNC_CONCURRENCY', 1))
+
 # Logging configuration
 LOG_DIR = os.getenv('LOG_PATH', "../../storage/logs")
 os.makedirs(LOG_DIR, exist_ok=True)
@@ -105,8 +122,13 @@ class KPINordicSync:
     def __init__(self):
         self.db_connection = None
         self.db_cursor = None
-        self.session = requests.Session()
-        self.session.headers.update(API_HEADERS)
+        self.client = BorsdataClient(BORSDATA_AUTH_KEY, headers=API_HEADERS, base_url=API_BASE_URL)
+        self._stats_lock = threading.Lock()  # fetches may run on several threads
+        self.planner: Optional[KPISyncPlanner] = None  # set for full-catalogue runs
+        self.not_found = set()  # combinations the API answered with 404
+        self.kpi_writer = None  # CompactKPIWriter once kpi_nordic is the compact layout
+        self.changed_series = set()  # combinations whose stored values changed in this run
+        self.history = None  # KPIHistory when kpi_value_history exists
         
         # Statistics
         self.stats = {
@@ -114,11 +136,18 @@ class KPINordicSync:
             'processed_records': 0,
             'inserted': 0,
             'updated': 0,
+            'deleted': 0,
+            'unchanged': 0,
             'errors': 0,
             'skipped': 0,
             'start_time': datetime.now()
         }
     
+    def count_stat(self, name: str, amount: int = 1):
+        """Add to a statistics counter; fetches and stores run on several threads"""
+        with self._stats_lock:
+            self.stats[name] += amount
+    
     def connect_database(self) -> bool:
         """Establish database connection"""
         try:
@@ -158,15 +187,13 @@ class KPINordicSync:
     def fetch_kpi_nordic_data(self, kpi_id: int, group: str, calculation: str) -> Optional[Dict[str, Any]]:
         """Fetch Nordic KPI data for specific parameters from Börsdata API"""
         try:
-            # Build URL
             endpoint = API_ENDPOINT_TEMPLATE.format(kpi_id=kpi_id, group=group, calculation=calculation)
-            url = f"{API_BASE_URL}{endpoint}"
-            params = {'authKey': BORSDATA_AUTH_KEY}
-            
+
             logger.debug(f"Fetching Nordic KPI data: KPI={kpi_id}, Group={group}, Calc={calculation}")
-            
-            response = self.session.get(url, params=params, timeout=30)
-            self.stats['api_calls'] += 1
+
+            # The client waits on the shared Börsdata rate limiter before each call
+            response = self.client.get(endpoint)
+            self.count_stat('api_calls')
             
             if response.status_code == 200:
                 data = response.json()
@@ -175,6 +202,8 @@ class KPINordicSync:
                 
             elif response.status_code == 404:
                 logger.warning(f"No Nordic data found for KPI {kpi_id}/{group}/{calculation} (404)")
+                with self._stats_lock:
+                    self.not_found.add((kpi_id, group, calculation))
                 return None
             elif response.status_code == 401:
                 logger.error("API authentication failed (401)")
@@ -213,16 +242,6 @@ class KPINordicSync:
                 logger.warning(f"No values found in response for Nordic KPI {kpi_id}/{group}/{calculation}")
                 return 0
             
-            # Prepare SQL statement with ON DUPLICATE KEY UPDATE
-            insert_sql = """
-                INSERT INTO kpi_nordic (kpi_id, group_period, calculation, instrument_id, numeric_value, string_value)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                    numeric_value = VALUES(numeric_value),
-                    string_value = VALUES(string_value),
-                    updated_at = CURRENT_TIMESTAMP
-            """
-            
             batch_data = []
             for value_item in values:
                 try:
@@ -233,7 +252,7 @@ class KPINordicSync:
                     # Validate required fields
                     if instrument_id is None:
                         logger.warning(f"Skipping value with missing instrument_id: {value_item}")
-                        self.stats['skipped'] += 1
+                        self.count_stat('skipped')
                         continue
                     
                     # Convert numeric value to Decimal if not None
@@ -249,23 +268,40 @@ class KPINordicSync:
                     
                 except Exception as e:
                     logger.error(f"Error processing Nordic value item {value_item}: {e}")
-                    self.stats['errors'] += 1
+                    self.count_stat('errors')
                     continue
             
-            # Execute batch insert
             if batch_data:
-                self.db_cursor.executemany(insert_sql, batch_data)
-                
-                # Track insert vs update counts (approximate)
-                affected_rows = self.db_cursor.rowcount
-                if affected_rows > 0:
-                    # Rough estimate: if rowcount == len(batch_data), likely all inserts
-                    # if rowcount == 2 * len(batch_data), likely all updates
-                    if affected_rows <= len(batch_data):
-                        self.stats['inserted'] += affected_rows
+                if os.getenv('CHANGE_DETECTION', '1') == '0':
+                    self.write_kpi_values(batch_data, kpi_id, group, calculation)
+                    self.changed_series.add((kpi_id, group, calculation))
+                    if self.history:
+                        self.history.record(kpi_id, group, calculation, batch_data, changed_only=False)
+                else:
+                    # Diff against the content-hash index; only added or changed values
+                    # are written and values that disappeared from the response are deleted
+                    index = ContentHashIndex(self.db_cursor, 'kpi_nordic', KPI_VALUE_COLUMNS, ('instrument_id',),
+                                             scope={'kpi_id': kpi_id, 'group_period': group, 'calculation': calculation})
+                    changes = index.diff(batch_data)
+                    missing = len(changes.deleted_keys)
+                    if changes.skip_mass_deletes(min_row_ratio()):
+                        logger.warning(f"Nordic KPI {kpi_id}/{group}/{calculation} response is missing {missing} of "
+                                       f"{changes.tracked} stored values; skipping deletes")
+                    if changes.changed_rows:
+                        self.write_kpi_values(changes.changed_rows, kpi_id, group, calculation)
+                    if self.kpi_writer:
+                        self.kpi_writer.delete(kpi_id, group, calculation, changes.deleted_keys)
                     else:
-                        self.stats['updated'] += (affected_rows - len(batch_data))
-                        self.stats['inserted'] += (2 * len(batch_data) - affected_rows)
+                        index.delete_rows(changes.deleted_keys)
+                    index.save(changes)
+                    if changes.changed_rows or changes.deleted_keys:
+                        self.changed_series.add((kpi_id, group, calculation))
+                        if self.history:
+                            self.history.record(kpi_id, group, calculation, changes.changed_rows,
+                                                [int(key) for key in changes.deleted_keys])
+                    for name, count in changes.counts().items():
+                        self.count_stat(name, count)
+                    logger.debug(f"Nordic KPI {kpi_id}/{group}/{calculation} changes: {changes}")
                 
                 logger.debug(f"Processed {len(batch_data)} Nordic values for KPI {kpi_id}/{group}/{calculation}")
             
@@ -273,13 +309,51 @@ class KPINordicSync:
             
         except mysql.connector.Error as err:
             logger.error(f"Database error processing Nordic KPI values {kpi_id}/{group}/{calculation}: {err}")
-            self.stats['errors'] += 1
+            self.count_stat('errors')
             return 0
         except Exception as e:
             logger.error(f"Unexpected error processing Nordic KPI values {kpi_id}/{group}/{calculation}: {e}")
-            self.stats['errors'] += 1
+            self.count_stat('errors')
             return 0
     
+    def write_kpi_values(self, rows: List[Tuple], kpi_id: int, group: str, calculation: str):
+        """Upsert rows in KPI_VALUE_COLUMNS order into kpi_nordic or, once migrated, its compact tables"""
+        if self.kpi_writer:
+            self.kpi_writer.upsert(kpi_id, group, calculation, rows)
+            return
+        self.db_cursor.executemany("""
+            INSERT INTO kpi_nordic (kpi_id, group_period, calculation, instrument_id, numeric_value, string_value)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                numeric_value = VALUES(numeric_value),
+                string_value = VALUES(string_value),
+                updated_at = CURRENT_TIMESTAMP
+        """, rows)
+    
+    def refresh_screener(self):
+        """Post-sync stage: rebuild the kpi_screener_nordic columns of the series that changed"""
+        try:
+            kpi_screener.refresh(self.db_cursor, 'nordic', KPI_FETCH_CONFIG, self.changed_series, log=logger)
+            self.db_connection.commit()
+        except RuntimeError as e:
+            logger.warning(f"Skipping Nordic KPI screener refresh: {e}")
+        except mysql.connector.Error as err:
+            logger.error(f"Failed to refresh Nordic KPI screener: {err}")
+            self.db_connection.rollback()
+            self.count_stat('errors')
+    
+    def apply_history_retention(self):
+        """Post-sync stage: downsample and expire old KPI value history"""
+        if not self.history:
+            return
+        try:
+            self.history.apply_retention()
+            self.db_connection.commit()
+        except mysql.connector.Error as err:
+            logger.error(f"Failed to apply Nordic KPI history retention: {err}")
+            self.db_connection.rollback()
+            self.count_stat('errors')
+    
     def get_available_kpi_ids(self) -> List[int]:
         """Get list of available KPI IDs from kpi_metadata table"""
         try:
@@ -291,55 +365,138 @@ class KPINordicSync:
             logger.error(f"Failed to fetch available KPI IDs: {err}")
             return []
     
-    def sync_kpi_nordic_data(self) -> bool:
-        """Main synchronization process"""
+    def store_kpi_data(self, kpi_data: Optional[Dict[str, Any]], kpi_id: int, group: str, calculation: str):
+        """Upsert one fetched Nordic KPI response and commit it (with its progress row in full-catalogue runs)"""
+        config = (kpi_id, group, calculation)
+        if kpi_data:
+            # Process the values
+            errors_before = self.stats['errors']
+            processed = self.process_kpi_values(kpi_data, kpi_id, group, calculation)
+            self.count_stat('processed_records', processed)
+            
+            # Commit after each KPI configuration
+            try:
+                if self.planner:
+                    status = STATUS_DONE if self.stats['errors'] == errors_before else STATUS_FAILED
+                    self.planner.record_result(config, status, processed)
+                self.db_connection.commit()
+                logger.debug(f"Committed {processed} Nordic records for KPI {kpi_id}/{group}/{calculation}")
+            except mysql.connector.Error as err:
+                logger.error(f"Failed to commit Nordic KPI {kpi_id}/{group}/{calculation}: {err}")
+                self.db_connection.rollback()
+                self.count_stat('errors')
+        else:
+            logger.warning(f"No Nordic data received for KPI {kpi_id}/{group}/{calculation}")
+            self.count_stat('skipped')
+            
+            if self.planner:
+                status = STATUS_NOT_FOUND if config in self.not_found else STATUS_FAILED
+                try:
+                    self.planner.record_result(config, status)
+                    self.db_connection.commit()
+                except mysql.connector.Error as err:
+                    logger.error(f"Failed to record progress for Nordic KPI {kpi_id}/{group}/{calculation}: {err}")
+                    self.db_connection.rollback()
+                    self.count_stat('errors')
+    
+    async def fetch_and_store_concurrently(self, configs: List[Tuple[int, str, str]], concurrency: int):
+        """
+        Fetch many KPI combinations at once while a single writer stores
+        finished responses.
+
+        Up to `concurrency` API calls are in flight, paced by the client's
+        shared rate limiter. Each response is handed to the writer as soon as
+        it arrives, so DB upserts overlap with requests still running. Only
+        the writer touches the database cursor.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+        semaphore = asyncio.Semaphore(concurrency)
+        total_configs = len(configs)
+        done = 0
+
+        async def fetch(config):
+            # Hold the slot until the writer accepts the response so a slow
+            # database also slows fetching instead of buffering responses
+            async with semaphore:
+                kpi_data = await asyncio.to_thread(self.fetch_kpi_nordic_data, *config)
+                await queue.put((config, kpi_data))
+
+        async def writer():
+            nonlocal done
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                (kpi_id, group, calculation), kpi_data = item
+                done += 1
+                logger.info(f"Storing Nordic configuration {done}/{total_configs}: KPI {kpi_id}/{group}/{calculation}")
+                try:
+                    await asyncio.to_thread(self.store_kpi_data, kpi_data, kpi_id, group, calculation)
+                except Exception as e:
+                    logger.error(f"Unexpected error storing Nordic KPI {kpi_id}/{group}/{calculation}: {e}")
+                    self.count_stat('errors')
+
+        writer_task = asyncio.create_task(writer())
+        try:
+            await asyncio.gather(*(fetch(config) for config in configs))
+        finally:
+            await queue.put(None)
+            await writer_task
+    
+    def sync_kpi_nordic_data(self, concurrency: int = 1, full_catalogue: bool = False,
+                             run_id: Optional[str] = None, shard: Tuple[int, int] = (1, 1)) -> bool:
+        """
+        Main synchronization process
+
+        By default the combinations in KPI_FETCH_CONFIG are synced. With
+        full_catalogue=True every KPI in kpi_metadata is synced for every
+        catalogue group and calculation (see kpi_sync_planner.py); run_id and
+        shard select which run to resume and which slice of it to fetch.
+        """
         try:
             logger.info("Starting KPI Nordic data synchronization...")
             
             # Connect to database
             if not self.connect_database():
                 return False
+            self.kpi_writer = open_writer(self.db_cursor, 'nordic', log=logger)
+            self.history = open_history(self.db_cursor, 'nordic', log=logger)
             
             # Get available KPI IDs if using dynamic configuration
             available_kpis = self.get_available_kpi_ids()
             if not available_kpis:
                 logger.warning("No KPI metadata found. Run kpi_metadata_sync.py first.")
             
-            # Process configured KPI combinations
-            total_configs = len(KPI_FETCH_CONFIG)
-            logger.info(f"Processing {total_configs} Nordic KPI configurations...")
+            if full_catalogue:
+                if not available_kpis:
+                    logger.error("Full-catalogue sync needs kpi_metadata. Run kpi_metadata_sync.py first.")
+                    return False
+                self.planner = KPISyncPlanner(self.db_cursor, 'nordic', run_id=run_id, shard=shard, log=logger)
+                configs = self.planner.build_plan(available_kpis)
+            else:
+                # Process configured KPI combinations
+                configs = []
+                for kpi_id, group, calculation in KPI_FETCH_CONFIG:
+                    # Check if KPI exists in metadata (if we have the list)
+                    if available_kpis and kpi_id not in available_kpis:
+                        logger.warning(f"KPI {kpi_id} not found in metadata, skipping...")
+                        self.count_stat('skipped')
+                        continue
+                    configs.append((kpi_id, group, calculation))
+
+            total_configs = len(configs)
+            if concurrency > 1:
+                logger.info(f"Processing {total_configs} Nordic KPI configurations with {concurrency} concurrent fetches...")
+                asyncio.run(self.fetch_and_store_concurrently(configs, concurrency))
+            else:
+                logger.info(f"Processing {total_configs} Nordic KPI configurations...")
+                for i, (kpi_id, group, calculation) in enumerate(configs, 1):
+                    logger.info(f"Processing Nordic configuration {i}/{total_configs}: KPI {kpi_id}/{group}/{calculation}")
+                    kpi_data = self.fetch_kpi_nordic_data(kpi_id, group, calculation)
+                    self.store_kpi_data(kpi_data, kpi_id, group, calculation)
             
-            for i, (kpi_id, group, calculation) in enumerate(KPI_FETCH_CONFIG, 1):
-                logger.info(f"Processing Nordic configuration {i}/{total_configs}: KPI {kpi_id}/{group}/{calculation}")
-                
-                # Check if KPI exists in metadata (if we have the list)
-                if available_kpis and kpi_id not in available_kpis:
-                    logger.warning(f"KPI {kpi_id} not found in metadata, skipping...")
-                    self.stats['skipped'] += 1
-                    continue
-                
-                # Fetch data from API
-                kpi_data = self.fetch_kpi_nordic_data(kpi_id, group, calculation)
-                
-                if kpi_data:
-                    # Process the values
-                    processed = self.process_kpi_values(kpi_data, kpi_id, group, calculation)
-                    self.stats['processed_records'] += processed
-                    
-                    # Commit after each KPI configuration
-                    try:
-                        self.db_connection.commit()
-                        logger.debug(f"Committed {processed} Nordic records for KPI {kpi_id}/{group}/{calculation}")
-                    except mysql.connector.Error as err:
-                        logger.error(f"Failed to commit Nordic KPI {kpi_id}/{group}/{calculation}: {err}")
-                        self.db_connection.rollback()
-                        self.stats['errors'] += 1
-                else:
-                    logger.warning(f"No Nordic data received for KPI {kpi_id}/{group}/{calculation}")
-                    self.stats['skipped'] += 1
-                
-                # Small delay between API calls to be respectful
-                time.sleep(0.5)
+            self.refresh_screener()
+            self.apply_history_retention()
             
             # Final statistics
             duration = datetime.now() - self.stats['start_time']
@@ -348,6 +505,8 @@ class KPINordicSync:
                        f"Processed_records={self.stats['processed_records']}, "
                        f"Inserted={self.stats['inserted']}, "
                        f"Updated={self.stats['updated']}, "
+                       f"Deleted={self.stats['deleted']}, "
+                       f"Unchanged={self.stats['unchanged']}, "
                        f"Errors={self.stats['errors']}, "
                        f"Skipped={self.stats['skipped']}, "
                        f"Duration={duration}")
@@ -364,8 +523,19 @@ class KPINordicSync:
             self.disconnect_database()
 
 
-def main():
+def main(argv=()):
     """Main execution function"""
+    parser = argparse.ArgumentParser(description="Synchronize Nordic KPI data from Börsdata")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help="KPI combinations fetched at the same time (default: %(default)s, 1 = serial)")
+    parser.add_argument('--full-catalogue', action='store_true',
+                        help="Sync every KPI in kpi_metadata for all catalogue groups and calculations")
+    parser.add_argument('--run-id',
+                        help="Full-catalogue run to start or resume (default: today's date)")
+    parser.add_argument('--shard', type=parse_shard, default=(1, 1), metavar='I/N',
+                        help="Only fetch slice I of N of the full-catalogue plan (default: 1/1)")
+    args = parser.parse_args(argv)
+    
     start_time = datetime.now()
     
     # Console delimiter for clean display
@@ -381,24 +551,26 @@ def main():
     try:
         # Create synchronizer instance and run
         sync = KPINordicSync()
-        success = sync.sync_kpi_nordic_data()
+        success = sync.sync_kpi_nordic_data(concurrency=max(1, args.concurrency),
+                                            full_catalogue=args.full_catalogue,
+                                            run_id=args.run_id, shard=args.shard)
         
         duration = datetime.now() - start_time
         
         if success:
             logger.info(f"Script completed successfully. Duration: {duration}")
-            sys.exit(0)
+            return 0
         else:
             logger.error(f"Script failed. Duration: {duration}")
-            sys.exit(1)
+            return 1
             
     except KeyboardInterrupt:
         logger.warning("Script interrupted by user")
-        sys.exit(130)
+        return 130
     except Exception as e:
         logger.error(f"Script failed with unexpected error: {e}")
-        sys.exit(1)
+        return 1
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main(sys.argv[1:]))
\ No newline at end of file
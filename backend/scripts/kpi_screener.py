@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+KPI Screener Matrix
+Wide, one-row-per-instrument copy of the KPI series used for screening
+
+kpi_nordic / kpi_global hold one row per (kpi_id, group, calculation,
+instrument), so a screen over several KPIs needs one correlated lookup per
+KPI and instrument. kpi_screener_nordic / kpi_screener_global pivot the
+configured series into one DOUBLE column each, e.g. k1_1year_mean for the
+1-year mean dividend yield:
+
+    SELECT instrument_id, k1_1year_mean, k2_1year_mean
+    FROM kpi_screener_nordic
+    WHERE k1_1year_mean > 3 AND k2_1year_mean BETWEEN 0 AND 15
+    ORDER BY k1_1year_mean DESC;
+
+kpi_nordic_sync.py and kpi_global_sync.py call refresh() after each run with
+the series whose values changed, and only those columns are rebuilt. Columns
+for newly configured series are added (and filled) on the next refresh; run
+this file to rebuild every column:
+
+    python kpi_screener.py --endpoint nordic
+
+Target Database: psw_marketdata
+Tables: kpi_screener_nordic, kpi_screener_global
+(see database/migrations/create_kpi_screener_tables.sql)
+
+Environment Variables (optional):
+- KPI_SCREENER_SERIES: comma-separated kpi_id/group/calculation series to
+  pivot, e.g. 1/1year/mean,2/1year/mean (default: the sync script's
+  KPI_FETCH_CONFIG)
+
+Author: PSW Development Team
+"""
+
+import os
+import re
+import sys
+import argparse
+import logging
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+import mysql.connector
+from dotenv import load_dotenv
+
+ENDPOINTS = ('nordic', 'global')
+
+KPIConfig = Tuple[int, str, str]
+
+logger = logging.getLogger(__name__)
+
+
+def column_name(config: KPIConfig) -> str:
+    """Screener column for a series, e.g. (1, '1year', 'mean') -> k1_1year_mean"""
+    kpi_id, group, calculation = config
+    return re.sub(r'\W', '_', f"k{kpi_id}_{group}_{calculation}").lower()
+
+
+def parse_series(value: str) -> List[KPIConfig]:
+    """Parse 'kpi_id/group/calculation,...' into series tuples"""
+    series = []
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        try:
+            kpi_id, group, calculation = (part.strip() for part in item.split('/'))
+            series.append((int(kpi_id), group, calculation))
+        except ValueError:
+            raise ValueError(f"Invalid KPI series '{item}', expected e.g. 1/1year/mean")
+    return series
+
+
+def configured_series(default: Sequence[KPIConfig]) -> List[KPIConfig]:
+    """Series in the screener: KPI_SCREENER_SERIES if set, otherwise default"""
+    # Read at call time so values from the calling script's .env are used
+    value = os.getenv('KPI_SCREENER_SERIES')
+    return parse_series(value) if value else list(dict.fromkeys(default))
+
+
+class KPIScreener:
+    """Maintains the screener matrix of one endpoint ('nordic' or 'global')"""
+
+    def __init__(self, db_cursor, endpoint: str, series: Sequence[KPIConfig],
+                 log: Optional[logging.Logger] = None):
+        if endpoint not in ENDPOINTS:
+            raise ValueError(f"Invalid endpoint '{endpoint}', expected one of {', '.join(ENDPOINTS)}")
+        self.log = log or logger
+        self.db_cursor = db_cursor
+        self.endpoint = endpoint
+        self.source_table = f"kpi_{endpoint}"
+        self.table = f"kpi_screener_{endpoint}"
+        self.series = list(series)
+
+    def ensure_columns(self) -> List[KPIConfig]:
+        """Add a column for every configured series that has none; returns the added series"""
+        self.db_cursor.execute("""
+            SELECT COLUMN_NAME
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        """, (self.table,))
+        existing = {row[0].lower() for row in self.db_cursor.fetchall()}
+        if not existing:
+            raise RuntimeError(f"{self.table} is missing; run database/migrations/create_kpi_screener_tables.sql")
+
+        added = [config for config in self.series if column_name(config) not in existing]
+        if added:
+            columns = ', '.join(f"ADD COLUMN `{column_name(c)}` DOUBLE NULL COMMENT 'KPI {c[0]} {c[1]} {c[2]}'"
+                                for c in added)
+            self.db_cursor.execute(f"ALTER TABLE {self.table} {columns}")
+            self.log.info(f"Added {len(added)} series columns to {self.table}: "
+                          f"{', '.join(column_name(c) for c in added)}")
+        return added
+
+    def refresh_series(self, config: KPIConfig) -> int:
+        """Rebuild one column from the long KPI table; returns rows affected"""
+        column = column_name(config)
+        self.db_cursor.execute(f"""
+            INSERT INTO {self.table} (instrument_id, `{column}`)
+            SELECT instrument_id, numeric_value
+            FROM {self.source_table}
+            WHERE kpi_id = %s AND group_period = %s AND calculation = %s
+            ON DUPLICATE KEY UPDATE `{column}` = VALUES(`{column}`)
+        """, config)
+        affected = max(self.db_cursor.rowcount, 0)
+
+        # Instruments that no longer have a value for the series
+        self.db_cursor.execute(f"""
+            UPDATE {self.table} s
+            LEFT JOIN {self.source_table} k
+                ON k.instrument_id = s.instrument_id
+                AND k.kpi_id = %s AND k.group_period = %s AND k.calculation = %s
+            SET s.`{column}` = NULL
+            WHERE s.`{column}` IS NOT NULL AND k.instrument_id IS NULL
+        """, config)
+        return affected + max(self.db_cursor.rowcount, 0)
+
+    def remove_empty_rows(self) -> int:
+        """Delete instruments without a value in any configured column"""
+        if not self.series:
+            return 0
+        all_null = ' AND '.join(f"`{column_name(c)}` IS NULL" for c in self.series)
+        self.db_cursor.execute(f"DELETE FROM {self.table} WHERE {all_null}")
+        return max(self.db_cursor.rowcount, 0)
+
+    def refresh(self, changed: Optional[Iterable[KPIConfig]] = None) -> int:
+        """
+        Rebuild the columns of the changed series (all series when changed
+        is None) plus any newly added columns. Does not commit; returns the
+        number of series rebuilt.
+        """
+        added = self.ensure_columns()
+        wanted: Set[KPIConfig] = set(self.series) if changed is None else set(changed) | set(added)
+        to_refresh = [config for config in self.series if config in wanted]
+        if not to_refresh:
+            self.log.info(f"{self.table}: no configured series changed")
+            return 0
+
+        affected = sum(self.refresh_series(config) for config in to_refresh)
+        removed = self.remove_empty_rows()
+        self.log.info(f"{self.table}: rebuilt {len(to_refresh)} of {len(self.series)} series "
+                      f"({affected} rows affected, {removed} empty rows removed)")
+        return len(to_refresh)
+
+
+def refresh(db_cursor, endpoint: str, default_series: Sequence[KPIConfig],
+            changed: Optional[Iterable[KPIConfig]] = None, log: Optional[logging.Logger] = None) -> int:
+    """Post-sync stage used by the KPI sync scripts; see KPIScreener.refresh()"""
+    return KPIScreener(db_cursor, endpoint, configured_series(default_series), log=log).refresh(changed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the KPI screener matrix from kpi_nordic / kpi_global")
+    parser.add_argument('--endpoint', choices=ENDPOINTS, required=True,
+                        help="KPI table to pivot")
+    parser.add_argument('--series', type=parse_series,
+                        help="Comma-separated kpi_id/group/calculation series (default: KPI_SCREENER_SERIES "
+                             "or the sync script's KPI_FETCH_CONFIG)")
+    args = parser.parse_args(argv)
+
+    load_dotenv(dotenv_path='../../.env')
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s",
+                        datefmt="%Y-%m-%d %H:%M:%S")
+
+    if args.series:
+        series = args.series
+    elif args.endpoint == 'nordic':
+        from kpi_nordic_sync import KPI_FETCH_CONFIG
+        series = configured_series(KPI_FETCH_CONFIG)
+    else:
+        from kpi_global_sync import KPI_FETCH_CONFIG
+        series = configured_series(KPI_FETCH_CONFIG)
+
+    try:
+        connection = mysql.connector.connect(
+            host=os.getenv('DB_HOST'),
+            user=os.getenv('DB_USERNAME'),
+            password=os.getenv('DB_PASSWORD'),
+            database=os.getenv('DB_MARKETDATA', 'psw_marketdata'),
+            port=int(os.getenv('DB_PORT', 3306)),
+            charset='utf8mb4',
+            use_unicode=True
+        )
+    except mysql.connector.Error as err:
+        logger.error(f"Database connection failed: {err}")
+        return 1
+
+    try:
+        cursor = connection.cursor(buffered=True)
+        KPIScreener(cursor, args.endpoint, series).refresh()
+        connection.commit()
+        cursor.close()
+        return 0
+    except (mysql.connector.Error, RuntimeError) as err:
+        logger.error(f"Failed to rebuild kpi_screener_{args.endpoint}: {err}")
+        connection.rollback()
+        return 1
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+KPI Storage
+Compact, dictionary-encoded storage for kpi_nordic_sync.py and kpi_global_sync.py
+
+The original kpi_nordic / kpi_global tables repeat group_period and
+calculation as strings on every row, carry both a DECIMAL and a TEXT value
+column and index the whole (kpi_id, group_period, calculation,
+instrument_id) tuple several times. The compact layout instead:
+
+- maps each (kpi_id, group_period, calculation) to an INT series_id in
+  kpi_series, shared by both endpoints;
+- keeps one row per series and instrument in kpi_<endpoint>_values with a
+  DOUBLE numeric_value, clustered on (series_id, instrument_id);
+- keeps the rare string values apart in kpi_<endpoint>_strings.
+
+After database/migrations/create_kpi_compact_tables.sql has run, kpi_nordic
+and kpi_global are views with the old columns, so readers keep working
+unchanged while the sync scripts write through CompactKPIWriter.
+
+Target Database: psw_marketdata
+Tables: kpi_series, kpi_nordic_values, kpi_nordic_strings, kpi_global_values, kpi_global_strings
+
+Environment Variables (optional):
+- KPI_STORAGE_LAYOUT: 'compact', 'legacy' or 'auto' (default auto: compact
+  once the migration has replaced kpi_<endpoint> with a view)
+
+Author: PSW Development Team
+"""
+
+import os
+import logging
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import mysql.connector
+
+LAYOUT_LEGACY = 'legacy'
+LAYOUT_COMPACT = 'compact'
+
+WRITE_CHUNK_SIZE = 1000
+
+KPIConfig = Tuple[int, str, str]
+
+logger = logging.getLogger(__name__)
+
+
+def detect_layout(db_cursor, endpoint: str) -> str:
+    """Storage layout for an endpoint, from KPI_STORAGE_LAYOUT or the current schema"""
+    layout = os.getenv('KPI_STORAGE_LAYOUT', 'auto').lower()
+    if layout in (LAYOUT_LEGACY, LAYOUT_COMPACT):
+        return layout
+    db_cursor.execute("""
+        SELECT TABLE_TYPE
+        FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (f"kpi_{endpoint}",))
+    row = db_cursor.fetchone()
+    return LAYOUT_COMPACT if row and row[0] == 'VIEW' else LAYOUT_LEGACY
+
+
+class KPISeriesIds:
+    """Cached (kpi_id, group_period, calculation) -> kpi_series.series_id lookups"""
+
+    def __init__(self, db_cursor):
+        self.db_cursor = db_cursor
+        self._series_ids: Dict[KPIConfig, int] = {}
+
+    def get(self, kpi_id: int, group: str, calculation: str) -> int:
+        """Id of a KPI series, registering it in kpi_series on first use"""
+        config = (kpi_id, group, calculation)
+        if config not in self._series_ids:
+            self.db_cursor.execute("""
+                SELECT series_id FROM kpi_series
+                WHERE kpi_id = %s AND group_period = %s AND calculation = %s
+            """, config)
+            row = self.db_cursor.fetchone()
+            if row:
+                self._series_ids[config] = row[0]
+            else:
+                # Every INSERT ... ON DUPLICATE KEY UPDATE uses up an AUTO_INCREMENT
+                # value, so only new series get here (or a concurrent insert of one)
+                self.db_cursor.execute("""
+                    INSERT INTO kpi_series (kpi_id, group_period, calculation)
+                    VALUES (%s, %s, %s)
+                    ON DUPLICATE KEY UPDATE series_id = LAST_INSERT_ID(series_id)
+                """, config)
+                self._series_ids[config] = self.db_cursor.lastrowid
+        return self._series_ids[config]
+
+
+class CompactKPIWriter:
+    """Writes KPI rows for one endpoint ('nordic' or 'global') into the compact tables"""
+
+    def __init__(self, db_cursor, endpoint: str, log: Optional[logging.Logger] = None):
+        self.log = log or logger
+        self.db_cursor = db_cursor
+        self.endpoint = endpoint
+        self.values_table = f"kpi_{endpoint}_values"
+        self.strings_table = f"kpi_{endpoint}_strings"
+        self.series_ids = KPISeriesIds(db_cursor)
+
+    def series_id(self, kpi_id: int, group: str, calculation: str) -> int:
+        """Id of a KPI series, registering it in kpi_series on first use"""
+        return self.series_ids.get(kpi_id, group, calculation)
+
+    def upsert(self, kpi_id: int, group: str, calculation: str, rows: Sequence[Tuple]) -> int:
+        """
+        Write rows in KPI_VALUE_COLUMNS order (kpi_id, group_period,
+        calculation, instrument_id, numeric_value, string_value) for one series.
+
+        Every row gets a values row (numeric_value may be NULL); string values
+        are upserted when present and removed when the new row has none.
+        Does not commit. Returns the number of rows written.
+        """
+        series_id = self.series_id(kpi_id, group, calculation)
+        values = [(series_id, row[3], row[4]) for row in rows]
+        strings = [(series_id, row[3], row[5]) for row in rows if row[5] is not None]
+        no_strings = [(series_id, row[3]) for row in rows if row[5] is None]
+
+        for start in range(0, len(values), WRITE_CHUNK_SIZE):
+            self.db_cursor.executemany(f"""
+                INSERT INTO {self.values_table} (series_id, instrument_id, numeric_value)
+                VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE numeric_value = VALUES(numeric_value)
+            """, values[start:start + WRITE_CHUNK_SIZE])
+        for start in range(0, len(strings), WRITE_CHUNK_SIZE):
+            self.db_cursor.executemany(f"""
+                INSERT INTO {self.strings_table} (series_id, instrument_id, string_value)
+                VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE string_value = VALUES(string_value)
+            """, strings[start:start + WRITE_CHUNK_SIZE])
+        if no_strings and self._has_strings(series_id):
+            for start in range(0, len(no_strings), WRITE_CHUNK_SIZE):
+                self.db_cursor.executemany(f"""
+                    DELETE FROM {self.strings_table} WHERE series_id = %s AND instrument_id = %s
+                """, no_strings[start:start + WRITE_CHUNK_SIZE])
+        return len(values)
+
+    def delete(self, kpi_id: int, group: str, calculation: str, instrument_ids: Iterable) -> int:
+        """Delete the values of the given instruments from one series (no commit); returns rows deleted"""
+        series_id = self.series_id(kpi_id, group, calculation)
+        params = [(series_id, instrument_id) for instrument_id in instrument_ids]
+        deleted = 0
+        for start in range(0, len(params), WRITE_CHUNK_SIZE):
+            chunk = params[start:start + WRITE_CHUNK_SIZE]
+            self.db_cursor.executemany(f"""
+                DELETE FROM {self.values_table} WHERE series_id = %s AND instrument_id = %s
+            """, chunk)
+            deleted += max(self.db_cursor.rowcount, 0)
+            self.db_cursor.executemany(f"""
+                DELETE FROM {self.strings_table} WHERE series_id = %s AND instrument_id = %s
+            """, chunk)
+        return deleted
+
+    def _has_strings(self, series_id: int) -> bool:
+        self.db_cursor.execute(f"SELECT 1 FROM {self.strings_table} WHERE series_id = %s LIMIT 1", (series_id,))
+        return self.db_cursor.fetchone() is not None
+
+
+def open_writer(db_cursor, endpoint: str, log: Optional[logging.Logger] = None) -> Optional[CompactKPIWriter]:
+    """CompactKPIWriter when the endpoint uses the compact layout, otherwise None"""
+    log = log or logger
+    try:
+        layout = detect_layout(db_cursor, endpoint)
+    except mysql.connector.Error as err:
+        log.warning(f"Could not detect KPI storage layout for {endpoint}, using legacy table: {err}")
+        return None
+    log.info(f"KPI {endpoint} storage layout: {layout}")
+    return CompactKPIWriter(db_cursor, endpoint, log) if layout == LAYOUT_COMPACT else None
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+KPI Sync Planner
+Plans full-catalogue KPI synchronization runs for kpi_nordic_sync.py and kpi_global_sync.py
+
+Instead of the hand-written KPI_FETCH_CONFIG list, a full-catalogue run covers
+every kpi_id in kpi_metadata combined with every configured group and
+calculation. Combinations Börsdata has answered with 404 before are recorded
+in kpi_sync_catalog and left out of later plans.
+
+The plan can be split across several workers (--shard 2/4 takes the second of
+four slices) and every finished combination is recorded in kpi_sync_progress
+in the same transaction as its data, so re-running with the same run id
+resumes where an interrupted run stopped.
+
+Target Database: psw_marketdata
+Tables: kpi_sync_catalog, kpi_sync_progress
+(see database/migrations/create_kpi_sync_planner_tables.sql)
+
+Environment Variables (optional):
+- KPI_CATALOGUE_GROUPS: comma-separated groups (default 1year,3year,5year,10year)
+- KPI_CATALOGUE_CALCULATIONS: comma-separated calculations (default mean,median,max,min)
+
+Author: PSW Development Team
+"""
+
+import os
+import zlib
+import logging
+from datetime import datetime
+from typing import Iterable, List, Optional, Set, Tuple
+
+import mysql.connector
+
+# Groups and calculations combined with every KPI id in a full-catalogue run
+DEFAULT_CATALOGUE_GROUPS = '1year,3year,5year,10year'
+DEFAULT_CATALOGUE_CALCULATIONS = 'mean,median,max,min'
+
+# Progress statuses that count as finished when resuming a run
+STATUS_DONE = 'done'
+STATUS_NOT_FOUND = 'not_found'
+STATUS_FAILED = 'failed'
+FINISHED_STATUSES = (STATUS_DONE, STATUS_NOT_FOUND)
+
+KPIConfig = Tuple[int, str, str]
+
+logger = logging.getLogger(__name__)
+
+
+def _env_list(name: str, default: str) -> List[str]:
+    # Read at call time so values from the calling script's .env are used
+    return [item.strip() for item in os.getenv(name, default).split(',') if item.strip()]
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parse a 'I/N' shard spec (1-based) into a (index, count) tuple"""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}', expected e.g. 1/4")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard '{value}', index must be between 1 and {count}")
+    return index, count
+
+
+def shard_of(config: KPIConfig, shard_count: int) -> int:
+    """Stable 1-based shard for a combination, identical across processes and runs"""
+    key = f"{config[0]}/{config[1]}/{config[2]}".encode('utf-8')
+    return zlib.crc32(key) % shard_count + 1
+
+
+class KPISyncPlanner:
+    """Builds and tracks a full-catalogue KPI sync plan for one endpoint ('nordic' or 'global')"""
+
+    def __init__(self, db_cursor, endpoint: str, run_id: Optional[str] = None,
+                 shard: Tuple[int, int] = (1, 1), log: Optional[logging.Logger] = None):
+        self.log = log or logger
+        self.db_cursor = db_cursor
+        self.endpoint = endpoint
+        self.run_id = run_id or datetime.now().strftime('%Y-%m-%d')
+        self.shard_index, self.shard_count = shard
+
+    def all_combinations(self, kpi_ids: Iterable[int]) -> List[KPIConfig]:
+        """Every kpi_id x group x calculation in the catalogue"""
+        groups = _env_list('KPI_CATALOGUE_GROUPS', DEFAULT_CATALOGUE_GROUPS)
+        calculations = _env_list('KPI_CATALOGUE_CALCULATIONS', DEFAULT_CATALOGUE_CALCULATIONS)
+        return [
+            (kpi_id, group, calculation)
+            for kpi_id in sorted(set(kpi_ids))
+            for group in groups
+            for calculation in calculations
+        ]
+
+    def get_invalid_combinations(self) -> Set[KPIConfig]:
+        """Combinations Börsdata answered with 404 on an earlier run"""
+        self.db_cursor.execute("""
+            SELECT kpi_id, group_period, calculation
+            FROM kpi_sync_catalog
+            WHERE endpoint = %s AND is_valid = 0
+        """, (self.endpoint,))
+        return {(row[0], row[1], row[2]) for row in self.db_cursor.fetchall()}
+
+    def get_finished_combinations(self) -> Set[KPIConfig]:
+        """Combinations already finished in this run (for resuming)"""
+        placeholders = ', '.join(['%s'] * len(FINISHED_STATUSES))
+        self.db_cursor.execute(f"""
+            SELECT kpi_id, group_period, calculation
+            FROM kpi_sync_progress
+            WHERE run_id = %s AND endpoint = %s AND status IN ({placeholders})
+        """, (self.run_id, self.endpoint) + FINISHED_STATUSES)
+        return {(row[0], row[1], row[2]) for row in self.db_cursor.fetchall()}
+
+    def build_plan(self, kpi_ids: Iterable[int]) -> List[KPIConfig]:
+        """Combinations this worker still has to fetch in this run"""
+        combinations = self.all_combinations(kpi_ids)
+        try:
+            invalid = self.get_invalid_combinations()
+            finished = self.get_finished_combinations()
+        except mysql.connector.Error as err:
+            self.log.error(f"Failed to read KPI sync planner state: {err}")
+            raise
+
+        plan = [
+            config for config in combinations
+            if shard_of(config, self.shard_count) == self.shard_index
+            and config not in invalid
+            and config not in finished
+        ]
+        self.log.info(f"KPI {self.endpoint} catalogue plan (run {self.run_id}, shard {self.shard_index}/{self.shard_count}): "
+                    f"{len(combinations)} combinations, {len(invalid)} known invalid, "
+                    f"{len(finished)} already finished, {len(plan)} to fetch")
+        return plan
+
+    def record_result(self, config: KPIConfig, status: str, value_count: int = 0):
+        """
+        Record the outcome of one combination.
+
+        Uses the caller's cursor without committing, so the progress row is
+        committed together with the KPI values it describes.
+        """
+        kpi_id, group, calculation = config
+        self.db_cursor.execute("""
+            INSERT INTO kpi_sync_progress (run_id, endpoint, kpi_id, group_period, calculation, status, value_count)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                status = VALUES(status),
+                value_count = VALUES(value_count),
+                updated_at = CURRENT_TIMESTAMP
+        """, (self.run_id, self.endpoint, kpi_id, group, calculation, status, value_count))
+
+        if status in (STATUS_DONE, STATUS_NOT_FOUND):
+            self.db_cursor.execute("""
+                INSERT INTO kpi_sync_catalog (endpoint, kpi_id, group_period, calculation, is_valid, last_checked)
+                VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+                ON DUPLICATE KEY UPDATE
+                    is_valid = VALUES(is_valid),
+                    last_checked = CURRENT_TIMESTAMP
+            """, (self.endpoint, kpi_id, group, calculation, status == STATUS_DONE))
@@ -1,7 +1,22 @@
 import os
+import time
+import queue
+import shutil
+import tempfile
+import functools
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
+from shared_resources import connect_mysql
+from schema_sweep import new_table_info, sweep_schemas
+from column_profiler import ColumnProfiler
+from index_advisor import get_index_advice
+from digest_report import get_digest_report
+from server_metrics import read_global_variables, read_global_status, snapshot_deltas
+from overview_snapshots import table_state, save_snapshot, expire_full_snapshots
+from overview_writer import OverviewWriter, TableSpool, file_extension
 import mysql.connector
-import json
 import logging
 from datetime import datetime, date
 from decimal import Decimal
@@ -28,6 +43,28 @@ target_databases = [
     os.getenv('DB_PORTFOLIO', 'psw_portfolio')
 ]
 
+# How table structure is read: 'bulk' sweeps information_schema once for all
+# target databases (schema_sweep.py), 'per_table' runs DESCRIBE / SHOW INDEX
+# and the information_schema lookups for every table
+OVERVIEW_SWEEP_MODE = os.getenv('OVERVIEW_SWEEP_MODE', 'bulk').lower()
+
+# Overview sections (server, performance, security, replication and one per
+# target database) run in parallel on this many connections; a section still
+# running after OVERVIEW_SECTION_TIMEOUT seconds is killed and reported as an error
+OVERVIEW_WORKERS = max(1, int(os.getenv('OVERVIEW_WORKERS', 4)))
+OVERVIEW_SECTION_TIMEOUT = float(os.getenv('OVERVIEW_SECTION_TIMEOUT', 300))
+
+# Timestamped full overview files next to the snapshot history (overview_snapshots.py);
+# off by default, since the snapshots already keep the structure of every run
+OVERVIEW_FULL_SNAPSHOTS = os.getenv('OVERVIEW_FULL_SNAPSHOTS', '0') == '1'
+
+# Rows of real data shown per table in sample_data; column statistics come
+# from ColumnProfiler (column_profiler.py), not from these rows
+OVERVIEW_SAMPLE_ROWS = int(os.getenv('OVERVIEW_SAMPLE_ROWS', 0))
+
+# Overview file format: pretty (indented), compact or ndjson (see overview_writer.py)
+OVERVIEW_OUTPUT_FORMAT = os.getenv('OVERVIEW_OUTPUT_FORMAT', 'pretty').lower()
+
 # === Setup Logging ===
 log_dir = os.getenv('LOG_PATH', "../../storage/logs")
 os.makedirs(log_dir, exist_ok=True)
@@ -90,14 +127,7 @@ def get_mysql_server_info(cursor):
             'default_storage_engine', 'character_set_server', 'collation_server'
         ]
         
-        server_info["critical_variables"] = {}
-        for var in critical_vars:
-            try:
-                cursor.execute(f"SELECT @@{var};")
-                result = cursor.fetchone()
-                server_info["critical_variables"][var] = result[0] if result else None
-            except:
-                server_info["critical_variables"][var] = "N/A"
+        server_info["critical_variables"] = read_global_variables(cursor, critical_vars)
         
         # Engine status
         cursor.execute("SHOW ENGINES;")
@@ -116,14 +146,11 @@ def get_mysql_server_info(cursor):
             'Created_tmp_tables', 'Created_tmp_disk_tables'
         ]
         
-        server_info["performance_status"] = {}
-        for var in performance_vars:
-            try:
-                cursor.execute(f"SHOW GLOBAL STATUS LIKE '{var}';")
-                result = cursor.fetchone()
-                server_info["performance_status"][var] = result[1] if result else None
-            except:
-                server_info["performance_status"][var] = "N/A"
+        global_status = read_global_status(cursor)
+        server_info["performance_status"] = {var: global_status.get(var) for var in performance_vars}
+        
+        # Rates since the previous run; the counters above are totals since server start
+        server_info["status_deltas"] = snapshot_deltas(cursor, global_status, version_info[1])
         
         logging.info("Server configuration analysis completed")
         
@@ -459,8 +486,377 @@ def get_security_analysis(cursor):
     
     return security_data
 
+def get_table_info(cursor, db_name, table_name):
+    """Structure of one table with per-table queries (OVERVIEW_SWEEP_MODE=per_table); None if DESCRIBE fails"""
+    current_table_info = new_table_info(table_name)
+
+    # Get table description (schema)
+    try:
+        cursor.execute(f"DESCRIBE `{db_name}`.`{table_name}`;")
+        schema_columns = [i[0] for i in cursor.description]
+        for col_info in cursor.fetchall():
+            col_dict = dict(zip(schema_columns, col_info))
+            current_table_info["schema"].append(col_dict)
+        logging.info(f"Schema fetched for {table_name} ({len(current_table_info['schema'])} columns)")
+    except mysql.connector.Error as err:
+        logging.error(f"Failed to fetch schema for {table_name}: {err}")
+        return None
+
+    # Get comprehensive table statistics with partitioning info
+    try:
+        # Enhanced table statistics including auto_increment and partitioning
+        cursor.execute(f"""
+            SELECT 
+                table_rows,
+                data_length,
+                index_length,
+                (data_length + index_length) as total_size,
+                avg_row_length,
+                create_time,
+                update_time,
+                table_collation,
+                engine,
+                auto_increment,
+                row_format,
+                table_comment
+            FROM information_schema.tables 
+            WHERE table_schema = '{db_name}' AND table_name = '{table_name}'
+        """)
+
+        stats = cursor.fetchone()
+        if stats:
+            current_table_info["statistics"] = {
+                "row_count": stats[0] or 0,
+                "data_size_bytes": stats[1] or 0,
+                "index_size_bytes": stats[2] or 0,
+                "total_size_bytes": stats[3] or 0,
+                "avg_row_length": stats[4] or 0,
+                "created": stats[5].isoformat() if stats[5] else None,
+                "updated": stats[6].isoformat() if stats[6] else None,
+                "collation": stats[7],
+                "engine": stats[8],
+                "auto_increment": stats[9],
+                "row_format": stats[10],
+                "table_comment": stats[11]
+            }
+
+        # Check for partitioning information
+        cursor.execute(f"""
+            SELECT 
+                partition_name,
+                partition_ordinal_position,
+                partition_method,
+                partition_expression,
+                partition_description,
+                table_rows,
+                avg_row_length,
+                data_length,
+                index_length
+            FROM information_schema.partitions 
+            WHERE table_schema = '{db_name}' AND table_name = '{table_name}' AND partition_name IS NOT NULL
+        """)
+
+        partitions = cursor.fetchall()
+        if partitions:
+            current_table_info["partitioning"] = {
+                "is_partitioned": True,
+                "partition_count": len(partitions),
+                "partitions": [
+                    {
+                        "name": row[0],
+                        "position": row[1],
+                        "method": row[2],
+                        "expression": row[3],
+                        "description": row[4],
+                        "rows": row[5],
+                        "avg_row_length": row[6],
+                        "data_size": row[7],
+                        "index_size": row[8]
+                    }
+                    for row in partitions
+                ]
+            }
+        else:
+            current_table_info["partitioning"] = {"is_partitioned": False}
+
+        logging.info(f"Enhanced statistics fetched for {table_name}: {current_table_info['statistics']['row_count']} rows")
+    except mysql.connector.Error as err:
+        logging.error(f"Failed to fetch statistics for {table_name}: {err}")
+
+    # Get indexes
+    try:
+        cursor.execute(f"SHOW INDEX FROM `{table_name}` FROM `{db_name}`;")
+        index_columns = [i[0] for i in cursor.description]
+        for index_info in cursor.fetchall():
+            index_dict = dict(zip(index_columns, index_info))
+            current_table_info["indexes"].append(index_dict)
+        logging.info(f"Indexes fetched for {table_name}: {len(current_table_info['indexes'])} indexes")
+    except mysql.connector.Error as err:
+        logging.error(f"Failed to fetch indexes for {table_name}: {err}")
+
+    # Get foreign key constraints
+    try:
+        cursor.execute(f"""
+            SELECT 
+                CONSTRAINT_NAME,
+                COLUMN_NAME,
+                REFERENCED_TABLE_NAME,
+                REFERENCED_COLUMN_NAME
+            FROM information_schema.KEY_COLUMN_USAGE
+            WHERE table_schema = '{db_name}' 
+            AND table_name = '{table_name}'
+            AND REFERENCED_TABLE_NAME IS NOT NULL
+        """)
+
+        constraint_columns = [i[0] for i in cursor.description]
+        for constraint_info in cursor.fetchall():
+            constraint_dict = dict(zip(constraint_columns, constraint_info))
+            current_table_info["constraints"].append(constraint_dict)
+        logging.info(f"Constraints fetched for {table_name}: {len(current_table_info['constraints'])} foreign keys")
+    except mysql.connector.Error as err:
+        logging.error(f"Failed to fetch constraints for {table_name}: {err}")
+
+    return current_table_info
+
+def add_sample_data(cursor, db_name, table_info):
+    """Fill sample_data with the column names and the first OVERVIEW_SAMPLE_ROWS rows"""
+    table_name = table_info["name"]
+    table_info["sample_data"]["columns"] = [column["Field"] for column in table_info["schema"]]
+    if OVERVIEW_SAMPLE_ROWS <= 0:
+        return
+    try:
+        cursor.execute(f"SELECT * FROM `{db_name}`.`{table_name}` LIMIT {OVERVIEW_SAMPLE_ROWS};")
+        sample_rows = cursor.fetchall()
+        if cursor.description:
+            table_info["sample_data"]["columns"] = [i[0] for i in cursor.description]
+            table_info["sample_data"]["rows"] = [list(row) for row in sample_rows]
+        logging.info(f"Sample data fetched for {table_name} ({len(sample_rows)} rows)")
+    except mysql.connector.Error as err:
+        logging.error(f"Failed to fetch sample data for {table_name}: {err}")
+
+def iter_database_tables(cursor, db_name, swept_tables=None):
+    """
+    Table entries of one database, one at a time, with their columns
+    profiled in MySQL (column_profiler.py). swept_tables is this database's
+    part of schema_sweep.sweep_schemas(); without it every table is
+    described with its own queries.
+    """
+    profiler = ColumnProfiler(cursor, db_name)
+    if swept_tables is None:
+        cursor.execute(f"SHOW TABLES FROM `{db_name}`;")
+        table_names = [table[0] for table in cursor.fetchall()]
+    else:
+        table_names = list(swept_tables)
+    logging.info(f"Found {len(table_names)} tables in {db_name}")
+
+    if not table_names:
+        logging.warning(f"No tables found in {db_name}")
+
+    for table_name in table_names:
+        logging.info(f"Processing table: {db_name}.{table_name}")
+        if swept_tables is None:
+            current_table_info = get_table_info(cursor, db_name, table_name)
+            if current_table_info is None:
+                continue
+        else:
+            current_table_info = swept_tables.pop(table_name)
+
+        add_sample_data(cursor, db_name, current_table_info)
+        try:
+            profiler.profile(current_table_info)
+            logging.info(f"Columns profiled for {table_name} from {current_table_info['profile']['source']} "
+                         f"in {current_table_info['profile']['duration_ms']} ms")
+        except mysql.connector.Error as err:
+            logging.error(f"Failed to profile columns of {table_name}: {err}")
+        yield current_table_info
+
+class _ConnectionPool:
+    """Small pool of overview connections; one per worker at most"""
+
+    def __init__(self):
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return connect_mysql(**db_config)
+
+    def release(self, conn):
+        with self._lock:
+            if not self._closed:
+                self._idle.put(conn)
+                return
+        conn.close()
+
+    def close_all(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+            except mysql.connector.Error:
+                pass
+
+def _run_section(pool, name, func, started, timed_out, lock):
+    conn = pool.acquire()
+    try:
+        with lock:
+            started[name] = (time.monotonic(), conn.connection_id)
+        cursor = conn.cursor()
+        try:
+            return func(cursor)
+        finally:
+            cursor.close()
+    finally:
+        # A timed-out section's connection was killed and is not reused
+        with lock:
+            killed = name in timed_out
+        if killed:
+            try:
+                conn.close()
+            except mysql.connector.Error:
+                pass
+        else:
+            pool.release(conn)
+
+def run_sections(sections, control_cursor):
+    """
+    Run {name: func(cursor)} at the same time on OVERVIEW_WORKERS pooled
+    connections. A section still running OVERVIEW_SECTION_TIMEOUT seconds
+    after it started has its connection killed from control_cursor.
+    Returns {name: result}, with the exception as result for sections that
+    failed or timed out.
+    """
+    pool = _ConnectionPool()
+    lock = threading.Lock()
+    started, timed_out, results = {}, set(), {}
+    executor = ThreadPoolExecutor(max_workers=OVERVIEW_WORKERS, thread_name_prefix="overview")
+    # Each section runs in a copy of this context so run_all_scripts.py can route its log records
+    futures = {executor.submit(contextvars.copy_context().run, _run_section, pool, name, func,
+                               started, timed_out, lock): name
+               for name, func in sections.items()}
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                    logging.info(f"Section {name} completed")
+                except Exception as e:
+                    logging.error(f"Section {name} failed: {e}")
+                    results[name] = e
+
+            now = time.monotonic()
+            for future in list(pending):
+                name = futures[future]
+                with lock:
+                    start = started.get(name)
+                    if start is None or now - start[0] < OVERVIEW_SECTION_TIMEOUT or future.done():
+                        continue
+                    timed_out.add(name)
+                pending.discard(future)
+                logging.error(f"Section {name} did not finish within {OVERVIEW_SECTION_TIMEOUT}s, killing its connection")
+                results[name] = TimeoutError(f"Timed out after {OVERVIEW_SECTION_TIMEOUT}s")
+                try:
+                    control_cursor.execute(f"KILL {int(start[1])};")
+                except mysql.connector.Error as err:
+                    logging.warning(f"Could not kill connection {start[1]} of section {name}: {err}")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        pool.close_all()
+    return results
+
+def section_result(results, name):
+    """Section result, or {"error": ...} like the sections report their own failures"""
+    result = results.get(name)
+    if isinstance(result, Exception):
+        return {"error": str(result)}
+    return result
+
+def get_database_overview(cursor, db_name, spool_dir):
+    """
+    Database entry, a TableSpool with its tables written to spool_dir as
+    they are read, and the structure of every table for the snapshot history
+    """
+    logging.info(f"Processing database: {db_name}")
+
+    # Get comprehensive database information
+    current_db_info = get_database_info(cursor, db_name)
+    current_db_info["processed_at"] = datetime.now().isoformat()
+
+    # Table structure in a handful of set-based queries
+    swept_tables = None
+    if OVERVIEW_SWEEP_MODE == 'bulk':
+        try:
+            swept_tables = sweep_schemas(cursor, [db_name])[db_name]
+        except mysql.connector.Error as err:
+            logging.warning(f"Bulk information_schema sweep of {db_name} failed, describing tables one by one: {err}")
+
+    spool = TableSpool(spool_dir, db_name, OVERVIEW_OUTPUT_FORMAT, default=json_serial)
+    table_states = {}
+    try:
+        for table_info in iter_database_tables(cursor, db_name, swept_tables):
+            table_states[f"{db_name}.{table_info['name']}"] = table_state(table_info)
+            spool.add(table_info)
+    except Exception:
+        spool.discard()
+        raise
+    spool.close()
+    logging.info(f"Completed processing database: {db_name} ({spool.count} tables)")
+    return current_db_info, spool, table_states
+
+def get_replication_status(cursor):
+    """Master / slave replication status"""
+    replication_info = {}
+    try:
+        # Check if this is a master server
+        cursor.execute("SHOW MASTER STATUS;")
+        master_status = cursor.fetchone()
+        if master_status:
+            replication_info["master_status"] = {
+                "file": master_status[0],
+                "position": master_status[1],
+                "binlog_do_db": master_status[2],
+                "binlog_ignore_db": master_status[3]
+            }
+
+        # Check if this is a slave server
+        cursor.execute("SHOW SLAVE STATUS;")
+        slave_status = cursor.fetchone()
+        if slave_status and len(slave_status) > 0:
+            replication_info["slave_status"] = {
+                "slave_io_running": slave_status[10] if len(slave_status) > 10 else None,
+                "slave_sql_running": slave_status[11] if len(slave_status) > 11 else None,
+                "master_host": slave_status[1] if len(slave_status) > 1 else None,
+                "master_port": slave_status[3] if len(slave_status) > 3 else None,
+                "seconds_behind_master": slave_status[32] if len(slave_status) > 32 else None
+            }
+
+        logging.info("Replication status checked")
+    except Exception as e:
+        logging.warning(f"Could not get replication status: {e}")
+        replication_info["error"] = str(e)
+
+    return replication_info
+
 def get_mysql_overview():
     """Generate comprehensive MySQL database overview"""
+    os.makedirs(mysql_overview_dir, exist_ok=True)
+    spool_dir = tempfile.mkdtemp(dir=mysql_overview_dir, prefix=".overview_")
+    try:
+        return write_mysql_overview(spool_dir)
+    finally:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+def write_mysql_overview(spool_dir):
+    """Introspect the server and write the overview; table sections are spooled in spool_dir"""
     all_db_data = []
     conn = None
     cursor = None
@@ -474,54 +870,10 @@ def get_mysql_overview():
             
         # Connect to MySQL
         logging.info("Connecting to MySQL database...")
-        conn = mysql.connector.connect(**db_config)
+        conn = connect_mysql(**db_config)
         cursor = conn.cursor()
         logging.info("Successfully connected to MySQL database")
         
-        # Get comprehensive server information
-        logging.info("Analyzing MySQL server configuration...")
-        server_info = get_mysql_server_info(cursor)
-        
-        # Get performance analysis
-        logging.info("Performing database performance analysis...")
-        performance_info = get_performance_analysis(cursor)
-        
-        # Get security analysis
-        logging.info("Analyzing database security configuration...")
-        security_info = get_security_analysis(cursor)
-        
-        # Get backup and replication status
-        logging.info("Checking backup and replication status...")
-        replication_info = {}
-        try:
-            # Check if this is a master server
-            cursor.execute("SHOW MASTER STATUS;")
-            master_status = cursor.fetchone()
-            if master_status:
-                replication_info["master_status"] = {
-                    "file": master_status[0],
-                    "position": master_status[1],
-                    "binlog_do_db": master_status[2],
-                    "binlog_ignore_db": master_status[3]
-                }
-            
-            # Check if this is a slave server
-            cursor.execute("SHOW SLAVE STATUS;")
-            slave_status = cursor.fetchone()
-            if slave_status and len(slave_status) > 0:
-                replication_info["slave_status"] = {
-                    "slave_io_running": slave_status[10] if len(slave_status) > 10 else None,
-                    "slave_sql_running": slave_status[11] if len(slave_status) > 11 else None,
-                    "master_host": slave_status[1] if len(slave_status) > 1 else None,
-                    "master_port": slave_status[3] if len(slave_status) > 3 else None,
-                    "seconds_behind_master": slave_status[32] if len(slave_status) > 32 else None
-                }
-            
-            logging.info("Replication status checked")
-        except Exception as e:
-            logging.warning(f"Could not get replication status: {e}")
-            replication_info["error"] = str(e)
-
         # Get all databases
         logging.info("Fetching database list...")
         cursor.execute("SHOW DATABASES;")
@@ -535,224 +887,40 @@ def get_mysql_overview():
         if target_missing:
             logging.warning(f"Target databases not found: {target_missing}")
         
-        logging.info(f"Processing {len(target_found)} target databases: {target_found}")
-
+        # Server, performance, security and replication analysis plus one
+        # section per target database, run in parallel
+        sections = {
+            "server_info": get_mysql_server_info,
+            "performance_analysis": get_performance_analysis,
+            "security_analysis": get_security_analysis,
+            "replication_status": get_replication_status,
+            "index_advisor": functools.partial(get_index_advice, schemas=target_found),
+            "statement_digests": functools.partial(
+                get_digest_report, schemas=target_found,
+                state_path=os.path.join(mysql_overview_dir, "snapshots", "statement_digests.json.gz"))
+        }
         for db_name in target_found:
-            logging.info(f"Processing database: {db_name}")
+            sections[f"database:{db_name}"] = functools.partial(get_database_overview, db_name=db_name,
+                                                                spool_dir=spool_dir)
 
-            # Get comprehensive database information
-            current_db_info = get_database_info(cursor, db_name)
-            current_db_info["tables"] = []
-            current_db_info["processed_at"] = datetime.now().isoformat()
+        logging.info(f"Processing {len(target_found)} target databases: {target_found} "
+                     f"({len(sections)} sections on up to {OVERVIEW_WORKERS} connections)")
+        results = run_sections(sections, cursor)
 
-            try:
-                cursor.execute(f"USE `{db_name}`;")
-                logging.info(f"Switched to database: {db_name}")
-
-                # Get all tables in the current database
-                cursor.execute("SHOW TABLES;")
-                tables = [table[0] for table in cursor.fetchall()]
-                logging.info(f"Found {len(tables)} tables in {db_name}")
-
-                if not tables:
-                    logging.warning(f"No tables found in {db_name}")
-                    all_db_data.append(current_db_info)
-                    continue
-
-                for table_name in tables:
-                    current_table_info = {
-                        "name": table_name,
-                        "schema": [],
-                        "sample_data": {
-                            "columns": [],
-                            "rows": []
-                        },
-                        "statistics": {},
-                        "indexes": [],
-                        "constraints": [],
-                        "data_analysis": {}
-                    }
-                    logging.info(f"Processing table: {db_name}.{table_name}")
+        server_info = section_result(results, "server_info")
+        performance_info = section_result(results, "performance_analysis")
+        security_info = section_result(results, "security_analysis")
+        replication_info = section_result(results, "replication_status")
+        index_advice = section_result(results, "index_advisor")
+        digest_report = section_result(results, "statement_digests")
 
-                    # Get table description (schema)
-                    try:
-                        cursor.execute(f"DESCRIBE `{table_name}`;")
-                        schema_columns = [i[0] for i in cursor.description]
-                        for col_info in cursor.fetchall():
-                            col_dict = dict(zip(schema_columns, col_info))
-                            current_table_info["schema"].append(col_dict)
-                        logging.info(f"Schema fetched for {table_name} ({len(current_table_info['schema'])} columns)")
-                    except mysql.connector.Error as err:
-                        logging.error(f"Failed to fetch schema for {table_name}: {err}")
-                        continue
-
-                    # Get comprehensive table statistics with partitioning info
-                    try:
-                        # Enhanced table statistics including auto_increment and partitioning
-                        cursor.execute(f"""
-                            SELECT 
-                                table_rows,
-                                data_length,
-                                index_length,
-                                (data_length + index_length) as total_size,
-                                avg_row_length,
-                                create_time,
-                                update_time,
-                                table_collation,
-                                engine,
-                                auto_increment,
-                                row_format,
-                                table_comment
-                            FROM information_schema.tables 
-                            WHERE table_schema = '{db_name}' AND table_name = '{table_name}'
-                        """)
-                        
-                        stats = cursor.fetchone()
-                        if stats:
-                            current_table_info["statistics"] = {
-                                "row_count": stats[0] or 0,
-                                "data_size_bytes": stats[1] or 0,
-                                "index_size_bytes": stats[2] or 0,
-                                "total_size_bytes": stats[3] or 0,
-                                "avg_row_length": stats[4] or 0,
-                                "created": stats[5].isoformat() if stats[5] else None,
-                                "updated": stats[6].isoformat() if stats[6] else None,
-                                "collation": stats[7],
-                                "engine": stats[8],
-                                "auto_increment": stats[9],
-                                "row_format": stats[10],
-                                "table_comment": stats[11]
-                            }
-                        
-                        # Check for partitioning information
-                        cursor.execute(f"""
-                            SELECT 
-                                partition_name,
-                                partition_ordinal_position,
-                                partition_method,
-                                partition_expression,
-                                partition_description,
-                                table_rows,
-                                avg_row_length,
-                                data_length,
-                                index_length
-                            FROM information_schema.partitions 
-                            WHERE table_schema = '{db_name}' AND table_name = '{table_name}' AND partition_name IS NOT NULL
-                        """)
-                        
-                        partitions = cursor.fetchall()
-                        if partitions:
-                            current_table_info["partitioning"] = {
-                                "is_partitioned": True,
-                                "partition_count": len(partitions),
-                                "partitions": [
-                                    {
-                                        "name": row[0],
-                                        "position": row[1],
-                                        "method": row[2],
-                                        "expression": row[3],
-                                        "description": row[4],
-                                        "rows": row[5],
-                                        "avg_row_length": row[6],
-                                        "data_size": row[7],
-                                        "index_size": row[8]
-                                    }
-                                    for row in partitions
-                                ]
-                            }
-                        else:
-                            current_table_info["partitioning"] = {"is_partitioned": False}
-                        
-                        logging.info(f"Enhanced statistics fetched for {table_name}: {current_table_info['statistics']['row_count']} rows")
-                    except mysql.connector.Error as err:
-                        logging.error(f"Failed to fetch statistics for {table_name}: {err}")
-
-                    # Get indexes
-                    try:
-                        cursor.execute(f"SHOW INDEX FROM `{table_name}`;")
-                        index_columns = [i[0] for i in cursor.description]
-                        for index_info in cursor.fetchall():
-                            index_dict = dict(zip(index_columns, index_info))
-                            current_table_info["indexes"].append(index_dict)
-                        logging.info(f"Indexes fetched for {table_name}: {len(current_table_info['indexes'])} indexes")
-                    except mysql.connector.Error as err:
-                        logging.error(f"Failed to fetch indexes for {table_name}: {err}")
-
-                    # Get foreign key constraints
-                    try:
-                        cursor.execute(f"""
-                            SELECT 
-                                CONSTRAINT_NAME,
-                                COLUMN_NAME,
-                                REFERENCED_TABLE_NAME,
-                                REFERENCED_COLUMN_NAME
-                            FROM information_schema.KEY_COLUMN_USAGE
-                            WHERE table_schema = '{db_name}' 
-                            AND table_name = '{table_name}'
-                            AND REFERENCED_TABLE_NAME IS NOT NULL
-                        """)
-                        
-                        constraint_columns = [i[0] for i in cursor.description]
-                        for constraint_info in cursor.fetchall():
-                            constraint_dict = dict(zip(constraint_columns, constraint_info))
-                            current_table_info["constraints"].append(constraint_dict)
-                        logging.info(f"Constraints fetched for {table_name}: {len(current_table_info['constraints'])} foreign keys")
-                    except mysql.connector.Error as err:
-                        logging.error(f"Failed to fetch constraints for {table_name}: {err}")
-
-                    # Enhanced sample data with data analysis
-                    try:
-                        # Get larger sample for better analysis
-                        cursor.execute(f"SELECT * FROM `{table_name}` LIMIT 50;")
-                        sample_rows = cursor.fetchall()
-
-                        if cursor.description:
-                            current_table_info["sample_data"]["columns"] = [i[0] for i in cursor.description]
-                            current_table_info["sample_data"]["rows"] = [list(row) for row in sample_rows[:10]]  # Keep first 10 for display
-                            
-                            # Data analysis on larger sample
-                            if sample_rows:
-                                columns = current_table_info["sample_data"]["columns"]
-                                for col_index, col_name in enumerate(columns):
-                                    values = [row[col_index] for row in sample_rows if row[col_index] is not None]
-                                    
-                                    analysis = {
-                                        "non_null_count": len(values),
-                                        "null_count": len(sample_rows) - len(values),
-                                        "unique_count": len(set(str(v) for v in values)) if values else 0,
-                                        "data_type": type(values[0]).__name__ if values else "unknown"
-                                    }
-                                    
-                                    # Additional analysis for numeric data
-                                    if values and isinstance(values[0], (int, float)):
-                                        try:
-                                            analysis.update({
-                                                "min_value": min(values),
-                                                "max_value": max(values),
-                                                "avg_value": sum(values) / len(values)
-                                            })
-                                        except:
-                                            pass
-                                    
-                                    # Sample unique values for categorical data
-                                    if analysis["unique_count"] <= 20:
-                                        analysis["sample_values"] = list(set(str(v) for v in values))[:10]
-                                    
-                                    current_table_info["data_analysis"][col_name] = analysis
-                        
-                        logging.info(f"Enhanced sample data fetched for {table_name} ({len(sample_rows)} rows analyzed)")
-
-                    except mysql.connector.Error as err:
-                        logging.error(f"Failed to fetch sample data for {table_name}: {err}")
-
-                    current_db_info["tables"].append(current_table_info)
-
-            except mysql.connector.Error as err:
-                logging.error(f"Error accessing database {db_name}: {err}")
+        # (database entry, table spool, table structures) per database
+        for db_name in target_found:
+            db_result = results.get(f"database:{db_name}")
+            if isinstance(db_result, Exception):
+                logging.error(f"Error accessing database {db_name}: {db_result}")
                 continue
-
-            all_db_data.append(current_db_info)
-            logging.info(f"Completed processing database: {db_name}")
+            all_db_data.append(db_result)
 
     except mysql.connector.Error as err:
         logging.error(f"MySQL operation failed: {err}")
@@ -776,7 +944,6 @@ def get_mysql_overview():
         # Check for old file and move it to new location
         old_file_path = r'C:\Users\laoan\Documents\mysql_database_overview.json'
         if os.path.exists(old_file_path):
-            import shutil
             # Create timestamped filename for the old file
             old_timestamp = datetime.fromtimestamp(os.path.getmtime(old_file_path)).strftime("%Y%m%d_%H%M%S")
             old_filename = f"mysql_database_overview_{old_timestamp}_migrated.json"
@@ -791,47 +958,68 @@ def get_mysql_overview():
         logging.error(f"Failed to create output directory or migrate old file: {e}")
         return False
 
-    # Write JSON overview file
-    try:
+    # Write the overview section by section; tables are copied from the spools
+    if OVERVIEW_FULL_SNAPSHOTS:
         current_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        json_filename = f"mysql_database_overview_{current_timestamp}.json"
-        json_filepath = os.path.join(mysql_overview_dir, json_filename)
-        
-        overview_data = {
-            "generated_at": datetime.now().isoformat(),
-            "server_info": server_info,
-            "performance_analysis": performance_info,
-            "security_analysis": security_info,
-            "replication_status": replication_info,
-            "summary": {
-                "total_databases": len(all_db_data),
-                "total_tables": sum(len(db["tables"]) for db in all_db_data),
-                "total_size_mb": sum(db.get("total_size_mb", 0) for db in all_db_data),
-                "largest_database": max(all_db_data, key=lambda x: x.get("total_size_mb", 0))["name"] if all_db_data else None,
-                "engine_distribution": {}
-            },
-            "databases": all_db_data
+        json_filename = f"mysql_database_overview_{current_timestamp}{file_extension(OVERVIEW_OUTPUT_FORMAT)}"
+    else:
+        json_filename = f"mysql_database_overview_latest{file_extension(OVERVIEW_OUTPUT_FORMAT)}"
+    json_filepath = os.path.join(mysql_overview_dir, json_filename)
+    latest_filepath = os.path.join(mysql_overview_dir, f"mysql_database_overview_latest{file_extension(OVERVIEW_OUTPUT_FORMAT)}")
+    writer = None
+    try:
+        generated_at = datetime.now().isoformat()
+        db_infos = [db_info for db_info, _, _ in all_db_data]
+        summary = {
+            "total_databases": len(all_db_data),
+            "total_tables": sum(spool.count for _, spool, _ in all_db_data),
+            "total_size_mb": sum(db.get("total_size_mb", 0) for db in db_infos),
+            "largest_database": max(db_infos, key=lambda x: x.get("total_size_mb", 0))["name"] if db_infos else None,
+            "engine_distribution": {}
         }
         
         # Calculate engine distribution across all databases
         engine_counts = {}
-        for db in all_db_data:
+        for db in db_infos:
             for engine_info in db.get("storage_engines", []):
                 engine = engine_info["engine"]
                 engine_counts[engine] = engine_counts.get(engine, 0) + engine_info["table_count"]
-        overview_data["summary"]["engine_distribution"] = engine_counts
-        
-        with open(json_filepath, 'w', encoding='utf-8') as f:
-            json.dump(overview_data, f, indent=4, default=json_serial, ensure_ascii=False)
+        summary["engine_distribution"] = engine_counts
         
-        logging.info(f"Successfully wrote database overview to: {json_filepath}")
+        # History is kept as a compressed base + structural diffs instead of full copies
+        changes = None
+        try:
+            state = {"generated_at": generated_at, "tables": {}}
+            for _, _, table_states in all_db_data:
+                state["tables"].update(table_states)
+            changes = save_snapshot(state, mysql_overview_dir)
+            if changes:
+                logging.info(f"Changes since {changes['previous_generated_at']}: "
+                             f"{len(changes['tables_added'])} tables added, {len(changes['tables_removed'])} removed, "
+                             f"{len(changes['columns_added'])} columns added, {len(changes['columns_removed'])} removed, "
+                             f"{len(changes['indexes_added'])} indexes added, {len(changes['indexes_removed'])} removed")
+            expire_full_snapshots(mysql_overview_dir)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not store overview snapshot: {e}")
         
-        # Also create a latest copy
-        latest_filepath = os.path.join(mysql_overview_dir, "mysql_database_overview_latest.json")
-        with open(latest_filepath, 'w', encoding='utf-8') as f:
-            json.dump(overview_data, f, indent=4, default=json_serial, ensure_ascii=False)
+        writer = OverviewWriter(json_filepath, OVERVIEW_OUTPUT_FORMAT, default=json_serial)
+        writer.write_section("generated_at", generated_at)
+        writer.write_section("server_info", server_info)
+        writer.write_section("performance_analysis", performance_info)
+        writer.write_section("security_analysis", security_info)
+        writer.write_section("replication_status", replication_info)
+        writer.write_section("index_advisor", index_advice)
+        writer.write_section("statement_digests", digest_report)
+        for db_info, spool, _ in all_db_data:
+            writer.write_database(db_info, spool)
+        writer.write_section("summary", summary)
+        writer.write_section("changes_since_last_run", changes)
+        writer.close(copies=[latest_filepath] if json_filepath != latest_filepath else [])
+        writer = None
         
-        logging.info(f"Also created latest copy at: {latest_filepath}")
+        logging.info(f"Successfully wrote database overview to: {json_filepath}")
+        if json_filepath != latest_filepath:
+            logging.info(f"Also created latest copy at: {latest_filepath}")
         return True
         
     except IOError as e:
@@ -840,6 +1028,9 @@ def get_mysql_overview():
     except Exception as e:
         logging.exception(f"Error occurred while writing JSON: {e}")
         return False
+    finally:
+        if writer:
+            writer.abort()
 
 def main():
     start = datetime.now()
@@ -1,5 +1,8 @@
 import os
 from dotenv import load_dotenv
+from shared_resources import connect_pymysql
+from bulk_loader import refresh_table
+from borsdata_client import BorsdataClient
 import requests
 import pymysql
 import logging
@@ -13,7 +16,7 @@ API_KEY = os.getenv('BORSDATA_API_KEY')
 if not API_KEY:
     raise ValueError("BORSDATA_API_KEY not set in environment")
 
-BASE_URL = "https://apiservice.borsdata.se/v1"
+borsdata = BorsdataClient(API_KEY)
 
 db_config = {
     'user': os.getenv('DB_USERNAME'),
@@ -22,9 +25,13 @@ db_config = {
     'port': int(os.getenv('DB_PORT', 3306)),
     'database': os.getenv('DB_MARKETDATA'),  # Using marketdata database for instruments
     'charset': 'utf8mb4',
-    'cursorclass': pymysql.cursors.DictCursor
+    'cursorclass': pymysql.cursors.DictCursor,
+    'local_infile': True  # allows LOAD DATA LOCAL INFILE in bulk_loader
 }
 
+# Column order of the rows handed to refresh_table (key column first)
+INSTRUMENT_COLUMNS = ('insId', 'name', 'ticker', 'isin', 'sectorId')
+
 # === Setup Logging ===
 log_dir = os.getenv('LOG_PATH', "../../storage/logs")
 os.makedirs(log_dir, exist_ok=True)
@@ -54,11 +61,10 @@ logger.addHandler(file_handler)
 logger.addHandler(console_handler)
 
 def fetch_instruments():
-    url = f"{BASE_URL}/instruments?authKey={API_KEY}"
     logging.info("Fetching Nordic instruments from Börsdata API...")
-    logging.info(f"API endpoint: {BASE_URL}/instruments")
+    logging.info(f"API endpoint: {borsdata.url('/v1/instruments')}")
     try:
-        response = requests.get(url)
+        response = borsdata.get('/v1/instruments')
         response.raise_for_status()
         data = response.json()
         
@@ -83,7 +89,7 @@ def save_to_db(instruments):
     errors = 0
     logging.info("Connecting to MySQL database...")
     try:
-        conn = pymysql.connect(**db_config)
+        conn = connect_pymysql(**db_config)
         logging.info(f"Connected to database: {db_config['database']}")
         
         with conn.cursor() as cursor:
@@ -99,9 +105,8 @@ def save_to_db(instruments):
 
             logging.info(f"About to process {len(instruments)} Nordic instruments")
             
-            # Process in batches for better performance
-            batch_size = 100
-            batch_data = []
+            # Collect validated rows; they are written in one bulk load below
+            rows = []
 
             for i, item in enumerate(instruments):
                 if i % 500 == 0:  # Log progress every 500 items
@@ -113,42 +118,22 @@ def save_to_db(instruments):
                     errors += 1
                     continue
 
-                # Prepare data for batch insert
+                # Prepare row for the bulk load
                 data_tuple = (item["insId"], item["name"], item["ticker"], item["isin"], item["sectorId"])
-                batch_data.append(data_tuple)
-                
-                # Process batch when it reaches batch_size or is the last item
-                if len(batch_data) >= batch_size or i == len(instruments) - 1:
-                    try:
-                        # Execute batch insert
-                        cursor.executemany("""
-                            INSERT INTO nordic_instruments (insId, name, ticker, isin, sectorId)
-                            VALUES (%s, %s, %s, %s, %s)
-                            ON DUPLICATE KEY UPDATE
-                                name=VALUES(name),
-                                ticker=VALUES(ticker),
-                                isin=VALUES(isin),
-                                sectorId=VALUES(sectorId)
-                        """, batch_data)
-                        
-                        inserted += len(batch_data)
-                        
-                        # Commit every 500 records for safety
-                        if inserted % 500 == 0 or i == len(instruments) - 1:
-                            conn.commit()
-                            logging.info(f"Committed {inserted} Nordic instruments to database")
-                        
-                        batch_data = []  # Clear batch for next set
-                        
-                    except Exception as e:
-                        logging.error(f"Failed to insert Nordic instrument batch at item {i}: {e}")
-                        errors += len(batch_data)
-                        batch_data = []  # Clear failed batch
+                rows.append(data_tuple)
             
-            # Final commit
-            conn.commit()
+            # Write only changed rows (or, with FULL_REFRESH_MODE=swap, shadow-load and swap)
+            try:
+                result = refresh_table(conn, 'nordic_instruments', INSTRUMENT_COLUMNS, rows,
+                                       update_columns=INSTRUMENT_COLUMNS[1:],
+                                       required_columns=('insId', 'name'))
+                inserted = result['written']
+                logging.info(f"Refresh summary for nordic_instruments: {result}")
+            except Exception as e:
+                logging.error(f"Failed to bulk load Nordic instruments: {e}")
+                errors += len(rows)
         conn.close()
-        logging.info(f"Inserted/updated {inserted} instruments into the database.")
+        logging.info(f"Wrote {inserted} changed instruments to the database.")
         if errors:
             logging.warning(f"{errors} instruments failed to insert.")
     except Exception as e:
@@ -4,6 +4,10 @@ import logging
 from datetime import datetime
 import os
 from dotenv import load_dotenv
+from shared_resources import connect_pymysql
+from bulk_loader import refresh_table
+from price_history import append_latest_prices
+from borsdata_client import BorsdataClient
 
 # Load environment variables from .env file located at project root
 load_dotenv(dotenv_path='../../.env')
@@ -13,7 +17,7 @@ API_KEY = os.getenv('BORSDATA_API_KEY')
 if not API_KEY:
     raise ValueError("BORSDATA_API_KEY not set in environment")
 
-BASE_URL = "https://apiservice.borsdata.se/v1"
+borsdata = BorsdataClient(API_KEY)
 
 db_config = {
     'user': os.getenv('DB_USERNAME'),
@@ -25,6 +29,9 @@ db_config = {
     'cursorclass': pymysql.cursors.DictCursor
 }
 
+# Column order of the rows handed to refresh_table (key column first)
+PRICE_COLUMNS = ('instrument_id', 'closing_price', 'price_date')
+
 # === Setup Logging ===
 log_dir = os.getenv('LOG_PATH', "../../storage/logs")
 os.makedirs(log_dir, exist_ok=True)
@@ -54,11 +61,10 @@ logger.addHandler(file_handler)
 logger.addHandler(console_handler)
 
 def fetch_nordic_latest_prices():
-    url = f"{BASE_URL}/instruments/stockprices/last?authKey={API_KEY}"
     logging.info("Fetching Nordic latest prices from Börsdata API...")
-    logging.info(f"API endpoint: {BASE_URL}/instruments/stockprices/last")
+    logging.info(f"API endpoint: {borsdata.url('/v1/instruments/stockprices/last')}")
     try:
-        response = requests.get(url)
+        response = borsdata.get('/v1/instruments/stockprices/last')
         response.raise_for_status()
         data = response.json()
         
@@ -89,14 +95,15 @@ def save_nordic_latest_prices(prices):
     errors = 0
     logging.info("Connecting to MySQL database...")
     try:
-        conn = pymysql.connect(
+        conn = connect_pymysql(
             user=db_config["user"],
             password=db_config["password"],
             host=db_config["host"],
             port=db_config["port"],
             database=db_config["database"],
             charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor
+            cursorclass=pymysql.cursors.DictCursor,
+            local_infile=True  # allows LOAD DATA LOCAL INFILE in bulk_loader
         )
         with conn.cursor() as cursor:
             cursor.execute("""
@@ -108,9 +115,8 @@ def save_nordic_latest_prices(prices):
             """)
             logging.info(f"About to process {len(prices)} Nordic price records")
             
-            # Process in batches for better performance
-            batch_size = 100
-            batch_data = []
+            # Collect validated rows; they are written in one bulk load below
+            rows = []
             
             for i, item in enumerate(prices):
                 if i % 500 == 0:  # Log progress every 500 items
@@ -121,40 +127,28 @@ def save_nordic_latest_prices(prices):
                     errors += 1
                     continue
                 
-                # Prepare data for batch insert
+                # Prepare row for the bulk load
                 data_tuple = (item['i'], item['c'], item['d'])
-                batch_data.append(data_tuple)
-                
-                # Process batch when it reaches batch_size or is the last item
-                if len(batch_data) >= batch_size or i == len(prices) - 1:
-                    try:
-                        # Execute batch insert
-                        cursor.executemany("""
-                            INSERT INTO nordic_latest_prices (instrument_id, closing_price, price_date)
-                            VALUES (%s, %s, %s)
-                            ON DUPLICATE KEY UPDATE
-                                closing_price=VALUES(closing_price),
-                                price_date=VALUES(price_date)
-                        """, batch_data)
-                        
-                        inserted += len(batch_data)
-                        
-                        # Commit every 500 records for safety
-                        if inserted % 500 == 0 or i == len(prices) - 1:
-                            conn.commit()
-                            logging.info(f"Committed {inserted} Nordic price records to database")
-                        
-                        batch_data = []  # Clear batch for next set
-                        
-                    except Exception as e:
-                        logging.error(f"Failed to insert Nordic price batch at item {i}: {e}")
-                        errors += len(batch_data)
-                        batch_data = []  # Clear failed batch
+                rows.append(data_tuple)
             
-            # Final commit
-            conn.commit()
+            # Write only changed rows (or, with FULL_REFRESH_MODE=swap, shadow-load and swap)
+            try:
+                result = refresh_table(conn, 'nordic_latest_prices', PRICE_COLUMNS, rows,
+                                       update_columns=PRICE_COLUMNS[1:],
+                                       required_columns=PRICE_COLUMNS)
+                inserted = result['written']
+                logging.info(f"Refresh summary for nordic_latest_prices: {result}")
+            except Exception as e:
+                logging.error(f"Failed to bulk load Nordic price records: {e}")
+                errors += len(rows)
+
+            # Keep every run's closes in price_history as well
+            try:
+                append_latest_prices(conn, 'nordic', 'nordic_latest_prices')
+            except Exception as e:
+                logging.error(f"Failed to append closes to price_history: {e}")
         conn.close()
-        logging.info(f"Inserted/updated {inserted} records into the database.")
+        logging.info(f"Wrote {inserted} changed records to the database.")
         if errors:
             logging.warning(f"{errors} records failed to insert.")
     except Exception as e:
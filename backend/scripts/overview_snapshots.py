@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Incremental snapshots of the database overview structure
+
+mysql_db_overview.py used to keep every run as a full indented JSON file.
+Instead, the structure of each run (tables, columns, indexes, foreign keys,
+table options and size statistics) is stored by save_snapshot() as a
+gzip-compressed base file followed by one small diff per run:
+
+    MySQL_overview/snapshots/
+        index.json                  chain of base / diff files, oldest first
+        current.json.gz             structure of the latest run
+        base_<timestamp>.json.gz    full structure, every OVERVIEW_SNAPSHOT_REBASE runs
+        diff_<timestamp>.json.gz    changes against the previous run
+
+Each run reads current.json.gz, writes one diff and replaces current.json.gz,
+so write time does not depend on the length of the history. Chains that
+ended before OVERVIEW_SNAPSHOT_RETENTION_DAYS are deleted. The structure at
+any retained point in time is the base before it with the following diffs
+applied (load_state()).
+
+changes_report() turns a diff into the "what changed since the last run"
+report; run this file to print it, or the changes since a date:
+
+    python overview_snapshots.py
+    python overview_snapshots.py --since 2025-07-01
+
+Environment Variables (optional):
+- OVERVIEW_SNAPSHOT_REBASE: runs per base file (default: 30)
+- OVERVIEW_SNAPSHOT_RETENTION_DAYS: days of history to keep (default: 90)
+"""
+
+import os
+import sys
+import gzip
+import json
+import copy
+import argparse
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+SECTIONS = ('columns', 'indexes', 'foreign_keys', 'options', 'stats')
+
+
+def _plain(value):
+    """JSON-safe scalar (defaults can be bytes, dates or Decimals)"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', errors='replace')
+    return str(value)
+
+
+def table_state(table_info: dict) -> dict:
+    """Structure of one overview table entry"""
+    indexes: Dict[str, dict] = {}
+    for index in table_info.get("indexes", []):
+        entry = indexes.setdefault(index.get("Key_name"), {
+            "columns": [],
+            "unique": not index.get("Non_unique"),
+            "type": index.get("Index_type")
+        })
+        entry["columns"].append(index.get("Column_name") or _plain(index.get("Expression")))
+
+    foreign_keys: Dict[str, dict] = {}
+    for constraint in table_info.get("constraints", []):
+        entry = foreign_keys.setdefault(constraint.get("CONSTRAINT_NAME"), {
+            "columns": [],
+            "referenced_table": constraint.get("REFERENCED_TABLE_NAME"),
+            "referenced_columns": []
+        })
+        entry["columns"].append(constraint.get("COLUMN_NAME"))
+        entry["referenced_columns"].append(constraint.get("REFERENCED_COLUMN_NAME"))
+
+    statistics = table_info.get("statistics", {})
+    return {
+        "columns": {
+            column.get("Field"): {key: _plain(column.get(key)) for key in ("Type", "Null", "Key", "Default", "Extra")}
+            for column in table_info.get("schema", [])
+        },
+        "indexes": indexes,
+        "foreign_keys": foreign_keys,
+        "options": {
+            "engine": statistics.get("engine"),
+            "collation": statistics.get("collation"),
+            "row_format": statistics.get("row_format"),
+            "partitions": table_info.get("partitioning", {}).get("partition_count", 0)
+        },
+        "stats": {
+            "rows": statistics.get("row_count", 0),
+            "data_bytes": statistics.get("data_size_bytes", 0),
+            "index_bytes": statistics.get("index_size_bytes", 0)
+        }
+    }
+
+
+def overview_state(overview_data: dict) -> dict:
+    """Structure of a whole overview: {"generated_at", "tables": {"db.table": table_state}}"""
+    return {
+        "generated_at": overview_data.get("generated_at"),
+        "tables": {
+            f"{db['name']}.{table['name']}": table_state(table)
+            for db in overview_data.get("databases", [])
+            for table in db.get("tables", [])
+        }
+    }
+
+
+def _diff_section(old: dict, new: dict) -> Optional[dict]:
+    added = {key: new[key] for key in new if key not in old}
+    removed = [key for key in old if key not in new]
+    changed = {key: {"from": old[key], "to": new[key]}
+               for key in new if key in old and old[key] != new[key]}
+    if not (added or removed or changed):
+        return None
+    return {"added": added, "removed": removed, "changed": changed}
+
+
+def diff_states(old: dict, new: dict) -> dict:
+    """Changes that turn state old into state new"""
+    old_tables, new_tables = old.get("tables", {}), new.get("tables", {})
+    changed = {}
+    for key, table in new_tables.items():
+        if key not in old_tables:
+            continue
+        sections = {}
+        for section in SECTIONS:
+            section_diff = _diff_section(old_tables[key].get(section, {}), table.get(section, {}))
+            if section_diff:
+                sections[section] = section_diff
+        if sections:
+            changed[key] = sections
+    return {
+        "generated_at": new.get("generated_at"),
+        "previous_generated_at": old.get("generated_at"),
+        "added": {key: table for key, table in new_tables.items() if key not in old_tables},
+        # Stats of removed tables are kept for the size totals of the report
+        "removed": {key: table.get("stats", {}) for key, table in old_tables.items() if key not in new_tables},
+        "changed": changed
+    }
+
+
+def apply_diff(state: dict, diff: dict) -> dict:
+    """State after diff (state is modified in place and returned)"""
+    tables = state.setdefault("tables", {})
+    for key in diff.get("removed", {}):
+        tables.pop(key, None)
+    tables.update(copy.deepcopy(diff.get("added", {})))
+    for key, sections in diff.get("changed", {}).items():
+        table = tables.setdefault(key, {section: {} for section in SECTIONS})
+        for section, section_diff in sections.items():
+            values = table.setdefault(section, {})
+            for name in section_diff.get("removed", []):
+                values.pop(name, None)
+            values.update(copy.deepcopy(section_diff.get("added", {})))
+            values.update({name: change["to"] for name, change in section_diff.get("changed", {}).items()})
+    state["generated_at"] = diff.get("generated_at")
+    return state
+
+
+def changes_report(diff: dict) -> dict:
+    """Readable "what changed" report of a diff"""
+    report = {
+        "generated_at": diff.get("generated_at"),
+        "previous_generated_at": diff.get("previous_generated_at"),
+        "tables_added": sorted(diff.get("added", {})),
+        "tables_removed": sorted(diff.get("removed", {})),
+        "columns_added": [], "columns_removed": [], "columns_changed": [],
+        "indexes_added": [], "indexes_removed": [], "indexes_changed": [],
+        "foreign_keys_added": [], "foreign_keys_removed": [], "foreign_keys_changed": [],
+        "options_changed": [],
+        "size_changes": [],
+        "total_rows_delta": 0,
+        "total_size_bytes_delta": 0
+    }
+    for key, sections in sorted(diff.get("changed", {}).items()):
+        for section in ('columns', 'indexes', 'foreign_keys'):
+            section_diff = sections.get(section)
+            if not section_diff:
+                continue
+            report[f"{section}_added"] += [f"{key}.{name}" for name in section_diff["added"]]
+            report[f"{section}_removed"] += [f"{key}.{name}" for name in section_diff["removed"]]
+            report[f"{section}_changed"] += [{"name": f"{key}.{name}", **change}
+                                             for name, change in section_diff["changed"].items()]
+        if "options" in sections:
+            report["options_changed"] += [{"name": f"{key}.{name}", **change}
+                                          for name, change in sections["options"]["changed"].items()]
+        if "stats" in sections:
+            delta = {name: change["to"] - change["from"]
+                     for name, change in sections["stats"]["changed"].items()
+                     if isinstance(change["to"], int) and isinstance(change["from"], int)}
+            if delta:
+                report["size_changes"].append({"table": key, **delta})
+                report["total_rows_delta"] += delta.get("rows", 0)
+                report["total_size_bytes_delta"] += delta.get("data_bytes", 0) + delta.get("index_bytes", 0)
+
+    for key, table in diff.get("added", {}).items():
+        report["total_rows_delta"] += table["stats"].get("rows") or 0
+        report["total_size_bytes_delta"] += (table["stats"].get("data_bytes") or 0) + (table["stats"].get("index_bytes") or 0)
+    for stats in diff.get("removed", {}).values():
+        report["total_rows_delta"] -= stats.get("rows") or 0
+        report["total_size_bytes_delta"] -= (stats.get("data_bytes") or 0) + (stats.get("index_bytes") or 0)
+    report["size_changes"].sort(key=lambda c: -abs(c.get("data_bytes", 0) + c.get("index_bytes", 0)))
+    return report
+
+
+def _read_json_gz(path: str):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_json(path: str, data, compress: bool = True):
+    """Write via a temporary file and rename, so readers never see half a file"""
+    tmp_path = f"{path}.tmp"
+    opener = gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) if compress \
+        else open(tmp_path, 'w', encoding='utf-8')
+    with opener as f:
+        json.dump(data, f, separators=(',', ':'), ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class SnapshotStore:
+    """Base + diff snapshot chain in one directory"""
+
+    def __init__(self, directory: str, rebase_every: Optional[int] = None,
+                 retention_days: Optional[int] = None):
+        self.directory = directory
+        self.rebase_every = max(1, rebase_every or int(os.getenv('OVERVIEW_SNAPSHOT_REBASE', 30)))
+        self.retention_days = retention_days or int(os.getenv('OVERVIEW_SNAPSHOT_RETENTION_DAYS', 90))
+        self.index_path = os.path.join(directory, "index.json")
+        self.current_path = os.path.join(directory, "current.json.gz")
+
+    def load_index(self) -> List[dict]:
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def current_state(self) -> Optional[dict]:
+        return _read_json_gz(self.current_path) if os.path.exists(self.current_path) else None
+
+    def save(self, state: dict) -> Optional[dict]:
+        """Store state; returns the diff against the previous run (None for the first run)"""
+        os.makedirs(self.directory, exist_ok=True)
+        index = self.load_index()
+        previous = self.current_state() if index else None
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+
+        diffs_since_base = 0
+        for entry in reversed(index):
+            if entry["kind"] == "base":
+                break
+            diffs_since_base += 1
+
+        diff = diff_states(previous, state) if previous else None
+        if diff is None or diffs_since_base + 1 >= self.rebase_every:
+            filename, kind, content = f"base_{stamp}.json.gz", "base", state
+        else:
+            filename, kind, content = f"diff_{stamp}.json.gz", "diff", diff
+
+        _write_json(os.path.join(self.directory, filename), content)
+        _write_json(self.current_path, state)
+        index.append({"file": filename, "kind": kind, "generated_at": state.get("generated_at")})
+        index = self.apply_retention(index)
+        _write_json(self.index_path, index, compress=False)
+        logger.info(f"Stored overview snapshot {filename} ({len(index)} files in chain)")
+        return diff
+
+    def apply_retention(self, index: List[dict]) -> List[dict]:
+        """Drop base + diff chains whose successor base is older than the retention window"""
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).isoformat()
+        bases = [i for i, entry in enumerate(index) if entry["kind"] == "base"]
+        # Everything before the last base that is itself older than the cutoff can go
+        expired_bases = [i for i in bases if (index[i]["generated_at"] or "") < cutoff]
+        first_kept = expired_bases[-1] if expired_bases else (bases[0] if bases else 0)
+        for entry in index[:first_kept]:
+            try:
+                os.remove(os.path.join(self.directory, entry["file"]))
+            except FileNotFoundError:
+                pass
+        if first_kept:
+            logger.info(f"Removed {first_kept} overview snapshots older than {self.retention_days} days")
+        return index[first_kept:]
+
+    def load_state(self, at: Optional[str] = None) -> Optional[dict]:
+        """Structure as of ISO timestamp at (latest when None), or None if not retained"""
+        index = self.load_index()
+        if at is not None:
+            index = [entry for entry in index if (entry["generated_at"] or "") <= at]
+        elif os.path.exists(self.current_path):
+            return self.current_state()
+        base_positions = [i for i, entry in enumerate(index) if entry["kind"] == "base"]
+        if not base_positions:
+            return None
+        state = _read_json_gz(os.path.join(self.directory, index[base_positions[-1]]["file"]))
+        for entry in index[base_positions[-1] + 1:]:
+            apply_diff(state, _read_json_gz(os.path.join(self.directory, entry["file"])))
+        return state
+
+    def last_changes(self) -> Optional[dict]:
+        """Diff of the latest run, without replaying the chain"""
+        index = self.load_index()
+        if len(index) < 2:
+            return None
+        if index[-1]["kind"] == "diff":
+            return _read_json_gz(os.path.join(self.directory, index[-1]["file"]))
+        # The latest run started a new base: compare it with the run before
+        return diff_states(self.load_state(at=index[-2]["generated_at"]) or {},
+                           _read_json_gz(os.path.join(self.directory, index[-1]["file"])))
+
+
+def expire_full_snapshots(directory: str, retention_days: Optional[int] = None) -> int:
+    """Delete timestamped full overview files older than the retention window"""
+    retention_days = retention_days or int(os.getenv('OVERVIEW_SNAPSHOT_RETENTION_DAYS', 90))
+    cutoff = (datetime.now() - timedelta(days=retention_days)).timestamp()
+    removed = 0
+    for filename in os.listdir(directory):
+        if not filename.startswith("mysql_database_overview_2") or not filename.endswith(".json"):
+            continue
+        path = os.path.join(directory, filename)
+        if os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            removed += 1
+    if removed:
+        logger.info(f"Removed {removed} full overview files older than {retention_days} days")
+    return removed
+
+
+def save_snapshot(state: dict, overview_dir: str) -> Optional[dict]:
+    """
+    Store an overview structure (see overview_state() / table_state());
+    returns the changes report, None for the first run
+    """
+    diff = SnapshotStore(os.path.join(overview_dir, "snapshots")).save(state)
+    return changes_report(diff) if diff else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show what changed in the database structure")
+    parser.add_argument('--since', help="ISO date or timestamp to compare with (default: the previous run)")
+    args = parser.parse_args(argv)
+
+    load_dotenv(dotenv_path='../../.env')
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    overview_dir = os.path.join(os.getenv('DOCUMENTATION_PATH', "../../documentation"), "MySQL_overview")
+    store = SnapshotStore(os.path.join(overview_dir, "snapshots"))
+
+    if args.since:
+        since = store.load_state(at=args.since)
+        if since is None:
+            logger.error(f"No snapshot retained from {args.since} or earlier")
+            return 1
+        diff = diff_states(since, store.load_state())
+    else:
+        diff = store.last_changes()
+        if diff is None:
+            logger.error("Fewer than two overview snapshots stored")
+            return 1
+
+    print(json.dumps(changes_report(diff), indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Streaming JSON writer for mysql_db_overview.py
+
+The overview used to be one dict holding the sample rows and column
+analyses of every table, serialised twice with json.dump(indent=4). Here
+each database section spools its tables to a temporary file as soon as
+they are introspected (TableSpool), and OverviewWriter assembles the final
+file from the top-level sections and the spools without holding more than
+one table in memory. The file is written under a temporary name and renamed
+into place, so readers never see a partial overview.
+
+Formats (OVERVIEW_OUTPUT_FORMAT):
+- pretty: indented like the previous json.dump(indent=4) output (default)
+- compact: the same document without whitespace
+- ndjson: one JSON record per line:
+    {"section": "server_info", "data": {...}}
+    {"section": "database", "data": {database entry without tables}}
+    {"section": "table", "database": "psw_marketdata", "data": {...}}
+    {"section": "summary", "data": {...}}
+"""
+
+import os
+import json
+import shutil
+import tempfile
+from typing import Callable, Optional
+
+FORMATS = ('pretty', 'compact', 'ndjson')
+
+
+def file_extension(fmt: str) -> str:
+    return '.ndjson' if fmt == 'ndjson' else '.json'
+
+
+class _Format:
+    def __init__(self, fmt: str, default: Optional[Callable]):
+        if fmt not in FORMATS:
+            raise ValueError(f"Invalid overview format '{fmt}', expected one of {', '.join(FORMATS)}")
+        self.fmt = fmt
+        self.default = default
+        self.pretty = fmt == 'pretty'
+
+    def dumps(self, value, level: int = 0) -> str:
+        """value serialised for nesting depth level"""
+        if not self.pretty:
+            return json.dumps(value, separators=(',', ':'), default=self.default, ensure_ascii=False)
+        text = json.dumps(value, indent=4, default=self.default, ensure_ascii=False)
+        return text.replace('\n', '\n' + '    ' * level)
+
+    def newline(self, level: int) -> str:
+        return '\n' + '    ' * level if self.pretty else ''
+
+    def key(self, name: str) -> str:
+        return json.dumps(name) + (': ' if self.pretty else ':')
+
+
+class TableSpool(_Format):
+    """Serialised tables of one database in a temporary file"""
+
+    # Depth of a table object in the document: root, databases, database, tables
+    LEVEL = 4
+
+    def __init__(self, directory: str, db_name: str, fmt: str, default: Optional[Callable] = None):
+        super().__init__(fmt, default)
+        self.db_name = db_name
+        self.count = 0
+        handle, self.path = tempfile.mkstemp(dir=directory, prefix='.tables_', suffix='.tmp')
+        self._file = os.fdopen(handle, 'w', encoding='utf-8')
+
+    def add(self, table_info: dict):
+        if self.fmt == 'ndjson':
+            self._file.write(self.dumps({"section": "table", "database": self.db_name, "data": table_info}) + '\n')
+        else:
+            separator = ',' if self.count else ''
+            self._file.write(separator + self.newline(self.LEVEL) + self.dumps(table_info, self.LEVEL))
+        self.count += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def discard(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class OverviewWriter(_Format):
+    """Writes the overview document section by section to path"""
+
+    def __init__(self, path: str, fmt: str = 'pretty', default: Optional[Callable] = None):
+        super().__init__(fmt, default)
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self._file = open(self.tmp_path, 'w', encoding='utf-8')
+        self._keys = 0
+        self._databases = None  # number of databases written, None until the array is open
+        if self.fmt != 'ndjson':
+            self._file.write('{')
+
+    def _begin_key(self, name: str):
+        self._file.write((',' if self._keys else '') + self.newline(1) + self.key(name))
+        self._keys += 1
+
+    def _end_databases(self):
+        if self._databases is not None and self.fmt != 'ndjson':
+            self._file.write((self.newline(1) if self._databases else '') + ']')
+        self._databases = None
+
+    def write_section(self, name: str, value):
+        """Top-level key; sections written after databases close the databases list"""
+        if self.fmt == 'ndjson':
+            self._file.write(self.dumps({"section": name, "data": value}) + '\n')
+            return
+        self._end_databases()
+        self._begin_key(name)
+        self._file.write(self.dumps(value, 1))
+
+    def write_database(self, db_info: dict, spool: TableSpool):
+        """Database entry with its spooled tables as "tables"; removes the spool"""
+        spool.close()
+        if self.fmt == 'ndjson':
+            self._file.write(self.dumps({"section": "database", "data": db_info}) + '\n')
+        else:
+            if self._databases is None:
+                self._begin_key("databases")
+                self._file.write('[')
+                self._databases = 0
+            text = self.dumps(db_info, 2)
+            # Reopen the database object to append "tables"
+            text = text[:text.rstrip().rfind('}')].rstrip()
+            self._file.write((',' if self._databases else '') + self.newline(2) + text)
+            self._file.write((',' if db_info else '') + self.newline(3) + self.key("tables") + '[')
+        with open(spool.path, encoding='utf-8') as f:
+            shutil.copyfileobj(f, self._file)
+        if self.fmt != 'ndjson':
+            self._file.write((self.newline(3) if spool.count else '') + ']' + self.newline(2) + '}')
+            self._databases += 1
+        spool.discard()
+
+    def close(self, copies=()):
+        """Finish the document, rename it into place and link / copy it to each path in copies"""
+        self._end_databases()
+        if self.fmt != 'ndjson':
+            self._file.write(self.newline(0) + '}')
+        self._file.close()
+        os.replace(self.tmp_path, self.path)
+        for copy_path in copies:
+            tmp_copy = f"{copy_path}.tmp"
+            if os.path.exists(tmp_copy):
+                os.remove(tmp_copy)
+            try:
+                os.link(self.path, tmp_copy)
+            except OSError:
+                shutil.copyfile(self.path, tmp_copy)
+            os.replace(tmp_copy, copy_path)
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Daily price history for PSW 4.0
+
+price_history keeps one row per (instrument_id, price_date), partitioned by
+month (see database/migrations/create_price_history_table.sql).
+
+- nordic_latest_prices.py and global_latest_prices.py call
+  append_latest_prices() after each load, copying the freshly loaded closes
+  into price_history. Re-running a job on the same day overwrites the same
+  rows, so appends are idempotent.
+- Run this file to backfill past prices (open/high/low/close/volume) from
+  Börsdata's historical stock price endpoint:
+
+      python price_history.py --market nordic --from 2015-01-01
+      python price_history.py --market global --from 2020-01-01 --instruments 1234,5678
+
+  Instruments are requested in batches of 50 (the API maximum) and every
+  batch is bulk-loaded and committed on its own, so an interrupted backfill
+  can simply be started again.
+
+Before writing, ensure_partitions() splits the pmax partition so that every
+month up to the following month has its own partition.
+
+Environment Variables Required (backfill):
+- BORSDATA_API_KEY: Börsdata API key (Pro+ for global instruments)
+- Database connection variables (DB_HOST, DB_USERNAME, DB_PASSWORD, DB_MARKETDATA, ...)
+"""
+
+import argparse
+import logging
+import os
+import sys
+from datetime import date, datetime, timedelta
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import pymysql
+from dotenv import load_dotenv
+
+from borsdata_client import BorsdataClient
+from bulk_loader import bulk_upsert
+from shared_resources import connect_pymysql
+
+MARKETS = ('nordic', 'global')
+INSTRUMENT_TABLES = {'nordic': 'nordic_instruments', 'global': 'global_instruments'}
+
+HISTORY_COLUMNS = ('instrument_id', 'price_date', 'market', 'open_price', 'high_price',
+                   'low_price', 'close_price', 'volume')
+
+# Börsdata accepts at most 50 instruments per historical stock price call
+BACKFILL_BATCH_SIZE = 50
+DEFAULT_BACKFILL_YEARS = 10
+
+# Named lock serialising partition changes; the Nordic and global price jobs
+# append at the same time and would otherwise split pmax for the same month
+PARTITION_LOCK = 'price_history_partitions'
+PARTITION_LOCK_TIMEOUT = 60
+
+# Days of the latest-price table copied into price_history on each run.
+# Latest prices are at most a few days old; older rows are already there.
+APPEND_WINDOW_DAYS = 7
+
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def ensure_partitions(cursor, through: date) -> int:
+    """
+    Make sure every month up to the one after `through` has its own partition.
+
+    Splits pmax with REORGANIZE PARTITION; pmax is empty as long as this
+    runs before each write, so the split does not move data. The check and
+    the split run under the PARTITION_LOCK named lock, so concurrent jobs
+    never add the same month twice. Returns the number of partitions added.
+    """
+    cursor.execute("SELECT GET_LOCK(%s, %s) AS acquired", (PARTITION_LOCK, PARTITION_LOCK_TIMEOUT))
+    row = cursor.fetchone()
+    if (row['acquired'] if isinstance(row, dict) else row[0]) != 1:
+        raise RuntimeError(f"Timed out after {PARTITION_LOCK_TIMEOUT}s waiting for the {PARTITION_LOCK} lock")
+    try:
+        return _split_pmax(cursor, through)
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (PARTITION_LOCK,))
+        cursor.fetchall()
+
+
+def _split_pmax(cursor, through: date) -> int:
+    cursor.execute("""
+        SELECT PARTITION_NAME AS name, PARTITION_DESCRIPTION AS boundary
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'price_history'
+          AND PARTITION_NAME IS NOT NULL AND PARTITION_NAME <> 'pmax'
+    """)
+    boundaries = []
+    for row in cursor.fetchall():
+        boundary = row['boundary'] if isinstance(row, dict) else row[1]
+        boundaries.append(datetime.strptime(boundary.strip("'"), '%Y-%m-%d').date())
+    if not boundaries:
+        raise RuntimeError("price_history is missing or not partitioned; "
+                           "run database/migrations/create_price_history_table.sql")
+
+    month = max(boundaries)
+    target = _next_month(_next_month(through))
+    partitions = []
+    while month < target:
+        upper = _next_month(month)
+        partitions.append(f"PARTITION p{month:%Y%m} VALUES LESS THAN ('{upper.isoformat()}')")
+        month = upper
+    if not partitions:
+        return 0
+
+    cursor.execute(f"""
+        ALTER TABLE price_history REORGANIZE PARTITION pmax INTO (
+            {', '.join(partitions)},
+            PARTITION pmax VALUES LESS THAN (MAXVALUE)
+        )
+    """)
+    logging.info(f"Added {len(partitions)} monthly partitions to price_history")
+    return len(partitions)
+
+
+def append_latest_prices(conn, market: str, source_table: str) -> int:
+    """
+    Copy recent closes from a latest-price table into price_history.
+
+    Runs one INSERT ... SELECT limited to the last APPEND_WINDOW_DAYS, so
+    only the newest partitions are touched; rows that already hold the same
+    close are left unchanged. Commits and returns the affected row count.
+    """
+    if market not in MARKETS:
+        raise ValueError(f"Invalid market '{market}', expected one of {', '.join(MARKETS)}")
+    with conn.cursor() as cursor:
+        ensure_partitions(cursor, date.today())
+        cursor.execute(f"""
+            INSERT INTO price_history (instrument_id, price_date, market, close_price)
+            SELECT instrument_id, price_date, %s, closing_price
+            FROM `{source_table}`
+            WHERE price_date >= CURDATE() - INTERVAL %s DAY
+              AND closing_price IS NOT NULL
+            ON DUPLICATE KEY UPDATE close_price = VALUES(close_price)
+        """, (market, APPEND_WINDOW_DAYS))
+        affected = cursor.rowcount
+    conn.commit()
+    logging.info(f"Appended {source_table} closes to price_history ({affected} rows affected)")
+    return affected
+
+
+def _history_rows(client, market: str, instrument_ids: Sequence[int],
+                  date_from: date, date_to: date, stats: dict) -> Iterator[Tuple]:
+    """Stream one batch of historical prices as price_history row tuples"""
+    params = {
+        'instList': ','.join(str(i) for i in instrument_ids),
+        'from': date_from.isoformat(),
+        'to': date_to.isoformat(),
+    }
+    for entry in client.iter_json('/v1/instruments/stockprices', keys=('stockPricesArrayList',), params=params):
+        instrument_id = entry.get('instrument')
+        if entry.get('error'):
+            logging.warning(f"No price history for instrument {instrument_id}: {entry['error']}")
+            stats['errors'] += 1
+            continue
+        for price in entry.get('stockPricesList') or []:
+            if price.get('d') is None or price.get('c') is None:
+                stats['skipped'] += 1
+                continue
+            stats['rows'] += 1
+            yield (instrument_id, price['d'][:10], market, price.get('o'), price.get('h'),
+                   price.get('l'), price['c'], price.get('v'))
+
+
+def backfill(conn, client, market: str, date_from: date, date_to: date,
+             instrument_ids: Optional[List[int]] = None) -> dict:
+    """Load historical prices for every instrument of a market (or the given ones)"""
+    if instrument_ids is None:
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT insId FROM `{INSTRUMENT_TABLES[market]}` ORDER BY insId")
+            instrument_ids = [row['insId'] if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
+
+    with conn.cursor() as cursor:
+        ensure_partitions(cursor, date_to)
+
+    stats = {'batches': 0, 'rows': 0, 'skipped': 0, 'errors': 0}
+    total_batches = (len(instrument_ids) + BACKFILL_BATCH_SIZE - 1) // BACKFILL_BATCH_SIZE
+    logging.info(f"Backfilling {market} price history {date_from} - {date_to} for "
+                 f"{len(instrument_ids)} instruments in {total_batches} batches")
+
+    for start in range(0, len(instrument_ids), BACKFILL_BATCH_SIZE):
+        batch = instrument_ids[start:start + BACKFILL_BATCH_SIZE]
+        stats['batches'] += 1
+        try:
+            loaded = bulk_upsert(conn, 'price_history', HISTORY_COLUMNS,
+                                 _history_rows(client, market, batch, date_from, date_to, stats),
+                                 update_columns=HISTORY_COLUMNS[2:])
+            logging.info(f"Batch {stats['batches']}/{total_batches}: {loaded} prices loaded "
+                         f"(instruments {batch[0]}-{batch[-1]})")
+        except Exception as e:
+            logging.error(f"Failed to backfill batch {stats['batches']}/{total_batches} "
+                          f"(instruments {batch[0]}-{batch[-1]}): {e}")
+            stats['errors'] += 1
+    return stats
+
+
+def _setup_logging():
+    log_dir = os.getenv('LOG_PATH', "../../storage/logs")
+    os.makedirs(log_dir, exist_ok=True)
+    log_filename = os.path.join(log_dir, "price_history.log")
+
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+    logger.handlers.clear()
+
+    file_handler = logging.FileHandler(log_filename)
+    file_handler.setLevel(logging.INFO)
+    file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s: %(message)s", datefmt="%Y-%m-%d %H:%M:%S"))
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+
+    logger.addHandler(file_handler)
+    logger.addHandler(console_handler)
+
+
+def _parse_date(value: str) -> date:
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill price_history from Börsdata historical stock prices")
+    parser.add_argument('--market', choices=MARKETS, required=True,
+                        help="Instrument universe to backfill")
+    parser.add_argument('--from', dest='date_from', type=_parse_date,
+                        help=f"First date (YYYY-MM-DD, default {DEFAULT_BACKFILL_YEARS} years ago)")
+    parser.add_argument('--to', dest='date_to', type=_parse_date, default=date.today(),
+                        help="Last date (YYYY-MM-DD, default today)")
+    parser.add_argument('--instruments', type=lambda v: [int(i) for i in v.split(',') if i.strip()],
+                        help="Comma-separated instrument ids (default: all instruments of the market)")
+    args = parser.parse_args(argv)
+    date_from = args.date_from or args.date_to - timedelta(days=365 * DEFAULT_BACKFILL_YEARS)
+
+    load_dotenv(dotenv_path='../../.env')
+    _setup_logging()
+
+    api_key = os.getenv('BORSDATA_API_KEY')
+    if not api_key:
+        logging.error("BORSDATA_API_KEY not set in environment")
+        return 1
+
+    start = datetime.now()
+    logging.info("=" * 50)
+    logging.info(f"PRICE HISTORY BACKFILL STARTED ({args.market})")
+    logging.info("=" * 50)
+    try:
+        conn = connect_pymysql(
+            user=os.getenv('DB_USERNAME'),
+            password=os.getenv('DB_PASSWORD'),
+            host=os.getenv('DB_HOST'),
+            port=int(os.getenv('DB_PORT', 3306)),
+            database=os.getenv('DB_MARKETDATA'),
+            charset='utf8mb4',
+            cursorclass=pymysql.cursors.DictCursor,
+            local_infile=True  # allows LOAD DATA LOCAL INFILE in bulk_loader
+        )
+    except Exception as e:
+        logging.exception(f"Database error: {e}")
+        return 1
+
+    try:
+        stats = backfill(conn, BorsdataClient(api_key), args.market, date_from, args.date_to, args.instruments)
+    finally:
+        conn.close()
+
+    logging.info(f"Backfill finished: {stats['rows']} prices in {stats['batches']} batches, "
+                 f"{stats['skipped']} skipped, {stats['errors']} errors. Duration: {datetime.now() - start}.")
+    return 0 if stats['errors'] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
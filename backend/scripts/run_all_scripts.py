@@ -1,90 +1,392 @@
 #!/usr/bin/env python3
 """
 Master script to run all PSW 4.0 data import scripts
+
+Scripts are declared as a dependency graph instead of a flat list. A script
+starts as soon as every script it depends on has finished successfully, so
+independent imports (e.g. the FX job and the instrument loads) run side by
+side. The number of scripts running at the same time is capped by
+--workers (or the RUN_ALL_MAX_WORKERS environment variable).
+
+By default every script is imported once into this process and its main()
+is called directly, so all jobs share one HTTP session and one pool of
+database connections (see shared_resources.py). Pass --isolated to run each
+script in its own interpreter as before; only that mode enforces the
+per-script timeout. --every keeps the process alive and re-runs the batch
+on an interval, reusing the already imported scripts and open connections.
 """
+import argparse
+import contextvars
+import importlib
+import logging
 import subprocess
 import sys
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime
 
-# List of scripts to run in order
-SCRIPTS = [
-    'global_instruments.py',
-    'global_latest_prices.py', 
-    'nordic_instruments.py',
-    'nordic_latest_prices.py',
-    'country_info.py',
-    'mysql_db_overview.py',
-    'fx_rates_freecurrency.py'
-]
+import shared_resources
+
+# Scripts to run and the scripts each one depends on.
+# Price loads need their instrument loads; everything else is independent.
+SCRIPT_DEPENDENCIES = {
+    'global_instruments.py': [],
+    'global_latest_prices.py': ['global_instruments.py'],
+    'nordic_instruments.py': [],
+    'nordic_latest_prices.py': ['nordic_instruments.py'],
+    'country_info.py': [],
+    'mysql_db_overview.py': [],
+    'fx_rates_freecurrency.py': [],
+}
+
+# Kept for callers that expect the plain list of scripts
+SCRIPTS = list(SCRIPT_DEPENDENCIES)
+
+DEFAULT_MAX_WORKERS = int(os.getenv('RUN_ALL_MAX_WORKERS', 4))
+SCRIPT_TIMEOUT = 300  # 5 minute timeout
+
+# Serialises console output from concurrently running scripts
+_print_lock = threading.Lock()
+
+
+def log(message):
+    """Print a line without interleaving output from worker threads"""
+    with _print_lock:
+        print(message, flush=True)
+
+
+def validate_dependencies(dependencies):
+    """Check that every dependency is declared and the graph has no cycles"""
+    for script, deps in dependencies.items():
+        unknown = [d for d in deps if d not in dependencies]
+        if unknown:
+            raise ValueError(f"{script} depends on undeclared scripts: {', '.join(unknown)}")
+
+    visiting, done = set(), set()
+
+    def visit(script, path):
+        if script in done:
+            return
+        if script in visiting:
+            raise ValueError(f"Dependency cycle: {' -> '.join(path + [script])}")
+        visiting.add(script)
+        for dep in dependencies[script]:
+            visit(dep, path + [script])
+        visiting.discard(script)
+        done.add(script)
+
+    for script in dependencies:
+        visit(script, [])
+
 
 def run_script(script_name):
     """Run a single script and return success status"""
-    print(f"Running {script_name}...")
+    log(f"Running {script_name}...")
     try:
-        result = subprocess.run([sys.executable, script_name], 
-                              capture_output=True, 
-                              text=True, 
-                              timeout=300)  # 5 minute timeout
-        
+        result = subprocess.run([sys.executable, script_name],
+                                capture_output=True,
+                                text=True,
+                                timeout=SCRIPT_TIMEOUT)
+
         if result.returncode == 0:
-            print(f"✅ {script_name} completed successfully")
+            log(f"✅ {script_name} completed successfully")
             return True
         else:
-            print(f"❌ {script_name} failed with exit code {result.returncode}")
+            log(f"❌ {script_name} failed with exit code {result.returncode}")
             if result.stderr:
-                print(f"Error output: {result.stderr}")
+                log(f"Error output: {result.stderr}")
             return False
-            
+
     except subprocess.TimeoutExpired:
-        print(f"❌ {script_name} timed out after 5 minutes")
+        log(f"❌ {script_name} timed out after {SCRIPT_TIMEOUT // 60} minutes")
+        return False
+    except Exception as e:
+        log(f"❌ Error running {script_name}: {e}")
+        return False
+
+
+class JobLogRouter(logging.Handler):
+    """
+    Root log handler for in-process runs.
+
+    Every script installs its own file handler on the root logger at import
+    time. Once all scripts are imported the root logger only keeps this
+    router, which forwards each record to the file and console handlers of
+    the script that logged it.
+
+    The running script is kept in a context variable, so threads started
+    with the caller's context (asyncio.to_thread, executors submitting
+    through contextvars.copy_context().run) log to the same job. Records
+    from threads without a job go to the console.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._handlers = {}
+        self._current = contextvars.ContextVar('job_log_handlers', default=None)
+        self._fallback = logging.StreamHandler()
+        self._fallback.setFormatter(logging.Formatter("%(levelname)s: %(threadName)s: %(message)s"))
+
+    def register(self, script_name, file_handler=None, console_handler=None):
+        self._handlers[script_name] = (file_handler, console_handler)
+
+    def bind(self, script_name):
+        self._current.set(self._handlers.get(script_name, (None, None)))
+
+    def unbind(self):
+        self._current.set(None)
+
+    def emit(self, record):
+        handlers = self._current.get()
+        if handlers is None:
+            with _print_lock:
+                self._fallback.handle(record)
+            return
+        file_handler, console_handler = handlers
+        if file_handler is not None:
+            file_handler.handle(record)
+        if console_handler is not None:
+            with _print_lock:
+                console_handler.handle(record)
+
+
+_log_router = JobLogRouter()
+_loaded_modules = {}  # script name -> imported module or the import error
+
+
+def load_scripts(script_names):
+    """Import every script once and route their log output through _log_router"""
+    root_logger = logging.getLogger()
+    for script_name in script_names:
+        if script_name in _loaded_modules:
+            continue
+        try:
+            module = importlib.import_module(os.path.splitext(script_name)[0])
+            _loaded_modules[script_name] = module
+            _log_router.register(script_name,
+                                 getattr(module, 'file_handler', None),
+                                 getattr(module, 'console_handler', None))
+        except BaseException as e:  # scripts raise at import time on missing config
+            _loaded_modules[script_name] = e
+    root_logger.handlers = [_log_router]
+    root_logger.setLevel(logging.INFO)
+
+
+def run_script_in_process(script_name):
+    """Call an already imported script's main() and return success status"""
+    module = _loaded_modules.get(script_name)
+    if isinstance(module, BaseException):
+        log(f"❌ {script_name} could not be imported: {module}")
         return False
+
+    log(f"Running {script_name} (in-process)...")
+    _log_router.bind(script_name)
+    try:
+        exit_code = module.main()
+    except SystemExit as e:
+        exit_code = e.code
     except Exception as e:
-        print(f"❌ Error running {script_name}: {e}")
+        log(f"❌ Error running {script_name}: {e}")
         return False
+    finally:
+        _log_router.unbind()
+
+    if exit_code in (None, 0):
+        log(f"✅ {script_name} completed successfully")
+        return True
+    log(f"❌ {script_name} failed with exit code {exit_code}")
+    return False
+
+
+def run_graph(dependencies, runner, max_workers):
+    """
+    Run scripts in dependency order with at most max_workers at a time.
+
+    Returns a dict of script -> {"status", "start", "end"}. A script whose
+    dependency failed or was skipped is itself marked "skipped".
+    """
+    results = {}
+    pending = dict(dependencies)
+    running = {}
 
-def main():
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            # Skip anything whose dependencies can no longer succeed
+            for script, deps in list(pending.items()):
+                blocked = [d for d in deps if results.get(d, {}).get("status") in ("failed", "skipped")]
+                if blocked:
+                    now = datetime.now()
+                    results[script] = {"status": "skipped", "start": now, "end": now}
+                    log(f"⏭️  Skipping {script}: dependency failed ({', '.join(blocked)})")
+                    del pending[script]
+
+            # Start everything whose dependencies have succeeded
+            for script, deps in list(pending.items()):
+                if all(results.get(d, {}).get("status") == "success" for d in deps):
+                    started = datetime.now()
+                    running[executor.submit(runner, script)] = (script, started)
+                    del pending[script]
+
+            if not running:
+                if pending:
+                    raise RuntimeError(f"Unschedulable scripts: {', '.join(pending)}")
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                script, started = running.pop(future)
+                try:
+                    ok = future.result()
+                except Exception as e:
+                    log(f"❌ Error running {script}: {e}")
+                    ok = False
+                results[script] = {
+                    "status": "success" if ok else "failed",
+                    "start": started,
+                    "end": datetime.now(),
+                }
+
+    return results
+
+
+def critical_path(dependencies, results):
+    """
+    Return (path, seconds) for the longest chain of dependent scripts,
+    measured with the durations observed in this run.
+    """
+    finish = {}
+    previous = {}
+
+    def longest(script):
+        if script in finish:
+            return finish[script]
+        info = results.get(script)
+        own = (info["end"] - info["start"]).total_seconds() if info else 0.0
+        best_dep, best = None, 0.0
+        for dep in dependencies[script]:
+            total = longest(dep)
+            if total > best:
+                best_dep, best = dep, total
+        finish[script] = best + own
+        previous[script] = best_dep
+        return finish[script]
+
+    if not dependencies:
+        return [], 0.0
+
+    last = max(dependencies, key=longest)
+    path = []
+    while last:
+        path.append(last)
+        last = previous[last]
+    return list(reversed(path)), finish[path[0]]
+
+
+def print_critical_path_report(dependencies, results):
+    """Print per-script durations and the chain that bounded wall-clock time"""
+    print("\n" + "=" * 50)
+    print("🧭 CRITICAL PATH REPORT")
+    print("=" * 50)
+    for script in dependencies:
+        info = results.get(script)
+        if not info:
+            continue
+        seconds = (info["end"] - info["start"]).total_seconds()
+        print(f"{script:<28} {info['status']:<8} {seconds:8.1f}s")
+
+    path, seconds = critical_path(dependencies, results)
+    if path:
+        print(f"\nCritical path ({seconds:.1f}s): {' -> '.join(path)}")
+
+
+def run_batch(max_workers, isolated):
+    """Run every script once and print the summary; returns the exit code"""
     start_time = datetime.now()
     print("🚀 Starting PSW 4.0 Data Import Scripts...")
     print(f"Start time: {start_time}")
+    print(f"Max parallel scripts: {max_workers}")
+    print(f"Mode: {'isolated subprocesses' if isolated else 'in-process'}")
     print("=" * 50)
-    
-    # Change to scripts directory
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    os.chdir(script_dir)
-    
-    success_count = 0
-    failed_scripts = []
-    
-    for i, script in enumerate(SCRIPTS, 1):
-        print(f"\n[{i}/{len(SCRIPTS)}] {script}")
-        print("-" * 30)
-        
-        if run_script(script):
-            success_count += 1
-        else:
-            failed_scripts.append(script)
-    
+
+    if isolated:
+        runner = run_script
+    else:
+        load_scripts(SCRIPTS)
+        runner = run_script_in_process
+
+    results = run_graph(SCRIPT_DEPENDENCIES, runner, max_workers)
+
+    success_count = sum(1 for r in results.values() if r["status"] == "success")
+    failed_scripts = [s for s in SCRIPTS if results[s]["status"] == "failed"]
+    skipped_scripts = [s for s in SCRIPTS if results[s]["status"] == "skipped"]
+
     # Summary
     end_time = datetime.now()
     duration = end_time - start_time
-    
+
+    print_critical_path_report(SCRIPT_DEPENDENCIES, results)
+
     print("\n" + "=" * 50)
     print("📊 EXECUTION SUMMARY")
     print("=" * 50)
     print(f"✅ Successful: {success_count}/{len(SCRIPTS)}")
     print(f"❌ Failed: {len(failed_scripts)}/{len(SCRIPTS)}")
+    if skipped_scripts:
+        print(f"⏭️  Skipped: {len(skipped_scripts)}/{len(SCRIPTS)}")
     print(f"⏱️  Total duration: {duration}")
     print(f"📝 Check logs in: p:\\logs")
     print(f"📄 Check documentation in: p:\\documentation\\MySQL_overview")
-    
-    if failed_scripts:
-        print(f"\n❌ Failed scripts: {', '.join(failed_scripts)}")
+
+    if failed_scripts or skipped_scripts:
+        if failed_scripts:
+            print(f"\n❌ Failed scripts: {', '.join(failed_scripts)}")
+        if skipped_scripts:
+            print(f"⏭️  Skipped scripts: {', '.join(skipped_scripts)}")
         return 1
     else:
         print("\n🎉 All scripts completed successfully!")
         return 0
 
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run all PSW 4.0 data import scripts")
+    parser.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f"Maximum number of scripts running at once (default: {DEFAULT_MAX_WORKERS})")
+    parser.add_argument('--isolated', action='store_true',
+                        help="Run each script in its own Python subprocess")
+    parser.add_argument('--every', type=float, metavar='MINUTES',
+                        help="Keep running and repeat the batch every MINUTES (in-process mode only)")
+    args = parser.parse_args(argv)
+    max_workers = max(1, args.workers)
+
+    if args.every and args.isolated:
+        parser.error("--every requires in-process mode")
+
+    # Change to scripts directory
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(script_dir)
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+
+    validate_dependencies(SCRIPT_DEPENDENCIES)
+
+    if not args.isolated:
+        shared_resources.enable_pooling(max_workers)
+
+    try:
+        while True:
+            batch_started = time.monotonic()
+            exit_code = run_batch(max_workers, args.isolated)
+            if not args.every:
+                return exit_code
+            wait_seconds = max(0.0, args.every * 60 - (time.monotonic() - batch_started))
+            print(f"\n⏳ Next batch in {wait_seconds / 60:.1f} minutes")
+            time.sleep(wait_seconds)
+    finally:
+        shared_resources.close_all()
+
 if __name__ == "__main__":
     exit_code = main()
-    sys.exit(exit_code)
\ No newline at end of file
+    sys.exit(exit_code)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Set-based information_schema sweep for mysql_db_overview.py
+
+Instead of USE / SHOW TABLES / DESCRIBE / SHOW INDEX and three
+information_schema lookups per table, sweep_schemas() reads tables,
+columns, partitions, indexes and foreign keys of all requested schemas in
+five queries and assembles the per-table structures in memory. The result
+has the same shape the per-table code produces: schema rows look like
+DESCRIBE output, index rows like SHOW INDEX output and constraint rows like
+the KEY_COLUMN_USAGE query.
+
+Works with a mysql.connector tuple cursor. Table and column names come
+back in information_schema order (tables by name, columns by position).
+"""
+
+import logging
+from collections import defaultdict
+from typing import Dict, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+def _in_clause(schemas: Sequence[str]) -> str:
+    return ', '.join(['%s'] * len(schemas))
+
+
+def new_table_info(table_name: str) -> dict:
+    """Empty table entry in the overview's key order"""
+    return {
+        "name": table_name,
+        "schema": [],
+        "sample_data": {
+            "columns": [],
+            "rows": []
+        },
+        "statistics": {},
+        "indexes": [],
+        "constraints": [],
+        "data_analysis": {}
+    }
+
+
+def _sweep_tables(cursor, schemas: Sequence[str], result: Dict[str, Dict[str, dict]]):
+    cursor.execute(f"""
+        SELECT
+            table_schema,
+            table_name,
+            table_rows,
+            data_length,
+            index_length,
+            (data_length + index_length) as total_size,
+            avg_row_length,
+            create_time,
+            update_time,
+            table_collation,
+            engine,
+            auto_increment,
+            row_format,
+            table_comment
+        FROM information_schema.tables
+        WHERE table_schema IN ({_in_clause(schemas)})
+        ORDER BY table_schema, table_name
+    """, tuple(schemas))
+    for row in cursor.fetchall():
+        table_info = new_table_info(row[1])
+        table_info["statistics"] = {
+            "row_count": row[2] or 0,
+            "data_size_bytes": row[3] or 0,
+            "index_size_bytes": row[4] or 0,
+            "total_size_bytes": row[5] or 0,
+            "avg_row_length": row[6] or 0,
+            "created": row[7].isoformat() if row[7] else None,
+            "updated": row[8].isoformat() if row[8] else None,
+            "collation": row[9],
+            "engine": row[10],
+            "auto_increment": row[11],
+            "row_format": row[12],
+            "table_comment": row[13]
+        }
+        result[row[0]][row[1]] = table_info
+
+
+def _sweep_columns(cursor, schemas: Sequence[str], result: Dict[str, Dict[str, dict]]):
+    cursor.execute(f"""
+        SELECT table_schema, table_name, column_name, column_type, is_nullable,
+               column_key, column_default, extra
+        FROM information_schema.columns
+        WHERE table_schema IN ({_in_clause(schemas)})
+        ORDER BY table_schema, table_name, ordinal_position
+    """, tuple(schemas))
+    for row in cursor.fetchall():
+        table_info = result[row[0]].get(row[1])
+        if table_info is None:
+            continue
+        table_info["schema"].append({
+            "Field": row[2],
+            "Type": row[3],
+            "Null": row[4],
+            "Key": row[5],
+            "Default": row[6],
+            "Extra": row[7]
+        })
+
+
+def _sweep_partitions(cursor, schemas: Sequence[str], result: Dict[str, Dict[str, dict]]):
+    cursor.execute(f"""
+        SELECT
+            table_schema,
+            table_name,
+            partition_name,
+            partition_ordinal_position,
+            partition_method,
+            partition_expression,
+            partition_description,
+            table_rows,
+            avg_row_length,
+            data_length,
+            index_length
+        FROM information_schema.partitions
+        WHERE table_schema IN ({_in_clause(schemas)}) AND partition_name IS NOT NULL
+        ORDER BY table_schema, table_name, partition_ordinal_position
+    """, tuple(schemas))
+    partitions = defaultdict(list)
+    for row in cursor.fetchall():
+        partitions[(row[0], row[1])].append({
+            "name": row[2],
+            "position": row[3],
+            "method": row[4],
+            "expression": row[5],
+            "description": row[6],
+            "rows": row[7],
+            "avg_row_length": row[8],
+            "data_size": row[9],
+            "index_size": row[10]
+        })
+    for schema, tables in result.items():
+        for table_name, table_info in tables.items():
+            table_partitions = partitions.get((schema, table_name))
+            if table_partitions:
+                table_info["partitioning"] = {
+                    "is_partitioned": True,
+                    "partition_count": len(table_partitions),
+                    "partitions": table_partitions
+                }
+            else:
+                table_info["partitioning"] = {"is_partitioned": False}
+
+
+def _sweep_indexes(cursor, schemas: Sequence[str], result: Dict[str, Dict[str, dict]]):
+    cursor.execute(f"""
+        SELECT table_schema, table_name, non_unique, index_name, seq_in_index, column_name,
+               collation, cardinality, sub_part, packed, nullable, index_type, comment,
+               index_comment, is_visible, expression
+        FROM information_schema.statistics
+        WHERE table_schema IN ({_in_clause(schemas)})
+        ORDER BY table_schema, table_name, index_name = 'PRIMARY' DESC, index_name, seq_in_index
+    """, tuple(schemas))
+    for row in cursor.fetchall():
+        table_info = result[row[0]].get(row[1])
+        if table_info is None:
+            continue
+        table_info["indexes"].append({
+            "Table": row[1],
+            "Non_unique": row[2],
+            "Key_name": row[3],
+            "Seq_in_index": row[4],
+            "Column_name": row[5],
+            "Collation": row[6],
+            "Cardinality": row[7],
+            "Sub_part": row[8],
+            "Packed": row[9],
+            "Null": row[10],
+            "Index_type": row[11],
+            "Comment": row[12],
+            "Index_comment": row[13],
+            "Visible": row[14],
+            "Expression": row[15]
+        })
+
+
+def _sweep_constraints(cursor, schemas: Sequence[str], result: Dict[str, Dict[str, dict]]):
+    cursor.execute(f"""
+        SELECT table_schema, table_name, constraint_name, column_name,
+               referenced_table_name, referenced_column_name
+        FROM information_schema.key_column_usage
+        WHERE table_schema IN ({_in_clause(schemas)}) AND referenced_table_name IS NOT NULL
+        ORDER BY table_schema, table_name, constraint_name, ordinal_position
+    """, tuple(schemas))
+    for row in cursor.fetchall():
+        table_info = result[row[0]].get(row[1])
+        if table_info is None:
+            continue
+        table_info["constraints"].append({
+            "CONSTRAINT_NAME": row[2],
+            "COLUMN_NAME": row[3],
+            "REFERENCED_TABLE_NAME": row[4],
+            "REFERENCED_COLUMN_NAME": row[5]
+        })
+
+
+def sweep_schemas(cursor, schemas: Sequence[str]) -> Dict[str, Dict[str, dict]]:
+    """
+    Structure of every table in the given schemas: {schema: {table: table_info}}.
+
+    table_info has name, schema, statistics, indexes, constraints and
+    partitioning filled in; sample_data and data_analysis are left empty
+    for the caller.
+    """
+    result: Dict[str, Dict[str, dict]] = {schema: {} for schema in schemas}
+    if not schemas:
+        return result
+    _sweep_tables(cursor, schemas, result)
+    _sweep_columns(cursor, schemas, result)
+    _sweep_partitions(cursor, schemas, result)
+    _sweep_indexes(cursor, schemas, result)
+    _sweep_constraints(cursor, schemas, result)
+    logger.info(f"Swept {sum(len(tables) for tables in result.values())} tables in "
+                f"{len(schemas)} schemas with 5 information_schema queries")
+    return result
+
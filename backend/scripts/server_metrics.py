@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Server variable and global status capture for mysql_db_overview.py
+
+Reads the wanted system variables from performance_schema.global_variables
+and all counters from performance_schema.global_status in one query each
+(falling back to SHOW GLOBAL VARIABLES / SHOW GLOBAL STATUS when
+performance_schema is disabled).
+
+Counters since server start say little about current load, so every run
+stores a snapshot and the report shows the change since the previous one:
+queries per second, InnoDB buffer pool hit ratio, temporary tables written
+to disk, and so on.
+
+Target Database: psw_foundation
+Table: mysql_status_snapshots (see database/migrations/create_mysql_status_snapshots_table.sql)
+
+Environment Variables (optional):
+- DB_FOUNDATION: database holding mysql_status_snapshots (default: psw_foundation)
+- OVERVIEW_STATUS_SNAPSHOTS: set to 0 to neither store nor compare snapshots
+
+Works with a mysql.connector tuple cursor.
+"""
+
+import os
+import json
+import logging
+from datetime import datetime
+from typing import Dict, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Snapshot column -> global status counter; all counters go into global_status JSON as well
+SNAPSHOT_COLUMNS = {
+    "uptime_seconds": "Uptime",
+    "questions": "Questions",
+    "queries": "Queries",
+    "slow_queries": "Slow_queries",
+    "connections": "Connections",
+    "threads_connected": "Threads_connected",
+    "innodb_buffer_pool_read_requests": "Innodb_buffer_pool_read_requests",
+    "innodb_buffer_pool_reads": "Innodb_buffer_pool_reads",
+    "created_tmp_tables": "Created_tmp_tables",
+    "created_tmp_disk_tables": "Created_tmp_disk_tables"
+}
+
+
+def _snapshot_table() -> str:
+    return f"`{os.getenv('DB_FOUNDATION', 'psw_foundation')}`.mysql_status_snapshots"
+
+
+def _typed(value):
+    """Variable value as int when it is a whole number, otherwise unchanged"""
+    if isinstance(value, str) and value.lstrip('-').isdigit():
+        return int(value)
+    return value
+
+
+def _counter(status: Dict[str, str], name: str) -> Optional[int]:
+    value = _typed(status.get(name))
+    return value if isinstance(value, int) else None
+
+
+def read_global_variables(cursor, names: Sequence[str]) -> Dict[str, object]:
+    """{name: value} for the given system variables; "N/A" for unknown ones"""
+    placeholders = ', '.join(['%s'] * len(names))
+    try:
+        cursor.execute(f"""
+            SELECT VARIABLE_NAME, VARIABLE_VALUE
+            FROM performance_schema.global_variables
+            WHERE VARIABLE_NAME IN ({placeholders})
+        """, tuple(names))
+        rows = cursor.fetchall()
+        if not rows:
+            raise LookupError("performance_schema.global_variables is empty")
+    except Exception as e:
+        logger.info(f"Reading variables with SHOW GLOBAL VARIABLES ({e})")
+        cursor.execute(f"SHOW GLOBAL VARIABLES WHERE Variable_name IN ({placeholders})", tuple(names))
+        rows = cursor.fetchall()
+
+    found = {row[0].lower(): _typed(row[1]) for row in rows}
+    return {name: found.get(name.lower(), "N/A") for name in names}
+
+
+def read_global_status(cursor) -> Dict[str, str]:
+    """All global status counters as returned by the server (string values)"""
+    try:
+        cursor.execute("SELECT VARIABLE_NAME, VARIABLE_VALUE FROM performance_schema.global_status")
+        rows = cursor.fetchall()
+        if not rows:
+            raise LookupError("performance_schema.global_status is empty")
+    except Exception as e:
+        logger.info(f"Reading status with SHOW GLOBAL STATUS ({e})")
+        cursor.execute("SHOW GLOBAL STATUS")
+        rows = cursor.fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+def compute_deltas(previous: dict, status: Dict[str, str]) -> dict:
+    """
+    Rates between a stored snapshot and the current status. After a server
+    restart (uptime went down) the counters started from zero, so the
+    interval is the current uptime and the deltas are the counters themselves.
+    """
+    uptime = _counter(status, "Uptime") or 0
+    restarted = previous["uptime_seconds"] is None or uptime < previous["uptime_seconds"]
+    interval = uptime if restarted else uptime - previous["uptime_seconds"]
+
+    def delta(name):
+        current = _counter(status, name)
+        if current is None:
+            return None
+        if restarted:
+            return current
+        before = previous["status"].get(name)
+        return current - before if isinstance(before, int) else None
+
+    def per_second(value):
+        return round(value / interval, 3) if value is not None and interval > 0 else None
+
+    def ratio(part, whole):
+        return round(part / whole, 6) if part is not None and whole else None
+
+    queries = delta("Queries")
+    read_requests = delta("Innodb_buffer_pool_read_requests")
+    disk_reads = delta("Innodb_buffer_pool_reads")
+    tmp_tables = delta("Created_tmp_tables")
+    tmp_disk_tables = delta("Created_tmp_disk_tables")
+    hit_ratio = ratio(disk_reads, read_requests)
+
+    return {
+        "previous_snapshot_at": previous["captured_at"],
+        "server_restarted": restarted,
+        "interval_seconds": interval,
+        "queries": queries,
+        "queries_per_second": per_second(queries),
+        "questions_per_second": per_second(delta("Questions")),
+        "slow_queries": delta("Slow_queries"),
+        "connections_per_second": per_second(delta("Connections")),
+        "innodb_buffer_pool_read_requests": read_requests,
+        "innodb_buffer_pool_reads": disk_reads,
+        "buffer_pool_hit_ratio": round(1 - hit_ratio, 6) if hit_ratio is not None else None,
+        "created_tmp_tables": tmp_tables,
+        "created_tmp_disk_tables": tmp_disk_tables,
+        "tmp_disk_table_ratio": ratio(tmp_disk_tables, tmp_tables)
+    }
+
+
+def previous_snapshot(cursor) -> Optional[dict]:
+    """Most recent stored snapshot, or None"""
+    cursor.execute(f"""
+        SELECT captured_at, uptime_seconds, global_status
+        FROM {_snapshot_table()}
+        ORDER BY captured_at DESC, id DESC
+        LIMIT 1
+    """)
+    row = cursor.fetchone()
+    if not row:
+        return None
+    stored = row[2]
+    if isinstance(stored, (bytes, bytearray)):
+        stored = stored.decode('utf-8')
+    return {
+        "captured_at": row[0].isoformat() if row[0] else None,
+        "uptime_seconds": row[1],
+        "status": json.loads(stored) if stored else {}
+    }
+
+
+def record_snapshot(cursor, status: Dict[str, str], hostname: Optional[str] = None):
+    """Store the numeric counters of one run and commit"""
+    counters = {name: _typed(value) for name, value in status.items()}
+    counters = {name: value for name, value in counters.items() if isinstance(value, int)}
+    columns = list(SNAPSHOT_COLUMNS)
+    cursor.execute(f"""
+        INSERT INTO {_snapshot_table()}
+            (captured_at, hostname, {', '.join(columns)}, global_status)
+        VALUES (%s, %s, {', '.join(['%s'] * len(columns))}, %s)
+    """, (datetime.now(), hostname, *(counters.get(SNAPSHOT_COLUMNS[c]) for c in columns),
+          json.dumps(counters, separators=(',', ':'))))
+    cursor.execute("COMMIT")
+
+
+def snapshot_deltas(cursor, status: Dict[str, str], hostname: Optional[str] = None) -> Optional[dict]:
+    """
+    Compare the current status with the previous snapshot, then store the
+    current one. Returns the deltas, None for the first snapshot, or
+    {"error": ...} when the snapshot table cannot be used.
+    """
+    if os.getenv('OVERVIEW_STATUS_SNAPSHOTS', '1') == '0':
+        return None
+    try:
+        previous = previous_snapshot(cursor)
+        record_snapshot(cursor, status, hostname)
+    except Exception as e:
+        logger.warning(f"Could not use {_snapshot_table()} (run "
+                       f"database/migrations/create_mysql_status_snapshots_table.sql): {e}")
+        return {"error": str(e)}
+    return compute_deltas(previous, status) if previous else None
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP session and MySQL connections for PSW 4.0 import scripts
+
+Scripts call get_http_session(), connect_pymysql() and connect_mysql()
+instead of requests.get / pymysql.connect / mysql.connector.connect.
+When a script runs on its own these behave exactly like the direct calls.
+When run_all_scripts.py runs the scripts in-process it calls
+enable_pooling() first, after which every script shares one keep-alive
+HTTP session and connections are handed back to a pool on close() instead
+of being torn down.
+"""
+
+import threading
+
+import requests
+
+DEFAULT_POOL_SIZE = 4
+
+_lock = threading.Lock()
+_http_session = None
+_pooling_enabled = False
+_pool_size = DEFAULT_POOL_SIZE
+_idle_connections = {}  # pool key -> list of raw connections
+
+
+def get_http_session():
+    """Return the process-wide requests.Session (created on first use)"""
+    global _http_session
+    with _lock:
+        if _http_session is None:
+            _http_session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=_pool_size, pool_maxsize=_pool_size)
+            _http_session.mount('https://', adapter)
+            _http_session.mount('http://', adapter)
+        return _http_session
+
+
+def enable_pooling(pool_size=DEFAULT_POOL_SIZE):
+    """Keep database connections open between jobs in this process"""
+    global _pooling_enabled, _pool_size
+    with _lock:
+        _pooling_enabled = True
+        _pool_size = max(1, pool_size)
+
+
+def pooling_enabled():
+    return _pooling_enabled
+
+
+class _PooledConnection:
+    """Wraps a driver connection so close() returns it to the pool"""
+
+    def __init__(self, key, connection):
+        self._key = key
+        self._connection = connection
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def is_connected(self):
+        # mysql.connector API; scripts use it to decide whether to close()
+        if self._released:
+            return False
+        checker = getattr(self._connection, 'is_connected', None)
+        return checker() if checker else self._connection.open
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        _release(self._key, self._connection)
+
+
+def _pool_key(driver, config):
+    return (driver,) + tuple(sorted((k, repr(v)) for k, v in config.items()))
+
+
+def _release(key, connection):
+    try:
+        connection.rollback()  # never leak an open transaction to the next job
+    except Exception:
+        _discard(connection)
+        return
+    with _lock:
+        idle = _idle_connections.setdefault(key, [])
+        if len(idle) < _pool_size:
+            idle.append(connection)
+            return
+    _discard(connection)
+
+
+def _discard(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+def _checkout(driver, config, factory):
+    key = _pool_key(driver, config)
+    while True:
+        with _lock:
+            idle = _idle_connections.get(key)
+            connection = idle.pop() if idle else None
+        if connection is None:
+            return _PooledConnection(key, factory(**config))
+        try:
+            connection.ping(reconnect=True)
+            return _PooledConnection(key, connection)
+        except Exception:
+            _discard(connection)
+
+
+def connect_pymysql(**config):
+    """pymysql.connect() that reuses pooled connections when pooling is enabled"""
+    import pymysql
+    if not _pooling_enabled:
+        return pymysql.connect(**config)
+    return _checkout('pymysql', config, pymysql.connect)
+
+
+def connect_mysql(**config):
+    """mysql.connector.connect() that reuses pooled connections when pooling is enabled"""
+    import mysql.connector
+    if not _pooling_enabled:
+        return mysql.connector.connect(**config)
+    return _checkout('mysql.connector', config, mysql.connector.connect)
+
+
+def close_all():
+    """Close every pooled connection and the shared HTTP session"""
+    global _http_session
+    with _lock:
+        connections = [c for idle in _idle_connections.values() for c in idle]
+        _idle_connections.clear()
+        session, _http_session = _http_session, None
+    for connection in connections:
+        _discard(connection)
+    if session is not None:
+        session.close()
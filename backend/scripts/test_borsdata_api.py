@@ -8,6 +8,8 @@ import requests
 import json
 from datetime import datetime
 
+from borsdata_client import BorsdataClient
+
 # Börsdata API configuration
 API_BASE_URL = 'https://apiservice.borsdata.se'
 API_ENDPOINT = '/v1/instruments/kpis/metadata'
@@ -24,13 +26,12 @@ def test_borsdata_api():
     print()
     
     try:
-        # Make API request
-        url = f"{API_BASE_URL}{API_ENDPOINT}"
-        params = {'authKey': AUTH_KEY}
-        headers = {'accept': 'application/json'}
-        
+        # Make API request through the shared rate-limited client
+        client = BorsdataClient(AUTH_KEY, headers={'accept': 'application/json'},
+                                base_url=API_BASE_URL, timeout=10)
+
         print("Making API request...")
-        response = requests.get(url, params=params, headers=headers, timeout=10)
+        response = client.get(API_ENDPOINT)
         
         print(f"Status Code: {response.status_code}")
         print(f"Response Headers: {dict(response.headers)}")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for the Börsdata client rate limiter
+Run with pytest or directly: python test_borsdata_client.py
+"""
+
+import random
+
+from borsdata_client import SlidingWindowLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def max_calls_in_window(call_times, window):
+    """Most calls in any half-open span of `window` seconds (ignoring float rounding)"""
+    call_times = sorted(call_times)
+    most, first = 0, 0
+    for last, time in enumerate(call_times):
+        while time - call_times[first] >= window - 1e-9:
+            first += 1
+        most = max(most, last - first + 1)
+    return most
+
+
+def test_burst_then_steady_load_stays_within_the_limit():
+    clock = FakeClock()
+    limiter = SlidingWindowLimiter(100, 10.0, clock=clock)
+    call_times = []
+    # 300 callers at once, then callers arriving every 20 ms for 30 seconds
+    for _ in range(300):
+        call_times.append(clock.now + limiter.reserve())
+    for _ in range(1500):
+        clock.now += 0.02
+        call_times.append(clock.now + limiter.reserve())
+
+    assert max_calls_in_window(call_times, 10.0) == 100
+    # The first 100 calls go out immediately, the next 100 one window later
+    assert call_times[99] == 1000.0
+    assert call_times[100] == 1010.0
+
+
+def test_random_arrivals_never_exceed_the_limit():
+    rng = random.Random(7)
+    clock = FakeClock()
+    limiter = SlidingWindowLimiter(100, 10.0, clock=clock)
+    call_times = []
+    for _ in range(5000):
+        clock.now += rng.expovariate(15.0)
+        call_times.append(clock.now + limiter.reserve())
+    assert max_calls_in_window(call_times, 10.0) <= 100
+
+
+def test_idle_limiter_does_not_delay():
+    clock = FakeClock()
+    limiter = SlidingWindowLimiter(100, 10.0, clock=clock)
+    for _ in range(50):
+        assert limiter.reserve() == 0.0
+        clock.now += 0.5
+
+
+def test_pause_delays_every_caller():
+    clock = FakeClock()
+    limiter = SlidingWindowLimiter(100, 10.0, clock=clock)
+    limiter.pause(30)
+    assert limiter.reserve() == 30.0
+    clock.now += 31
+    assert limiter.reserve() == 0.0
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests for bulk_loader.py
+Run with pytest or directly: python test_bulk_loader.py
+"""
+
+import os
+
+import pymysql
+
+from bulk_loader import RefreshValidationError, _read_spool, _spool_rows, bulk_upsert, refresh_table, swap_refresh
+
+COLUMNS = ('instrument_id', 'price', 'price_date')
+ROWS = [(1, 10.5, '2025-03-07'), (2, 20.25, '2025-03-07')]
+
+
+class FakeCursor:
+    """pymysql dict cursor that records statements and answers the metadata queries"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=()):
+        self.conn.queries.append(' '.join(query.split()))
+        if 'KEY_COLUMN_USAGE' in query:
+            self.rows = [{'name': name, 'table_name': table} for table, name in self.conn.foreign_keys]
+        elif 'LOAD DATA LOCAL INFILE' in query and not self.conn.local_infile:
+            raise pymysql.err.OperationalError(3948, "Loading local data is disabled")
+        else:
+            self.rows = []
+
+    def executemany(self, query, rows):
+        self.conn.queries.append(query)
+        self.conn.inserted.extend(rows)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    def __init__(self, foreign_keys=(), local_infile=True):
+        self.foreign_keys = list(foreign_keys)
+        self.local_infile = local_infile
+        self.queries = []
+        self.inserted = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+def test_upsert_loads_with_local_infile_and_merges_once():
+    conn = FakeConnection()
+    assert bulk_upsert(conn, 'latest_prices', COLUMNS, iter(ROWS), update_columns=COLUMNS[1:]) == 2
+
+    assert conn.queries[1] == ("CREATE TEMPORARY TABLE `_stage_latest_prices` "
+                               "SELECT `instrument_id`, `price`, `price_date` FROM `latest_prices` LIMIT 0")
+    assert conn.queries[2].startswith("LOAD DATA LOCAL INFILE %s INTO TABLE `_stage_latest_prices`")
+    assert conn.queries[3] == ("INSERT INTO `latest_prices` (`instrument_id`, `price`, `price_date`) "
+                               "SELECT `instrument_id`, `price`, `price_date` FROM `_stage_latest_prices` "
+                               "ON DUPLICATE KEY UPDATE `price` = VALUES(`price`), `price_date` = VALUES(`price_date`)")
+    assert conn.queries[-1] == "DROP TEMPORARY TABLE IF EXISTS `_stage_latest_prices`"
+    assert conn.inserted == [] and conn.commits == 1
+
+
+def test_upsert_falls_back_to_multi_row_insert():
+    conn = FakeConnection(local_infile=False)
+    rows = [(1, 10.5, '2025-03-07'), (2, None, 'tab\there'), (3, 'back\\slash', 'line\nbreak')]
+    assert bulk_upsert(conn, 'latest_prices', COLUMNS, rows, commit=False) == 3
+
+    assert "TRUNCATE TABLE `_stage_latest_prices`" in conn.queries
+    assert ("INSERT INTO `_stage_latest_prices` (`instrument_id`, `price`, `price_date`) "
+            "VALUES (%s, %s, %s)") in conn.queries
+    # Values are re-read from the spool file as strings; NULLs and escapes survive
+    assert conn.inserted == [('1', '10.5', '2025-03-07'), ('2', None, 'tab\there'),
+                             ('3', 'back\\slash', 'line\nbreak')]
+    assert conn.commits == 0
+
+
+def test_empty_payload_does_not_merge():
+    conn = FakeConnection()
+    assert bulk_upsert(conn, 'latest_prices', COLUMNS, []) == 0
+    assert not any(q.startswith('INSERT INTO `latest_prices`') for q in conn.queries)
+
+
+def test_spool_round_trip():
+    rows = [(1, None, True, 'a\tb\\c\nd\re'), ('\\N', '', False, 2.5)]
+    path, count = _spool_rows(rows)
+    try:
+        assert count == 2
+        assert list(_read_spool(path)) == [('1', None, '1', 'a\tb\\c\nd\re'), ('\\N', '', '0', '2.5')]
+    finally:
+        os.unlink(path)
+
+
+def test_swap_mode_falls_back_to_upsert_for_tables_with_foreign_keys():
+    conn = FakeConnection(foreign_keys=[('price_alerts', 'fk_alert_price')])
+    result = refresh_table(conn, 'latest_prices', COLUMNS, ROWS, mode='swap', track_changes=False)
+
+    assert result == {'written': 2}
+    assert not any('RENAME TABLE' in q or 'CREATE TABLE' in q for q in conn.queries)
+    assert any(q.startswith('INSERT INTO `latest_prices`') and 'ON DUPLICATE KEY UPDATE' in q
+               for q in conn.queries)
+
+
+def test_swap_refresh_refuses_tables_with_foreign_keys():
+    conn = FakeConnection(foreign_keys=[('latest_prices', 'fk_price_instrument')])
+    try:
+        swap_refresh(conn, 'latest_prices', COLUMNS, ROWS)
+    except RefreshValidationError as e:
+        assert 'latest_prices.fk_price_instrument' in str(e)
+    else:
+        raise AssertionError("swap_refresh swapped a table with foreign keys")
+    # Only the foreign key lookup ran, and it covers keys on and to the table
+    assert len(conn.queries) == 1
+    assert 'TABLE_NAME = %s' in conn.queries[0] and 'REFERENCED_TABLE_NAME = %s' in conn.queries[0]
+
+
+def test_upsert_mode_does_not_look_up_foreign_keys():
+    conn = FakeConnection(foreign_keys=[('price_alerts', 'fk_alert_price')])
+    assert refresh_table(conn, 'latest_prices', COLUMNS, ROWS, mode='upsert', track_changes=False) == {'written': 2}
+    assert not any('KEY_COLUMN_USAGE' in q for q in conn.queries)
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-hash change detection in change_detector.py
+Run with pytest or directly: python test_change_detector.py
+"""
+
+from change_detector import ChangeSet, ContentHashIndex
+
+COLUMNS = ('instrument_id', 'price', 'price_date')
+SCOPE = {'kpi_id': 12}
+
+
+class FakeCursor:
+    """pymysql tuple cursor over row_content_hashes and the key column of one target table"""
+
+    def __init__(self, table_keys=()):
+        self.hashes = {}  # (table_name, scope, row_key) -> content_hash
+        self.table_keys = list(table_keys)
+        self.deleted = []
+        self.rows = []
+        self.rowcount = 0
+
+    def execute(self, query, params=()):
+        if 'FROM row_content_hashes' in query:
+            table, scope = params
+            self.rows = [(key[2], digest) for key, digest in self.hashes.items() if key[:2] == (table, scope)]
+        elif query.startswith('SELECT `instrument_id`'):
+            self.rows = [(key,) for key in self.table_keys]
+        else:
+            raise AssertionError(f"Unexpected query: {query}")
+
+    def executemany(self, query, params):
+        if 'INSERT INTO row_content_hashes' in query:
+            for table, scope, key, digest in params:
+                self.hashes[(table, scope, key)] = digest
+        elif 'DELETE FROM row_content_hashes' in query:
+            for key in params:
+                self.hashes.pop(tuple(key), None)
+        elif query.startswith('DELETE FROM'):
+            self.deleted.append((query, list(params)))
+            self.rowcount = len(params)
+        else:
+            raise AssertionError(f"Unexpected query: {query}")
+
+    def fetchall(self):
+        return self.rows
+
+
+def load(cursor, rows, scope=None):
+    """Diff a payload and store its hashes, as refresh_table does after writing"""
+    index = ContentHashIndex(cursor, 'latest_prices', COLUMNS, COLUMNS[:1], scope)
+    changes = index.diff(rows)
+    index.save(changes)
+    return changes
+
+
+def test_first_run_counts_rows_already_in_the_table_as_updated():
+    cursor = FakeCursor(table_keys=[1, 2])
+    changes = load(cursor, [(1, 10.0, '2025-03-07'), (2, 20.0, '2025-03-07'), (3, 30.0, '2025-03-07')])
+    assert changes.counts() == {'inserted': 1, 'updated': 2, 'deleted': 0, 'unchanged': 0}
+    assert changes.tracked == 0
+    assert len(changes.changed_rows) == 3
+
+
+def test_second_run_writes_only_changed_rows():
+    cursor = FakeCursor()
+    load(cursor, [(1, 10.0, '2025-03-07'), (2, 20.0, '2025-03-07'), (3, 30.0, '2025-03-07')])
+
+    changes = load(cursor, [(1, 10.0, '2025-03-07'), (2, 21.0, '2025-03-10'), (4, 40.0, '2025-03-10')])
+    assert changes.counts() == {'inserted': 1, 'updated': 1, 'deleted': 1, 'unchanged': 1}
+    assert changes.inserted == [(4, 40.0, '2025-03-10')]
+    assert changes.updated == [(2, 21.0, '2025-03-10')]
+    assert changes.deleted_keys == ['3']
+    assert changes.tracked == 3
+    # The hashes of the deleted row are gone and the next identical run changes nothing
+    assert load(cursor, [(1, 10.0, '2025-03-07'), (2, 21.0, '2025-03-10'), (4, 40.0, '2025-03-10')]).counts() == \
+        {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 3}
+
+
+def test_duplicate_keys_keep_the_last_row():
+    cursor = FakeCursor()
+    load(cursor, [(1, 10.0, '2025-03-07')])
+    changes = load(cursor, [(1, 11.0, '2025-03-10'), (1, 10.0, '2025-03-07')])
+    assert changes.counts() == {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 1}
+
+    changes = load(cursor, [(1, 10.0, '2025-03-07'), (1, 12.0, '2025-03-11')])
+    assert changes.updated == [(1, 12.0, '2025-03-11')]
+
+
+def test_scopes_are_diffed_separately():
+    cursor = FakeCursor()
+    load(cursor, [(1, 10.0, '2025-03-07')], scope=SCOPE)
+    changes = load(cursor, [(2, 20.0, '2025-03-07')], scope={'kpi_id': 13})
+    assert changes.counts() == {'inserted': 1, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+
+
+def test_delete_rows_matches_scope_and_key():
+    cursor = FakeCursor()
+    index = ContentHashIndex(cursor, 'kpi_nordic', COLUMNS, COLUMNS[:1], SCOPE)
+    assert index.delete_rows(['7', '9']) == 2
+    query, params = cursor.deleted[0]
+    assert query == "DELETE FROM `kpi_nordic` WHERE `kpi_id` = %s AND `instrument_id` = %s"
+    assert params == [[12, '7'], [12, '9']]
+    assert index.delete_rows([]) == 0
+
+
+def test_mass_delete_guard():
+    def change_set(tracked, deleted):
+        changes = ChangeSet()
+        changes.tracked = tracked
+        changes.deleted_keys = [str(n) for n in range(deleted)]
+        return changes
+
+    kept = change_set(10, 1)
+    assert not kept.skip_mass_deletes(0.9)
+    assert len(kept.deleted_keys) == 1
+
+    skipped = change_set(10, 2)
+    assert skipped.skip_mass_deletes(0.9)
+    assert skipped.deleted_keys == []
+
+    # A payload that lost everything never empties the table
+    assert change_set(3, 3).skip_mass_deletes(0.9)
+    assert not change_set(0, 0).skip_mass_deletes(0.9)
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for the FX cross-rate matrix
+Run with pytest or directly: python test_fx_cross_rates.py
+"""
+
+import math
+
+from fx_cross_rates import CrossRateMatrix, check_consistency, currencies_for
+
+# Units per one USD
+USD_RATES = {"SEK": 10.0, "EUR": 0.9, "NOK": 10.5, "DKK": 6.75}
+
+
+def test_rates_are_derived_through_the_anchor():
+    matrix = CrossRateMatrix("USD", USD_RATES)
+    assert matrix.rate("USD", "SEK") == 10.0
+    assert math.isclose(matrix.rate("EUR", "SEK"), 10.0 / 0.9)
+    assert math.isclose(matrix.rate("SEK", "NOK"), 1.05)
+    assert matrix.rate("DKK", "DKK") == 1.0
+    assert math.isclose(matrix.rate("EUR", "SEK") * matrix.rate("SEK", "EUR"), 1.0)
+
+
+def test_vectorised_rates_match_single_lookups():
+    matrix = CrossRateMatrix("USD", USD_RATES)
+    pairs = [("EUR", "SEK"), ("NOK", "DKK"), ("SEK", "USD"), ("USD", "EUR")]
+    assert [float(r) for r in matrix.rates(pairs)] == [matrix.rate(*pair) for pair in pairs]
+    assert len(matrix.rates([])) == 0
+
+
+def test_unusable_quotes_are_left_out():
+    matrix = CrossRateMatrix("USD", {"SEK": 10.0, "GBP": None, "CHF": 0, "JPY": -1})
+    assert matrix.currencies == ["SEK", "USD"]
+    assert matrix.missing([("SEK", "USD"), ("GBP", "SEK"), ("SEK", "CHF")]) == [("GBP", "SEK"), ("SEK", "CHF")]
+    try:
+        matrix.rate("GBP", "SEK")
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("rate() derived a pair without a quote")
+
+
+def test_consistency_check_reports_only_deviating_pairs():
+    matrix = CrossRateMatrix("USD", USD_RATES)
+    quoted = {
+        ("EUR", "SEK"): 10.0 / 0.9 * 1.0005,  # within the default 0.1 %
+        ("NOK", "SEK"): 10.0 / 10.5 * 1.01,   # 1 % off
+        ("GBP", "SEK"): 12.5,                 # not in the matrix
+    }
+    [(pair, expected, derived, deviation)] = check_consistency(matrix, quoted)
+    assert pair == ("NOK", "SEK")
+    assert math.isclose(derived, 10.0 / 10.5)
+    assert math.isclose(expected, quoted[pair])
+    assert math.isclose(deviation, 0.01 / 1.01)
+    assert check_consistency(matrix, {("GBP", "SEK"): 12.5}) == []
+
+
+def test_currencies_for():
+    assert currencies_for([("EUR", "SEK"), ("USD", "SEK"), ("EUR", "NOK")]) == ["EUR", "NOK", "SEK", "USD"]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Tests for the FX history backfill planning and raw response storage in fx_rates_freecurrency.py
+Run with pytest or directly: python test_fx_rates_freecurrency.py
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+from datetime import date, timedelta
+
+# The script reads its API key and log directory at import time
+os.environ.setdefault('FREECURRENCYAPI_KEY', 'test-key')
+os.environ.setdefault('LOG_PATH', tempfile.mkdtemp(prefix='psw_test_logs_'))
+
+from fx_rates_freecurrency import (  # noqa: E402
+    backfill_rows, canonical_payload, compress_payload, contiguous_ranges, decompress_payload, rehash_migrated_rows
+)
+
+PAIR = ("EUR", "SEK")
+PAIRS = [PAIR, ("SEK", "SEK")]
+FRIDAY = date(2025, 3, 7)
+
+
+def days(first, count):
+    return [first + timedelta(days=n) for n in range(count)]
+
+
+def test_contiguous_ranges_split_on_gaps_and_length():
+    missing = days(date(2025, 1, 1), 5) + days(date(2025, 1, 10), 2)
+    assert contiguous_ranges(missing, 3) == [
+        (date(2025, 1, 1), date(2025, 1, 3)),
+        (date(2025, 1, 4), date(2025, 1, 5)),
+        (date(2025, 1, 10), date(2025, 1, 11)),
+    ]
+
+
+def test_weekend_omitted_by_a_successful_response_is_carried_forward():
+    all_days = days(FRIDAY, 4)  # Friday to Monday
+    quotes = {FRIDAY: ({PAIR: 11.0}, 7), FRIDAY + timedelta(days=3): ({PAIR: 11.2}, 7)}
+    rows, (fetched, carried, unfilled) = backfill_rows(all_days, all_days, PAIRS, {}, quotes, {})
+
+    eur = {row[3]: row for row in rows if row[:2] == PAIR}
+    assert (fetched, carried, unfilled) == (2, 2, 0)
+    assert eur[FRIDAY][2] == 11.0 and eur[FRIDAY][5] == 7
+    saturday = eur[FRIDAY + timedelta(days=1)]
+    assert saturday[2] == 11.0 and saturday[5] is None
+    assert json.loads(saturday[6]) == {"carried_forward_from": FRIDAY.isoformat()}
+
+
+def test_failed_range_inserts_nothing_and_is_not_carried_over():
+    all_days = days(FRIDAY, 10)
+    failed = set(days(FRIDAY + timedelta(days=3), 5))  # Monday to Friday failed
+    quotes = {FRIDAY: ({PAIR: 11.0}, 1)}  # later weekend was in a successful range without quotes
+    rows, (fetched, carried, unfilled) = backfill_rows(all_days, all_days, PAIRS, {}, quotes, {}, failed)
+
+    inserted_days = {row[3] for row in rows}
+    assert not inserted_days & failed
+    # The weekend after the failed week must not get last week's Friday rate
+    assert {row[3] for row in rows if row[:2] == PAIR} == set(days(FRIDAY, 3))
+    assert (fetched, carried) == (1, 2)
+    assert unfilled == 2 * len(failed) + 2
+
+
+def test_stored_rates_are_kept_and_feed_carry_forward():
+    all_days = days(FRIDAY, 2)
+    stored = {FRIDAY: {PAIR: 10.5, ("SEK", "SEK"): 1.0}}
+    rows, counts = backfill_rows(all_days, [FRIDAY + timedelta(days=1)], PAIRS, stored, {}, {})
+    assert sorted(rows) == sorted([
+        ("EUR", "SEK", 10.5, FRIDAY + timedelta(days=1), "freecurrencyapi", None,
+         json.dumps({"carried_forward_from": FRIDAY.isoformat()})),
+        ("SEK", "SEK", 1.0, FRIDAY + timedelta(days=1), "freecurrencyapi", None, None),
+    ])
+    assert counts == (0, 1, 0)
+
+
+def test_no_carry_forward_leaves_days_without_quotes_empty():
+    all_days = days(FRIDAY, 2)
+    quotes = {FRIDAY: ({PAIR: 11.0}, 1)}
+    rows, counts = backfill_rows(all_days, all_days, PAIRS, {}, quotes, {}, carry_forward=False)
+    assert {row[3] for row in rows if row[:2] == PAIR} == {FRIDAY}
+    assert counts == (1, 0, 1)
+
+
+class FakeResponseStore:
+    """mysql.connector tuple cursor over fx_raw_responses and the raw_response_id of the rates"""
+
+    def __init__(self, responses, rate_response_ids):
+        self.responses = responses  # id -> [content_hash, endpoint, payload]
+        self.rate_response_ids = rate_response_ids
+        self.rows = []
+
+    def execute(self, query, params=()):
+        if query.startswith("SELECT id, content_hash, payload"):
+            self.rows = [(i, h, p) for i, (h, endpoint, p) in self.responses.items() if endpoint is None]
+        elif query.startswith("SELECT id"):
+            self.rows = [(i,) for i, (h, _, _) in self.responses.items() if h == params[0]]
+        elif query.startswith("UPDATE fx_rates_freecurrency"):
+            self.rate_response_ids[:] = [params[0] if r == params[1] else r for r in self.rate_response_ids]
+        elif query.startswith("DELETE"):
+            del self.responses[params[0]]
+        elif "UPDATE fx_raw_responses" in query:
+            content_hash, _, payload, response_id = params
+            self.responses[response_id][0] = content_hash
+            self.responses[response_id][2] = payload
+        else:
+            raise AssertionError(f"Unexpected query: {query}")
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+
+def migrated(text):
+    """A payload as the migration stored it: MySQL's JSON text, hashed in SQL"""
+    data = text.encode('utf-8')
+    return [hashlib.sha256(data).digest(), None, compress_payload(data)]
+
+
+def test_migrated_responses_get_the_canonical_hash():
+    response = {"data": {"SEK": 10.9, "EUR": 0.92}}
+    canonical = canonical_payload(response)
+    store = FakeResponseStore({
+        1: migrated('{"data": {"EUR": 0.92, "SEK": 10.9}}'),
+        2: [hashlib.sha256(canonical_payload({"data": {}})).digest(), 'latest', compress_payload(b'{"data":{}}')],
+    }, [1, 1, 2])
+
+    assert rehash_migrated_rows(store) == (1, 0)
+    assert store.responses[1][0] == hashlib.sha256(canonical).digest()
+    assert decompress_payload(store.responses[1][2]) == canonical
+    assert rehash_migrated_rows(store) == (0, 0)
+
+
+def test_migrated_copy_of_a_stored_response_is_merged():
+    response = {"data": {"EUR": 0.92}}
+    canonical = canonical_payload(response)
+    store = FakeResponseStore({
+        1: migrated('{"data": {"EUR": 0.92}}'),
+        2: [hashlib.sha256(canonical).digest(), 'latest', compress_payload(canonical)],
+    }, [1, 2, 1])
+
+    assert rehash_migrated_rows(store) == (0, 1)
+    assert list(store.responses) == [2]
+    assert store.rate_response_ids == [2, 2, 2]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
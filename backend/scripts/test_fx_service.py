@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for the as-of FX conversion in fx_service.py
+Run with pytest or directly: python test_fx_service.py
+"""
+
+import math
+from datetime import date
+
+import numpy as np
+
+from fx_service import FXRates
+
+FRIDAY, MONDAY = date(2025, 3, 7), date(2025, 3, 10)
+
+ROWS = [
+    ("USD", "SEK", FRIDAY, 10.0),
+    ("USD", "SEK", MONDAY, 10.2),
+    ("EUR", "SEK", FRIDAY, 11.0),
+    ("SEK", "NOK", FRIDAY, 1.05),     # only quoted the other way round
+    ("SEK", "EUR", FRIDAY, 0.5),      # ignored: EUR/SEK is quoted directly
+    ("USD", "EUR", FRIDAY, 0.9),      # not a SEK pair
+    ("SEK", "SEK", FRIDAY, 1.0),
+    ("GBP", "SEK", FRIDAY, None),
+]
+
+
+def test_lookup_uses_the_latest_rate_on_or_before_the_date():
+    rates = FXRates.from_rows(ROWS)
+    saturday, sunday = date(2025, 3, 8), date(2025, 3, 9)
+    assert list(rates.to_sek("USD", [FRIDAY, saturday, sunday, MONDAY, date(2025, 6, 1)])) == \
+        [10.0, 10.0, 10.0, 10.2, 10.2]
+    assert np.isnan(rates.to_sek("USD", [date(2025, 3, 6)])).all()
+
+
+def test_series_from_direct_and_inverse_quotes():
+    rates = FXRates.from_rows(ROWS)
+    assert rates.currencies == ["EUR", "NOK", "SEK", "USD"]
+    assert rates.to_sek("EUR", [FRIDAY])[0] == 11.0
+    assert math.isclose(rates.to_sek("NOK", [FRIDAY])[0], 1 / 1.05)
+    assert rates.to_sek("SEK", [FRIDAY])[0] == 1.0
+
+
+def test_convert_broadcasts_and_triangulates_through_sek():
+    rates = FXRates.from_rows(ROWS)
+    result = rates.convert([100, 200, 50], "USD", "SEK", [FRIDAY, MONDAY, FRIDAY])
+    assert np.allclose(result, [1000.0, 2040.0, 500.0])
+
+    result = rates.convert([110, 100, 100], ["EUR", "USD", "GBP"], ["USD", "EUR", "SEK"], FRIDAY)
+    assert math.isclose(result[0], 110 * 11.0 / 10.0)
+    assert math.isclose(result[1], 100 * 10.0 / 11.0)
+    assert np.isnan(result[2])
+
+
+def test_dates_before_the_first_rate_are_nan():
+    rates = FXRates.from_rows(ROWS)
+    result = rates.convert([100, 100], "EUR", "SEK", [date(2024, 12, 31), FRIDAY])
+    assert np.isnan(result[0]) and result[1] == 1100.0
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Tests for json_stream.iter_json_array
+Run with pytest or directly: python test_json_stream.py
+"""
+
+import json
+
+from json_stream import iter_json_array
+
+
+def split_everywhere(document):
+    """Every way of cutting the document into two byte chunks"""
+    data = document.encode('utf-8')
+    for cut in range(len(data) + 1):
+        yield [data[:cut], data[cut:]]
+
+
+def test_split_numbers():
+    """Numbers cut right after '.', 'e' or '-' must not decode as their prefix"""
+    assert list(iter_json_array([b'[123.', b'45, 6.5e3, 7]'])) == [123.45, 6500.0, 7]
+    assert list(iter_json_array([b'[123.45, 6.', b'5e3, 7]'])) == [123.45, 6500.0, 7]
+    assert list(iter_json_array([b'[123.45, 6.5e', b'3, 7]'])) == [123.45, 6500.0, 7]
+    assert list(iter_json_array([b'[1, -', b'2.5E-', b'3]'])) == [1, -0.0025]
+
+
+def test_every_split_point():
+    document = '{"count": 3, "values": [-1.5e-3, 12, true, null, "a\\"b", {"i": 7, "n": 0.25}, [1e5]]}'
+    expected = json.loads(document)["values"]
+    for chunks in split_everywhere(document):
+        assert list(iter_json_array(chunks, keys=("values",))) == expected, chunks
+
+
+def test_single_byte_chunks():
+    document = '{"stockPricesList": [{"i": 1, "c": 101.25}, {"i": 2, "c": -3.5e2}]}'
+    chunks = [bytes([byte]) for byte in document.encode('utf-8')]
+    assert list(iter_json_array(chunks, keys=("stockPricesList",))) == \
+        json.loads(document)["stockPricesList"]
+
+
+def test_truncated_number_fails():
+    try:
+        list(iter_json_array([b'[1, 2.']))
+    except json.JSONDecodeError:
+        return
+    raise AssertionError("a number cut off at the end of the input must not decode")
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
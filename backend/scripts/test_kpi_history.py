@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Tests for the KPI value history
+Run with pytest or directly: python test_kpi_history.py
+"""
+
+from datetime import date
+
+from kpi_history import KPIHistory
+
+SERIES = (1, '1year', 'mean')
+JAN, FEB, MAR = date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31)
+
+
+def kpi_row(instrument_id, numeric_value, string_value=None):
+    """A row in KPI_VALUE_COLUMNS order"""
+    return SERIES + (instrument_id, numeric_value, string_value)
+
+
+class FakeCursor:
+    """mysql.connector tuple cursor over kpi_series and kpi_value_history"""
+
+    def __init__(self):
+        self.series = {}
+        self.history = {}  # (endpoint, series_id, instrument_id, valid_from) -> (numeric, string, is_deleted)
+        self.deletes = []
+        self.rows = []
+        self.lastrowid = None
+        self.rowcount = 0
+
+    def _changes(self, endpoint, series_id, instrument_id=None):
+        return sorted((key[3], key[2], value) for key, value in self.history.items()
+                      if key[:2] == (endpoint, series_id) and instrument_id in (None, key[2]))
+
+    def execute(self, query, params=()):
+        query = ' '.join(query.split())
+        if query.startswith('SELECT series_id FROM kpi_series'):
+            self.rows = [(self.series[params],)] if params in self.series else []
+        elif query.startswith('INSERT INTO kpi_series'):
+            self.lastrowid = self.series.setdefault(params, len(self.series) + 1)
+        elif 'MAX(valid_from) AS valid_from' in query:
+            endpoint, series_id, as_of = params[:3]
+            latest = {}
+            for valid_from, instrument_id, value in self._changes(endpoint, series_id):
+                if valid_from <= as_of:
+                    latest[instrument_id] = value
+            self.rows = [(i, v[0], v[1]) for i, v in latest.items() if not v[2]]
+        elif 'ORDER BY valid_from DESC LIMIT 1' in query:
+            endpoint, series_id, instrument_id, as_of = params
+            self.rows = [value for valid_from, _, value in self._changes(endpoint, series_id, instrument_id)
+                         if valid_from <= as_of][-1:]
+        elif 'valid_from > %s AND valid_from <= %s' in query:
+            endpoint, series_id, instrument_id, date_from, date_to = params
+            self.rows = [(valid_from,) + value
+                         for valid_from, _, value in self._changes(endpoint, series_id, instrument_id)
+                         if date_from < valid_from <= date_to]
+        elif query.startswith('DELETE h FROM kpi_value_history'):
+            self.deletes.append(params)
+            self.rowcount = 0
+        else:
+            raise AssertionError(f"Unexpected query: {query}")
+
+    def executemany(self, query, params):
+        assert 'INSERT INTO kpi_value_history' in query
+        for endpoint, series_id, instrument_id, valid_from, numeric, string, is_deleted in params:
+            self.history[(endpoint, series_id, instrument_id, valid_from)] = (numeric, string, is_deleted)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_full_payload_appends_only_changes_and_deletions():
+    cursor = FakeCursor()
+    assert KPIHistory(cursor, 'nordic', JAN).record(
+        *SERIES, [kpi_row(100, 3.5), kpi_row(200, 1.2), kpi_row(300, None, 'n/a')], changed_only=False) == 3
+
+    # 100 unchanged (3.50 from the DECIMAL column equals 3.5), 200 changed, 300 gone, 400 new
+    feb = KPIHistory(cursor, 'nordic', FEB)
+    assert feb.record(*SERIES, [kpi_row(100, 3.50), kpi_row(200, 1.4), kpi_row(400, 9.0)], changed_only=False) == 3
+    assert len(cursor.history) == 6
+    assert cursor.history[('nordic', 1, 300, FEB)] == (None, None, 1)
+
+    assert feb.series_as_of(*SERIES, JAN) == {100: (3.5, None), 200: (1.2, None), 300: (None, 'n/a')}
+    assert feb.series_as_of(*SERIES, MAR) == {100: (3.5, None), 200: (1.4, None), 400: (9.0, None)}
+
+
+def test_changed_rows_are_recorded_as_given():
+    cursor = FakeCursor()
+    history = KPIHistory(cursor, 'nordic', JAN)
+    assert history.record(*SERIES, [kpi_row(100, 3.5)], deleted_instruments=[200]) == 2
+    assert cursor.history == {('nordic', 1, 100, JAN): (3.5, None, 0), ('nordic', 1, 200, JAN): (None, None, 1)}
+
+    # A second run on the same day replaces that day's row
+    history.record(*SERIES, [kpi_row(100, 3.6)])
+    assert cursor.history[('nordic', 1, 100, JAN)] == (3.6, None, 0)
+
+
+def test_point_in_time_queries():
+    cursor = FakeCursor()
+    KPIHistory(cursor, 'nordic', JAN).record(*SERIES, [kpi_row(100, 3.5)])
+    KPIHistory(cursor, 'nordic', FEB).record(*SERIES, [], deleted_instruments=[100])
+    history = KPIHistory(cursor, 'nordic', MAR)
+    history.record(*SERIES, [kpi_row(100, 4.0)])
+
+    assert history.value_as_of(*SERIES, 100, date(2024, 12, 31)) is None
+    assert history.value_as_of(*SERIES, 100, date(2025, 2, 1)) == (3.5, None)
+    assert history.value_as_of(*SERIES, 100, date(2025, 3, 1)) is None
+    assert history.value_history(*SERIES, 100, date(2025, 2, 1), MAR) == [
+        (date(2025, 2, 1), 3.5, None), (FEB, None, None), (MAR, 4.0, None)]
+    # Endpoints keep separate histories
+    assert KPIHistory(cursor, 'global', MAR).value_as_of(*SERIES, 100, MAR) is None
+
+
+def test_retention_cutoffs():
+    cursor = FakeCursor()
+    history = KPIHistory(cursor, 'nordic', date(2025, 6, 15))
+    history.apply_retention(daily_days=90, retention_days=365)
+    assert cursor.deletes == [('nordic', date(2025, 3, 1), 'nordic'), ('nordic', date(2024, 6, 15), 'nordic')]
+
+    cursor.deletes = []
+    history.apply_retention(daily_days=90, retention_days=0)
+    assert cursor.deletes == [('nordic', date(2025, 3, 1), 'nordic')]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for the concurrent fetch and store pipeline of kpi_nordic_sync.py
+Run with pytest or directly: python test_kpi_nordic_sync.py
+"""
+
+import os
+import asyncio
+import tempfile
+import threading
+import time
+
+# The script opens its log file at import time
+os.environ.setdefault('LOG_PATH', tempfile.mkdtemp(prefix='psw_test_logs_'))
+
+from kpi_nordic_sync import KPINordicSync  # noqa: E402
+
+CONFIGS = [(kpi_id, '1year', calculation) for kpi_id in range(1, 6) for calculation in ('mean', 'median')]
+
+
+class Recorder:
+    """Fake fetch and store that track how many calls overlap"""
+
+    def __init__(self, fail_store=()):
+        self.lock = threading.Lock()
+        self.fetching = self.most_fetching = 0
+        self.storing = self.most_storing = 0
+        self.stored = []
+        self.fail_store = set(fail_store)
+
+    def fetch(self, kpi_id, group, calculation):
+        with self.lock:
+            self.fetching += 1
+            self.most_fetching = max(self.most_fetching, self.fetching)
+        time.sleep(0.01)
+        with self.lock:
+            self.fetching -= 1
+        return {'values': [{'i': kpi_id, 'n': 1.0}]}
+
+    def store(self, kpi_data, kpi_id, group, calculation):
+        with self.lock:
+            self.storing += 1
+            self.most_storing = max(self.most_storing, self.storing)
+        time.sleep(0.002)
+        with self.lock:
+            self.storing -= 1
+        if (kpi_id, group, calculation) in self.fail_store:
+            raise RuntimeError("write failed")
+        self.stored.append((kpi_id, group, calculation))
+
+
+def make_sync(recorder):
+    sync = KPINordicSync()
+    sync.fetch_kpi_nordic_data = recorder.fetch
+    sync.store_kpi_data = recorder.store
+    return sync
+
+
+def test_every_configuration_is_stored_by_a_single_writer():
+    recorder = Recorder()
+    sync = make_sync(recorder)
+    asyncio.run(sync.fetch_and_store_concurrently(CONFIGS, concurrency=4))
+
+    assert sorted(recorder.stored) == sorted(CONFIGS)
+    assert 1 < recorder.most_fetching <= 4
+    assert recorder.most_storing == 1
+    assert sync.stats['errors'] == 0
+
+
+def test_store_failures_are_counted_and_do_not_stop_the_run():
+    failing = CONFIGS[3]
+    recorder = Recorder(fail_store=[failing])
+    sync = make_sync(recorder)
+    asyncio.run(sync.fetch_and_store_concurrently(CONFIGS, concurrency=3))
+
+    assert sorted(recorder.stored) == sorted(c for c in CONFIGS if c != failing)
+    assert sync.stats['errors'] == 1
+
+
+def test_count_stat_is_safe_across_threads():
+    sync = KPINordicSync()
+    threads = [threading.Thread(target=lambda: [sync.count_stat('api_calls') for _ in range(1000)])
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sync.stats['api_calls'] == 8000
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
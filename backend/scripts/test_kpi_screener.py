@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for the incremental KPI screener matrix
+Run with pytest or directly: python test_kpi_screener.py
+"""
+
+import re
+
+from kpi_screener import KPIScreener, column_name, parse_series
+
+YIELD, PAYOUT, GROWTH = (1, '1year', 'mean'), (20, '1year', 'mean'), (8, '5year', 'mean')
+
+
+class FakeCursor:
+    """mysql.connector tuple cursor over kpi_nordic and kpi_screener_nordic"""
+
+    def __init__(self, columns, source):
+        self.columns = ['instrument_id'] + list(columns)
+        self.source = source  # (kpi_id, group, calculation) -> {instrument_id: value}
+        self.screener = {}    # instrument_id -> {column: value}
+        self.refreshed = []
+        self.rows = []
+        self.rowcount = 0
+
+    def execute(self, query, params=()):
+        if 'information_schema.COLUMNS' in query:
+            self.rows = [(column,) for column in self.columns]
+        elif query.startswith('ALTER TABLE'):
+            self.columns += re.findall(r"ADD COLUMN `(\w+)`", query)
+        elif 'INSERT INTO kpi_screener_nordic' in query:
+            column = column_name(params)
+            self.refreshed.append(column)
+            values = self.source.get(params, {})
+            for instrument_id, value in values.items():
+                self.screener.setdefault(instrument_id, {})[column] = value
+            self.rowcount = len(values)
+        elif query.lstrip().startswith('UPDATE kpi_screener_nordic'):
+            column = column_name(params)
+            stale = [i for i, row in self.screener.items()
+                     if row.get(column) is not None and i not in self.source.get(params, {})]
+            for instrument_id in stale:
+                self.screener[instrument_id][column] = None
+            self.rowcount = len(stale)
+        elif query.startswith('DELETE FROM kpi_screener_nordic'):
+            columns = re.findall(r"`(\w+)` IS NULL", query)
+            empty = [i for i, row in self.screener.items() if all(row.get(c) is None for c in columns)]
+            for instrument_id in empty:
+                del self.screener[instrument_id]
+            self.rowcount = len(empty)
+        else:
+            raise AssertionError(f"Unexpected query: {query}")
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_column_names_and_series_parsing():
+    assert column_name((1, '1year', 'mean')) == 'k1_1year_mean'
+    assert column_name((2, '3-year', 'Median')) == 'k2_3_year_median'
+    assert parse_series('1/1year/mean, 20/1year/mean,') == [YIELD, PAYOUT]
+    try:
+        parse_series('1/1year')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("parse_series accepted an incomplete series")
+
+
+def test_full_refresh_builds_every_column():
+    cursor = FakeCursor([column_name(YIELD), column_name(PAYOUT)],
+                        {YIELD: {100: 3.5, 200: 1.2}, PAYOUT: {100: 40.0}})
+    assert KPIScreener(cursor, 'nordic', [YIELD, PAYOUT]).refresh() == 2
+    assert cursor.screener == {100: {'k1_1year_mean': 3.5, 'k20_1year_mean': 40.0},
+                               200: {'k1_1year_mean': 1.2}}
+
+
+def test_incremental_refresh_rebuilds_changed_and_new_columns_only():
+    cursor = FakeCursor([column_name(YIELD), column_name(PAYOUT)],
+                        {YIELD: {100: 3.5, 200: 1.2}, PAYOUT: {100: 40.0}, GROWTH: {200: 7.0}})
+    screener = KPIScreener(cursor, 'nordic', [YIELD, PAYOUT])
+    screener.refresh()
+
+    # Instrument 200 lost its yield value; GROWTH was configured since the last run
+    del cursor.source[YIELD][200]
+    cursor.refreshed = []
+    screener = KPIScreener(cursor, 'nordic', [YIELD, PAYOUT, GROWTH])
+    assert screener.refresh(changed=[YIELD]) == 2
+    assert cursor.refreshed == ['k1_1year_mean', 'k8_5year_mean']
+    assert 'k8_5year_mean' in cursor.columns
+    assert cursor.screener == {100: {'k1_1year_mean': 3.5, 'k20_1year_mean': 40.0},
+                               200: {'k1_1year_mean': None, 'k8_5year_mean': 7.0}}
+
+    # Unconfigured or unchanged series cause no work
+    cursor.refreshed = []
+    assert screener.refresh(changed=[(99, '1year', 'mean')]) == 0
+    assert cursor.refreshed == []
+
+
+def test_instruments_without_any_value_are_removed():
+    cursor = FakeCursor([column_name(YIELD)], {YIELD: {100: 3.5, 200: 1.2}})
+    screener = KPIScreener(cursor, 'nordic', [YIELD])
+    screener.refresh()
+    del cursor.source[YIELD][200]
+    screener.refresh(changed=[YIELD])
+    assert list(cursor.screener) == [100]
+
+
+def test_missing_table_is_reported():
+    cursor = FakeCursor([], {})
+    cursor.columns = []
+    try:
+        KPIScreener(cursor, 'nordic', [YIELD]).refresh()
+    except RuntimeError as e:
+        assert 'create_kpi_screener_tables.sql' in str(e)
+    else:
+        raise AssertionError("refresh() ran without the screener table")
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
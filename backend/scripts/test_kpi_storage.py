@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Tests for the compact KPI storage writer
+Run with pytest or directly: python test_kpi_storage.py
+"""
+
+import os
+
+from kpi_storage import LAYOUT_COMPACT, LAYOUT_LEGACY, CompactKPIWriter, detect_layout
+
+
+class FakeCursor:
+    """mysql.connector tuple cursor over kpi_series and the compact tables of one endpoint"""
+
+    def __init__(self, table_type=None):
+        self.table_type = table_type
+        self.series = {}   # (kpi_id, group, calculation) -> series_id
+        self.values = {}   # (series_id, instrument_id) -> numeric_value
+        self.strings = {}  # (series_id, instrument_id) -> string_value
+        self.queries = []
+        self.rows = []
+        self.lastrowid = None
+        self.rowcount = 0
+
+    def execute(self, query, params=()):
+        query = ' '.join(query.split())
+        self.queries.append(query)
+        if 'information_schema.TABLES' in query:
+            self.rows = [(self.table_type,)] if self.table_type else []
+        elif query.startswith('SELECT series_id FROM kpi_series'):
+            self.rows = [(self.series[params],)] if params in self.series else []
+        elif query.startswith('INSERT INTO kpi_series'):
+            self.lastrowid = self.series.setdefault(params, len(self.series) + 1)
+        elif query.startswith('SELECT 1 FROM kpi_nordic_strings'):
+            self.rows = [(1,)] if any(key[0] == params[0] for key in self.strings) else []
+        else:
+            raise AssertionError(f"Unexpected query: {query}")
+
+    def executemany(self, query, params):
+        query = ' '.join(query.split())
+        self.queries.append(query)
+        table = self.values if 'kpi_nordic_values' in query else self.strings
+        if query.startswith('INSERT'):
+            for series_id, instrument_id, value in params:
+                table[(series_id, instrument_id)] = value
+        elif query.startswith('DELETE'):
+            keys = [tuple(key) for key in params if tuple(key) in table]
+            for key in keys:
+                del table[key]
+            self.rowcount = len(keys)
+        else:
+            raise AssertionError(f"Unexpected query: {query}")
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+
+def test_series_ids_are_registered_once_and_cached():
+    cursor = FakeCursor()
+    cursor.series[(1, '1year', 'mean')] = 7
+    writer = CompactKPIWriter(cursor, 'nordic')
+
+    assert writer.series_id(1, '1year', 'mean') == 7
+    assert writer.series_id(2, '1year', 'mean') == 2
+    assert writer.series_id(2, '1year', 'mean') == 2
+    # The known series is read, not inserted (no AUTO_INCREMENT value burnt)
+    inserts = [q for q in cursor.queries if q.startswith('INSERT INTO kpi_series')]
+    assert len(inserts) == 1
+    assert len(cursor.queries) == 3
+
+
+def test_upsert_splits_numeric_and_string_values():
+    cursor = FakeCursor()
+    writer = CompactKPIWriter(cursor, 'nordic')
+    rows = [(1, '1year', 'mean', 100, 1.5, None), (1, '1year', 'mean', 200, None, 'n/a')]
+
+    assert writer.upsert(1, '1year', 'mean', rows) == 2
+    assert cursor.values == {(1, 100): 1.5, (1, 200): None}
+    assert cursor.strings == {(1, 200): 'n/a'}
+
+    # A value that lost its string drops the string row
+    assert writer.upsert(1, '1year', 'mean', [(1, '1year', 'mean', 200, 2.5, None)]) == 1
+    assert cursor.values[(1, 200)] == 2.5
+    assert cursor.strings == {}
+
+
+def test_series_without_strings_skips_string_deletes():
+    cursor = FakeCursor()
+    writer = CompactKPIWriter(cursor, 'nordic')
+    writer.upsert(1, '1year', 'mean', [(1, '1year', 'mean', 100, 1.5, None)])
+    assert not any(q.startswith('DELETE') for q in cursor.queries)
+
+
+def test_delete_removes_values_and_strings():
+    cursor = FakeCursor()
+    writer = CompactKPIWriter(cursor, 'nordic')
+    writer.upsert(1, '1year', 'mean', [(1, '1year', 'mean', 100, 1.5, None),
+                                       (1, '1year', 'mean', 200, None, 'n/a'),
+                                       (1, '1year', 'mean', 300, 3.0, None)])
+    assert writer.delete(1, '1year', 'mean', [200, 300]) == 2
+    assert cursor.values == {(1, 100): 1.5}
+    assert cursor.strings == {}
+
+
+def test_detect_layout():
+    os.environ.pop('KPI_STORAGE_LAYOUT', None)
+    assert detect_layout(FakeCursor('VIEW'), 'nordic') == LAYOUT_COMPACT
+    assert detect_layout(FakeCursor('BASE TABLE'), 'nordic') == LAYOUT_LEGACY
+    assert detect_layout(FakeCursor(), 'nordic') == LAYOUT_LEGACY
+
+    os.environ['KPI_STORAGE_LAYOUT'] = 'compact'
+    try:
+        cursor = FakeCursor('BASE TABLE')
+        assert detect_layout(cursor, 'nordic') == LAYOUT_COMPACT
+        assert cursor.queries == []
+    finally:
+        del os.environ['KPI_STORAGE_LAYOUT']
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for the full-catalogue KPI sync planner
+Run with pytest or directly: python test_kpi_sync_planner.py
+"""
+
+from kpi_sync_planner import (
+    STATUS_DONE, STATUS_FAILED, STATUS_NOT_FOUND, KPISyncPlanner, parse_shard, shard_of
+)
+
+KPI_IDS = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+
+
+class FakeCursor:
+    """mysql.connector tuple cursor over kpi_sync_catalog and kpi_sync_progress"""
+
+    def __init__(self):
+        self.catalog = {}   # (endpoint, kpi_id, group, calculation) -> is_valid
+        self.progress = {}  # (run_id, endpoint, kpi_id, group, calculation) -> status
+        self.rows = []
+
+    def execute(self, query, params=()):
+        if 'INSERT INTO kpi_sync_progress' in query:
+            run_id, endpoint, kpi_id, group, calculation, status, _ = params
+            self.progress[(run_id, endpoint, kpi_id, group, calculation)] = status
+        elif 'INSERT INTO kpi_sync_catalog' in query:
+            endpoint, kpi_id, group, calculation, is_valid = params
+            self.catalog[(endpoint, kpi_id, group, calculation)] = int(is_valid)
+        elif 'FROM kpi_sync_catalog' in query:
+            self.rows = [key[1:] for key, is_valid in self.catalog.items()
+                         if key[0] == params[0] and not is_valid]
+        elif 'FROM kpi_sync_progress' in query:
+            run_id, endpoint, statuses = params[0], params[1], params[2:]
+            self.rows = [key[2:] for key, status in self.progress.items()
+                         if key[:2] == (run_id, endpoint) and status in statuses]
+        else:
+            raise AssertionError(f"Unexpected query: {query}")
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_parse_shard():
+    assert parse_shard('2/4') == (2, 4)
+    for value in ('0/4', '5/4', '1/0', 'x', '1/2/3'):
+        try:
+            parse_shard(value)
+        except ValueError:
+            continue
+        raise AssertionError(f"parse_shard accepted {value}")
+
+
+def test_shards_split_the_catalogue_without_overlap():
+    cursor = FakeCursor()
+    everything = KPISyncPlanner(cursor, 'nordic', run_id='run').build_plan(KPI_IDS)
+    assert len(everything) == len(KPI_IDS) * 4 * 4
+
+    shards = [KPISyncPlanner(cursor, 'nordic', run_id='run', shard=(i, 3)).build_plan(KPI_IDS)
+              for i in (1, 2, 3)]
+    assert sorted(config for shard in shards for config in shard) == sorted(everything)
+    assert all(shard for shard in shards)
+    # Shard assignment does not depend on the order of the KPI ids
+    assert all(shard_of(config, 3) == i for i, shard in enumerate(shards, 1) for config in shard)
+
+
+def test_resume_skips_finished_combinations_but_retries_failed_ones():
+    cursor = FakeCursor()
+    planner = KPISyncPlanner(cursor, 'nordic', run_id='run')
+    done, not_found, failed = planner.build_plan(KPI_IDS)[:3]
+    planner.record_result(done, STATUS_DONE, 120)
+    planner.record_result(not_found, STATUS_NOT_FOUND)
+    planner.record_result(failed, STATUS_FAILED)
+
+    resumed = KPISyncPlanner(cursor, 'nordic', run_id='run').build_plan(KPI_IDS)
+    assert done not in resumed and not_found not in resumed
+    assert failed in resumed
+    assert len(resumed) == len(KPI_IDS) * 16 - 2
+
+    # A new run fetches everything again except combinations known to 404
+    next_run = KPISyncPlanner(cursor, 'nordic', run_id='next').build_plan(KPI_IDS)
+    assert done in next_run and failed in next_run and not_found not in next_run
+    # Progress and catalogue are kept per endpoint
+    assert not_found in KPISyncPlanner(cursor, 'global', run_id='run').build_plan(KPI_IDS)
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests for price_history.ensure_partitions
+Run with pytest or directly: python test_price_history.py
+"""
+
+import re
+import threading
+import time
+from datetime import date
+
+from price_history import _next_month, ensure_partitions
+
+
+class FakeServer:
+    """Partition list of price_history and the named locks of a MySQL server"""
+
+    def __init__(self, months):
+        # partition name -> exclusive upper boundary, as in information_schema
+        self.partitions = {f"p{month:%Y%m}": _next_month(month) for month in months}
+        self.locks = {}
+        self.guard = threading.Lock()
+
+
+class FakeCursor:
+    """pymysql dict cursor talking to a FakeServer"""
+
+    def __init__(self, server):
+        self.server = server
+        self.rows = []
+
+    def execute(self, query, params=()):
+        server = self.server
+        if 'GET_LOCK' in query:
+            lock = server.locks.setdefault(params[0], threading.Lock())
+            self.rows = [{'acquired': 1 if lock.acquire(timeout=params[1]) else 0}]
+        elif 'RELEASE_LOCK' in query:
+            server.locks[params[0]].release()
+            self.rows = [{'released': 1}]
+        elif 'information_schema.PARTITIONS' in query:
+            with server.guard:
+                self.rows = [{'name': name, 'boundary': f"'{bound.isoformat()}'"}
+                             for name, bound in server.partitions.items()]
+            time.sleep(0.01)  # widen the window between reading and altering
+        elif 'REORGANIZE PARTITION' in query:
+            with server.guard:
+                for name, bound in re.findall(r"PARTITION (p\d+) VALUES LESS THAN \('([\d-]+)'\)", query):
+                    if name in server.partitions:
+                        raise RuntimeError(f"Duplicate partition name {name}")
+                    server.partitions[name] = date.fromisoformat(bound)
+            self.rows = []
+        else:
+            raise AssertionError(f"Unexpected query: {query}")
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_adds_every_month_through_the_one_after():
+    server = FakeServer([date(2025, 1, 1)])
+    assert ensure_partitions(FakeCursor(server), date(2025, 3, 15)) == 3
+    assert sorted(server.partitions) == ['p202501', 'p202502', 'p202503', 'p202504']
+    assert ensure_partitions(FakeCursor(server), date(2025, 3, 31)) == 0
+
+
+def test_concurrent_jobs_do_not_add_the_same_month():
+    server = FakeServer([date(2025, 1, 1)])
+    added, errors = [], []
+
+    def job():
+        try:
+            added.append(ensure_partitions(FakeCursor(server), date(2025, 3, 15)))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=job) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(added) == [0, 0, 0, 3]
+    assert not server.locks['price_history_partitions'].locked()
+
+
+def test_lock_is_released_when_the_split_fails():
+    server = FakeServer([])
+    try:
+        ensure_partitions(FakeCursor(server), date(2025, 3, 15))
+    except RuntimeError:
+        pass
+    assert not server.locks['price_history_partitions'].locked()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-process log routing of run_all_scripts.py
+Run with pytest or directly: python test_run_all_scripts.py
+"""
+
+import asyncio
+import contextvars
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from run_all_scripts import JobLogRouter
+
+
+def make_router():
+    router = JobLogRouter()
+    file_stream, console_stream, fallback_stream = io.StringIO(), io.StringIO(), io.StringIO()
+    router.register('job.py', logging.StreamHandler(file_stream), logging.StreamHandler(console_stream))
+    router._fallback = logging.StreamHandler(fallback_stream)
+    logger = logging.getLogger('test_run_all_scripts')
+    logger.handlers = [router]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return router, logger, file_stream, console_stream, fallback_stream
+
+
+def test_worker_threads_log_to_the_job():
+    router, logger, file_stream, console_stream, _ = make_router()
+    router.bind('job.py')
+    try:
+        logger.info("main thread")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            executor.submit(contextvars.copy_context().run, logger.info, "executor thread").result()
+
+        async def to_thread():
+            await asyncio.to_thread(logger.info, "asyncio.to_thread")
+        asyncio.run(to_thread())
+    finally:
+        router.unbind()
+
+    for stream in (file_stream, console_stream):
+        assert stream.getvalue().splitlines() == ["main thread", "executor thread", "asyncio.to_thread"]
+
+
+def test_threads_without_a_job_fall_back_to_the_console():
+    router, logger, file_stream, _, fallback_stream = make_router()
+    router.bind('job.py')
+    try:
+        thread = threading.Thread(target=logger.info, args=("plain thread",))
+        thread.start()
+        thread.join()
+    finally:
+        router.unbind()
+    logger.info("after the job")
+
+    assert file_stream.getvalue() == ""
+    assert fallback_stream.getvalue().splitlines() == ["plain thread", "after the job"]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,62 @@
+-- Deduplicated, compressed FreeCurrency API responses for PSW Market Data
+-- Written by backend/scripts/fx_rates_freecurrency.py: each API response is
+-- stored once and fx_rates_freecurrency rows reference it by raw_response_id
+-- instead of repeating the whole payload in raw_response.
+-- Database: psw_marketdata
+--
+-- payload uses the MySQL COMPRESS() format (4-byte length + zlib), so it can
+-- be read back in SQL with UNCOMPRESS(payload).
+
+USE psw_marketdata;
+
+CREATE TABLE IF NOT EXISTS fx_raw_responses (
+    id INT UNSIGNED NOT NULL AUTO_INCREMENT,
+    content_hash BINARY(32) NOT NULL COMMENT 'SHA-256 of the uncompressed JSON payload',
+    provider VARCHAR(64) NOT NULL DEFAULT 'freecurrencyapi' COMMENT 'API the payload came from',
+    endpoint VARCHAR(32) NULL COMMENT 'API endpoint (latest, historical) or NULL for migrated payloads',
+    base_currency VARCHAR(3) NULL COMMENT 'Base currency requested in the call',
+    payload_length INT UNSIGNED NOT NULL COMMENT 'Size of the uncompressed payload in bytes',
+    payload MEDIUMBLOB NOT NULL COMMENT 'Compressed JSON payload (read with UNCOMPRESS)',
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (id),
+    UNIQUE KEY uk_content_hash (content_hash)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='FX API responses stored once per call, referenced by fx_rates_freecurrency';
+
+ALTER TABLE fx_rates_freecurrency
+    ADD COLUMN raw_response_id INT UNSIGNED NULL COMMENT 'fx_raw_responses.id of the API response the rate came from' AFTER raw_response,
+    ADD INDEX idx_raw_response_id (raw_response_id);
+
+-- Move existing payloads into fx_raw_responses ('{}' placeholders are dropped).
+-- They are keyed by the SHA-256 of MySQL's JSON text here, which differs from
+-- the canonical JSON the script hashes; run
+--   python fx_rates_freecurrency.py --rehash-raw-responses
+-- once afterwards so stored responses are recognised when fetched again.
+INSERT IGNORE INTO fx_raw_responses (content_hash, provider, payload_length, payload)
+SELECT UNHEX(SHA2(raw_text, 256)), provider, LENGTH(raw_text), COMPRESS(raw_text)
+FROM (
+    SELECT DISTINCT CAST(raw_response AS CHAR) AS raw_text, COALESCE(provider, 'freecurrencyapi') AS provider
+    FROM fx_rates_freecurrency
+    WHERE raw_response IS NOT NULL AND JSON_LENGTH(raw_response) > 0
+) existing;
+
+UPDATE fx_rates_freecurrency f
+JOIN fx_raw_responses r ON r.content_hash = UNHEX(SHA2(CAST(f.raw_response AS CHAR), 256))
+SET f.raw_response_id = r.id, f.raw_response = NULL
+WHERE f.raw_response IS NOT NULL;
+
+UPDATE fx_rates_freecurrency
+SET raw_response = NULL
+WHERE raw_response IS NOT NULL AND JSON_LENGTH(raw_response) = 0;
+
+-- Reclaim the space of the removed payloads
+OPTIMIZE TABLE fx_rates_freecurrency;
+
+-- Rates with their original API response, for audits
+CREATE OR REPLACE VIEW fx_rates_with_raw_response AS
+SELECT f.id, f.base_currency, f.target_currency, f.exchange_rate, f.rate_date, f.provider,
+       r.endpoint, CAST(UNCOMPRESS(r.payload) AS JSON) AS raw_response,
+       f.created_at, f.updated_at
+FROM fx_rates_freecurrency f
+LEFT JOIN fx_raw_responses r ON r.id = f.raw_response_id;
@@ -0,0 +1,142 @@
+-- Compact, dictionary-encoded KPI storage for PSW Market Data
+-- Written by backend/scripts/kpi_nordic_sync.py / kpi_global_sync.py (see kpi_storage.py)
+-- Database: psw_marketdata
+--
+-- (kpi_id, group_period, calculation) is stored once in kpi_series and
+-- referenced by a 4-byte series_id. Numeric values live in
+-- kpi_<endpoint>_values, clustered on (series_id, instrument_id); the rare
+-- string values live in kpi_<endpoint>_strings.
+--
+-- The migration copies the existing data, renames kpi_nordic / kpi_global
+-- to kpi_nordic_legacy / kpi_global_legacy and replaces them with views
+-- exposing the old columns, so existing queries keep working. The views are
+-- read-only: writers use the compact tables (kpi_storage.py,
+-- fetch_yield_data.php). Run it once; drop the *_legacy tables after
+-- verifying the views.
+
+USE psw_marketdata;
+
+CREATE TABLE IF NOT EXISTS kpi_series (
+    series_id INT UNSIGNED NOT NULL AUTO_INCREMENT,
+    kpi_id INT NOT NULL COMMENT 'KPI ID (links to kpi_metadata.kpi_id)',
+    group_period VARCHAR(50) NOT NULL COMMENT 'Time period group (e.g., 1year, 3year)',
+    calculation VARCHAR(50) NOT NULL COMMENT 'Calculation method (e.g., mean, median)',
+
+    PRIMARY KEY (series_id),
+    UNIQUE KEY uk_kpi_series (kpi_id, group_period, calculation),
+
+    CONSTRAINT fk_kpi_series_metadata
+        FOREIGN KEY (kpi_id)
+        REFERENCES kpi_metadata(kpi_id)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Dictionary of KPI series (kpi_id x group x calculation) used by the compact KPI tables';
+
+CREATE TABLE IF NOT EXISTS kpi_nordic_values (
+    series_id INT UNSIGNED NOT NULL COMMENT 'kpi_series.series_id',
+    instrument_id INT NOT NULL COMMENT 'Instrument ID from API (i field)',
+    numeric_value DOUBLE NULL COMMENT 'Numeric KPI value (n field)',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (series_id, instrument_id),
+    INDEX idx_instrument_id (instrument_id),
+
+    CONSTRAINT fk_kpi_nordic_values_series
+        FOREIGN KEY (series_id) REFERENCES kpi_series(series_id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Nordic KPI values, one row per series and instrument';
+
+CREATE TABLE IF NOT EXISTS kpi_nordic_strings (
+    series_id INT UNSIGNED NOT NULL COMMENT 'kpi_series.series_id',
+    instrument_id INT NOT NULL COMMENT 'Instrument ID from API (i field)',
+    string_value TEXT NOT NULL COMMENT 'String KPI value (s field)',
+
+    PRIMARY KEY (series_id, instrument_id),
+
+    CONSTRAINT fk_kpi_nordic_strings_series
+        FOREIGN KEY (series_id) REFERENCES kpi_series(series_id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Nordic KPI string values (only rows that have one)';
+
+CREATE TABLE IF NOT EXISTS kpi_global_values (
+    series_id INT UNSIGNED NOT NULL COMMENT 'kpi_series.series_id',
+    instrument_id INT NOT NULL COMMENT 'Instrument ID from API (i field)',
+    numeric_value DOUBLE NULL COMMENT 'Numeric KPI value (n field)',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (series_id, instrument_id),
+    INDEX idx_instrument_id (instrument_id),
+
+    CONSTRAINT fk_kpi_global_values_series
+        FOREIGN KEY (series_id) REFERENCES kpi_series(series_id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Global KPI values, one row per series and instrument';
+
+CREATE TABLE IF NOT EXISTS kpi_global_strings (
+    series_id INT UNSIGNED NOT NULL COMMENT 'kpi_series.series_id',
+    instrument_id INT NOT NULL COMMENT 'Instrument ID from API (i field)',
+    string_value TEXT NOT NULL COMMENT 'String KPI value (s field)',
+
+    PRIMARY KEY (series_id, instrument_id),
+
+    CONSTRAINT fk_kpi_global_strings_series
+        FOREIGN KEY (series_id) REFERENCES kpi_series(series_id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Global KPI string values (only rows that have one)';
+
+-- Copy existing data
+INSERT IGNORE INTO kpi_series (kpi_id, group_period, calculation)
+SELECT kpi_id, group_period, calculation FROM kpi_nordic
+UNION
+SELECT kpi_id, group_period, calculation FROM kpi_global;
+
+INSERT INTO kpi_nordic_values (series_id, instrument_id, numeric_value, updated_at)
+SELECT s.series_id, k.instrument_id, k.numeric_value, k.updated_at
+FROM kpi_nordic k
+JOIN kpi_series s ON s.kpi_id = k.kpi_id AND s.group_period = k.group_period AND s.calculation = k.calculation
+ON DUPLICATE KEY UPDATE numeric_value = VALUES(numeric_value);
+
+INSERT INTO kpi_nordic_strings (series_id, instrument_id, string_value)
+SELECT s.series_id, k.instrument_id, k.string_value
+FROM kpi_nordic k
+JOIN kpi_series s ON s.kpi_id = k.kpi_id AND s.group_period = k.group_period AND s.calculation = k.calculation
+WHERE k.string_value IS NOT NULL
+ON DUPLICATE KEY UPDATE string_value = VALUES(string_value);
+
+INSERT INTO kpi_global_values (series_id, instrument_id, numeric_value, updated_at)
+SELECT s.series_id, k.instrument_id, k.numeric_value, k.updated_at
+FROM kpi_global k
+JOIN kpi_series s ON s.kpi_id = k.kpi_id AND s.group_period = k.group_period AND s.calculation = k.calculation
+ON DUPLICATE KEY UPDATE numeric_value = VALUES(numeric_value);
+
+INSERT INTO kpi_global_strings (series_id, instrument_id, string_value)
+SELECT s.series_id, k.instrument_id, k.string_value
+FROM kpi_global k
+JOIN kpi_series s ON s.kpi_id = k.kpi_id AND s.group_period = k.group_period AND s.calculation = k.calculation
+WHERE k.string_value IS NOT NULL
+ON DUPLICATE KEY UPDATE string_value = VALUES(string_value);
+
+-- Keep the old tables for rollback and put compatibility views in their place
+RENAME TABLE kpi_nordic TO kpi_nordic_legacy,
+             kpi_global TO kpi_global_legacy;
+
+CREATE OR REPLACE VIEW kpi_nordic AS
+SELECT s.kpi_id, s.group_period, s.calculation, v.instrument_id,
+       v.numeric_value, t.string_value,
+       v.updated_at AS created_at, v.updated_at
+FROM kpi_nordic_values v
+JOIN kpi_series s ON s.series_id = v.series_id
+LEFT JOIN kpi_nordic_strings t ON t.series_id = v.series_id AND t.instrument_id = v.instrument_id;
+
+CREATE OR REPLACE VIEW kpi_global AS
+SELECT s.kpi_id, s.group_period, s.calculation, v.instrument_id,
+       v.numeric_value, t.string_value,
+       v.updated_at AS created_at, v.updated_at
+FROM kpi_global_values v
+JOIN kpi_series s ON s.series_id = v.series_id
+LEFT JOIN kpi_global_strings t ON t.series_id = v.series_id AND t.instrument_id = v.instrument_id;
+
+-- Rollback:
+-- DROP VIEW kpi_nordic, kpi_global;
+-- RENAME TABLE kpi_nordic_legacy TO kpi_nordic, kpi_global_legacy TO kpi_global;
@@ -0,0 +1,33 @@
+-- Create KPI screener matrix tables for PSW Market Data
+-- Maintained by backend/scripts/kpi_screener.py after kpi_nordic_sync.py / kpi_global_sync.py
+-- Database: psw_marketdata
+--
+-- One row per instrument. Only the key is created here; kpi_screener.py adds
+-- one DOUBLE column per configured KPI series (k<kpi_id>_<group>_<calculation>,
+-- e.g. k1_1year_mean) and fills it from kpi_nordic / kpi_global.
+
+USE psw_marketdata;
+
+CREATE TABLE IF NOT EXISTS kpi_screener_nordic (
+    instrument_id INT NOT NULL COMMENT 'Börsdata instrument ID (nordic_instruments.insId)',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (instrument_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Nordic KPI series pivoted to one row per instrument for screening';
+
+CREATE TABLE IF NOT EXISTS kpi_screener_global (
+    instrument_id INT NOT NULL COMMENT 'Börsdata instrument ID (global_instruments.insId)',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (instrument_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Global KPI series pivoted to one row per instrument for screening';
+
+-- Example: top 50 Nordic dividend payers with a 1-year mean P/E below 15
+-- SELECT ni.name, s.k1_1year_mean AS dividend_yield, s.k2_1year_mean AS pe
+-- FROM kpi_screener_nordic s
+-- JOIN nordic_instruments ni ON ni.insId = s.instrument_id
+-- WHERE s.k2_1year_mean BETWEEN 0 AND 15
+-- ORDER BY s.k1_1year_mean DESC
+-- LIMIT 50;
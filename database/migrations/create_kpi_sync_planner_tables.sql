@@ -0,0 +1,34 @@
+-- Create KPI sync planner tables for PSW Market Data
+-- Used by kpi_nordic_sync.py / kpi_global_sync.py in full-catalogue mode (--full-catalogue)
+-- Database: psw_marketdata
+
+USE psw_marketdata;
+
+-- Which KPI x group x calculation combinations Börsdata actually serves
+CREATE TABLE IF NOT EXISTS kpi_sync_catalog (
+    endpoint ENUM('nordic', 'global') NOT NULL COMMENT 'KPI endpoint the combination belongs to',
+    kpi_id INT NOT NULL COMMENT 'KPI ID (links to kpi_metadata.kpi_id)',
+    group_period VARCHAR(50) NOT NULL COMMENT 'Time period group (e.g., 1year, 3year)',
+    calculation VARCHAR(50) NOT NULL COMMENT 'Calculation method (e.g., mean, median)',
+    is_valid BOOLEAN NOT NULL COMMENT 'FALSE when the API answered 404 for this combination',
+    last_checked TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT 'When the combination was last fetched',
+
+    PRIMARY KEY (endpoint, kpi_id, group_period, calculation)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Known valid/invalid KPI combinations for full-catalogue KPI syncs';
+
+-- Per-run progress so interrupted or sharded runs can resume
+CREATE TABLE IF NOT EXISTS kpi_sync_progress (
+    run_id VARCHAR(50) NOT NULL COMMENT 'Run identifier (defaults to the sync date)',
+    endpoint ENUM('nordic', 'global') NOT NULL COMMENT 'KPI endpoint',
+    kpi_id INT NOT NULL COMMENT 'KPI ID',
+    group_period VARCHAR(50) NOT NULL COMMENT 'Time period group',
+    calculation VARCHAR(50) NOT NULL COMMENT 'Calculation method',
+    status ENUM('done', 'not_found', 'failed') NOT NULL COMMENT 'Outcome of the fetch',
+    value_count INT NOT NULL DEFAULT 0 COMMENT 'Number of instrument values stored',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT 'Last status change',
+
+    PRIMARY KEY (run_id, endpoint, kpi_id, group_period, calculation),
+    INDEX idx_updated_at (updated_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Progress of full-catalogue KPI sync runs';
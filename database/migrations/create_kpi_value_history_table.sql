@@ -0,0 +1,53 @@
+-- Create KPI value history table for PSW Market Data
+-- Appended to by backend/scripts/kpi_nordic_sync.py / kpi_global_sync.py (see kpi_history.py)
+-- Database: psw_marketdata
+--
+-- Requires kpi_series from create_kpi_compact_tables.sql.
+--
+-- One row per change: a value is valid from valid_from until the next row of
+-- the same endpoint, series and instrument. is_deleted marks values that
+-- disappeared from Börsdata. Old history is downsampled to month-end
+-- resolution and expired by kpi_history.py (KPI_HISTORY_DAILY_DAYS,
+-- KPI_HISTORY_RETENTION_DAYS).
+
+USE psw_marketdata;
+
+CREATE TABLE IF NOT EXISTS kpi_value_history (
+    endpoint ENUM('nordic', 'global') NOT NULL COMMENT 'KPI endpoint the value came from',
+    series_id INT UNSIGNED NOT NULL COMMENT 'kpi_series.series_id',
+    instrument_id INT NOT NULL COMMENT 'Börsdata instrument ID',
+    valid_from DATE NOT NULL COMMENT 'Sync date the value was first seen',
+    numeric_value DOUBLE NULL COMMENT 'Numeric KPI value (n field)',
+    string_value TEXT NULL COMMENT 'String KPI value (s field)',
+    is_deleted BOOLEAN NOT NULL DEFAULT FALSE COMMENT 'TRUE when the value disappeared from the API on valid_from',
+
+    -- "Value as of date" is a backward range scan on this key
+    PRIMARY KEY (endpoint, series_id, instrument_id, valid_from),
+    INDEX idx_valid_from (valid_from)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Append-only KPI value changes per sync date';
+
+-- Seed the history with the current values so as-of queries work from today
+INSERT IGNORE INTO kpi_series (kpi_id, group_period, calculation)
+SELECT kpi_id, group_period, calculation FROM kpi_nordic
+UNION
+SELECT kpi_id, group_period, calculation FROM kpi_global;
+
+INSERT IGNORE INTO kpi_value_history (endpoint, series_id, instrument_id, valid_from, numeric_value, string_value)
+SELECT 'nordic', s.series_id, k.instrument_id, CURDATE(), k.numeric_value, k.string_value
+FROM kpi_nordic k
+JOIN kpi_series s ON s.kpi_id = k.kpi_id AND s.group_period = k.group_period AND s.calculation = k.calculation;
+
+INSERT IGNORE INTO kpi_value_history (endpoint, series_id, instrument_id, valid_from, numeric_value, string_value)
+SELECT 'global', s.series_id, k.instrument_id, CURDATE(), k.numeric_value, k.string_value
+FROM kpi_global k
+JOIN kpi_series s ON s.kpi_id = k.kpi_id AND s.group_period = k.group_period AND s.calculation = k.calculation;
+
+-- Example: 1-year mean dividend yield of instrument 3 as of 2025-03-31
+-- SELECT IF(h.is_deleted, NULL, h.numeric_value) AS dividend_yield
+-- FROM kpi_value_history h
+-- JOIN kpi_series s ON s.series_id = h.series_id
+-- WHERE h.endpoint = 'nordic' AND s.kpi_id = 1 AND s.group_period = '1year' AND s.calculation = 'mean'
+--   AND h.instrument_id = 3 AND h.valid_from <= '2025-03-31'
+-- ORDER BY h.valid_from DESC
+-- LIMIT 1;
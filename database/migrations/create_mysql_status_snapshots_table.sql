@@ -0,0 +1,62 @@
+-- Create MySQL global status snapshot table for PSW Foundation
+-- Appended to by backend/scripts/mysql_db_overview.py (see server_metrics.py)
+-- Database: psw_foundation
+--
+-- One row per overview run. The main counters have their own columns for
+-- easy SQL; global_status holds every numeric counter of the run. Counters
+-- are totals since server start, so compare consecutive rows (see the
+-- mysql_status_rates view) to get rates.
+
+USE psw_foundation;
+
+CREATE TABLE IF NOT EXISTS mysql_status_snapshots (
+    id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+    captured_at DATETIME NOT NULL COMMENT 'When mysql_db_overview.py read the counters',
+    hostname VARCHAR(255) NULL COMMENT 'MySQL @@hostname',
+    uptime_seconds BIGINT UNSIGNED NULL COMMENT 'Uptime',
+    questions BIGINT UNSIGNED NULL COMMENT 'Questions',
+    queries BIGINT UNSIGNED NULL COMMENT 'Queries',
+    slow_queries BIGINT UNSIGNED NULL COMMENT 'Slow_queries',
+    connections BIGINT UNSIGNED NULL COMMENT 'Connections',
+    threads_connected INT UNSIGNED NULL COMMENT 'Threads_connected',
+    innodb_buffer_pool_read_requests BIGINT UNSIGNED NULL COMMENT 'Innodb_buffer_pool_read_requests',
+    innodb_buffer_pool_reads BIGINT UNSIGNED NULL COMMENT 'Innodb_buffer_pool_reads',
+    created_tmp_tables BIGINT UNSIGNED NULL COMMENT 'Created_tmp_tables',
+    created_tmp_disk_tables BIGINT UNSIGNED NULL COMMENT 'Created_tmp_disk_tables',
+    global_status JSON NULL COMMENT 'All numeric SHOW GLOBAL STATUS counters',
+
+    PRIMARY KEY (id),
+    INDEX idx_captured_at (captured_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='MySQL global status counters per overview run';
+
+-- Rates between consecutive snapshots; the first snapshot after a server
+-- restart (uptime went down) is left out
+CREATE OR REPLACE VIEW mysql_status_rates AS
+SELECT
+    captured_at,
+    interval_seconds,
+    ROUND(d_queries / interval_seconds, 3) AS queries_per_second,
+    ROUND(d_questions / interval_seconds, 3) AS questions_per_second,
+    d_slow_queries AS slow_queries,
+    ROUND(1 - d_pool_reads / NULLIF(d_pool_read_requests, 0), 6) AS buffer_pool_hit_ratio,
+    d_tmp_tables AS created_tmp_tables,
+    d_tmp_disk_tables AS created_tmp_disk_tables,
+    ROUND(d_tmp_disk_tables / NULLIF(d_tmp_tables, 0), 6) AS tmp_disk_table_ratio
+FROM (
+    SELECT
+        captured_at,
+        IF(uptime_seconds > LAG(uptime_seconds) OVER w,
+           CAST(uptime_seconds AS SIGNED) - CAST(LAG(uptime_seconds) OVER w AS SIGNED), NULL) AS interval_seconds,
+        CAST(queries AS SIGNED) - CAST(LAG(queries) OVER w AS SIGNED) AS d_queries,
+        CAST(questions AS SIGNED) - CAST(LAG(questions) OVER w AS SIGNED) AS d_questions,
+        CAST(slow_queries AS SIGNED) - CAST(LAG(slow_queries) OVER w AS SIGNED) AS d_slow_queries,
+        CAST(innodb_buffer_pool_reads AS SIGNED) - CAST(LAG(innodb_buffer_pool_reads) OVER w AS SIGNED) AS d_pool_reads,
+        CAST(innodb_buffer_pool_read_requests AS SIGNED)
+            - CAST(LAG(innodb_buffer_pool_read_requests) OVER w AS SIGNED) AS d_pool_read_requests,
+        CAST(created_tmp_tables AS SIGNED) - CAST(LAG(created_tmp_tables) OVER w AS SIGNED) AS d_tmp_tables,
+        CAST(created_tmp_disk_tables AS SIGNED) - CAST(LAG(created_tmp_disk_tables) OVER w AS SIGNED) AS d_tmp_disk_tables
+    FROM mysql_status_snapshots
+    WINDOW w AS (ORDER BY captured_at, id)
+) deltas
+WHERE interval_seconds IS NOT NULL;
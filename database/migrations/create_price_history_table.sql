@@ -0,0 +1,38 @@
+-- Create daily price history table for PSW Market Data
+-- Filled by nordic_latest_prices.py / global_latest_prices.py (one close per run)
+-- and by backend/scripts/price_history.py backfill (historical OHLCV)
+-- Database: psw_marketdata
+--
+-- Partitioned by month on price_date. Only a catch-all partition for old
+-- data and pmax are created here; price_history.py splits pmax into monthly
+-- partitions (p202501, p202502, ...) before it writes, so new months never
+-- land in pmax.
+
+USE psw_marketdata;
+
+CREATE TABLE IF NOT EXISTS price_history (
+    instrument_id INT NOT NULL COMMENT 'Börsdata instrument ID (nordic_instruments / global_instruments insId)',
+    price_date DATE NOT NULL COMMENT 'Trading day',
+    market ENUM('nordic', 'global') NOT NULL COMMENT 'Instrument universe the price came from',
+    open_price DECIMAL(18,4) NULL COMMENT 'Opening price (backfill only)',
+    high_price DECIMAL(18,4) NULL COMMENT 'Day high (backfill only)',
+    low_price DECIMAL(18,4) NULL COMMENT 'Day low (backfill only)',
+    close_price DECIMAL(18,4) NULL COMMENT 'Closing price',
+    volume BIGINT NULL COMMENT 'Traded volume (backfill only)',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (instrument_id, price_date),
+    INDEX idx_price_date (price_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Daily closing prices per instrument, partitioned by month'
+PARTITION BY RANGE COLUMNS (price_date) (
+    PARTITION p_before_2010 VALUES LESS THAN ('2010-01-01'),
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+
+-- Example: daily returns for one instrument over the last year
+-- SELECT price_date, close_price,
+--        close_price / LAG(close_price) OVER (ORDER BY price_date) - 1 AS daily_return
+-- FROM price_history
+-- WHERE instrument_id = 3 AND price_date >= CURDATE() - INTERVAL 1 YEAR
+-- ORDER BY price_date;
@@ -0,0 +1,17 @@
+-- Content-hash index used by backend/scripts/change_detector.py
+-- Stores an 8-byte hash of every row the import scripts loaded, so the next
+-- run only writes rows that were added, changed or deleted.
+-- Database: psw_marketdata
+
+USE psw_marketdata;
+
+CREATE TABLE IF NOT EXISTS row_content_hashes (
+    table_name VARCHAR(64) NOT NULL COMMENT 'Target table the hashed row lives in',
+    scope VARCHAR(128) NOT NULL DEFAULT '' COMMENT 'Slice of the table one payload covers, e.g. kpi_id=12/group_period=1year/calculation=mean',
+    row_key VARCHAR(128) NOT NULL COMMENT 'Key of the row within the scope',
+    content_hash BINARY(8) NOT NULL COMMENT 'BLAKE2b-64 hash of the loaded row',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (table_name, scope, row_key)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+  COMMENT='Content hashes of loaded rows for change detection';